@@ -0,0 +1,111 @@
+"""Compare cold-start and query latency of the chroma and flat backends.
+
+Builds both backends from the same synthetic unit vectors, then measures
+cold start (fresh interpreter: import, open, first query) and warm
+per-query latency. No embedding model is needed.
+
+Usage:
+    python benchmarks/bench_backends.py [--n 50000] [--dim 384] [--queries 200]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from codevec.backends import create_backend, open_backend
+
+COLD_START_SCRIPT = """
+import time
+start = time.perf_counter()
+import numpy as np
+from codevec.backends import open_backend
+store = open_backend({db_path!r})
+store.query(np.ones((1, {dim}), dtype=np.float32).tolist(), 10)
+print(time.perf_counter() - start)
+"""
+
+
+def synthesize(n, dim, seed=0):
+    """Generate n random unit vectors with placeholder metadata."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk_{i}" for i in range(n)]
+    documents = [f"def func_{i}():\n    pass" for i in range(n)]
+    metadatas = [{"file_path": f"mod_{i // 50}.py", "name": f"func_{i}", "line": 1, "type": "function"} for i in range(n)]
+    return ids, documents, vectors, metadatas
+
+
+def build(db_path, name, data, **options):
+    """Build an index and return the build time in seconds."""
+    ids, documents, vectors, metadatas = data
+    start = time.perf_counter()
+    store = create_backend(db_path, name, **options)
+    # ChromaDB caps the batch size of a single add
+    for i in range(0, len(ids), 5000):
+        store.add(ids[i:i + 5000], documents[i:i + 5000], vectors[i:i + 5000].tolist(), metadatas[i:i + 5000])
+    return time.perf_counter() - start
+
+
+def cold_start(db_path, dim, runs=3):
+    """Median time for a fresh interpreter to open the index and query once."""
+    times = []
+    for _ in range(runs):
+        script = COLD_START_SCRIPT.format(db_path=db_path, dim=dim)
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def query_latency(db_path, queries, n_results=10):
+    """Per-query latencies in milliseconds against an open index."""
+    store = open_backend(db_path)
+    store.query(queries[:1].tolist(), n_results)  # warm up
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        store.query([q.tolist()], n_results)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=50000, help="number of vectors")
+    parser.add_argument("--dim", type=int, default=384, help="vector dimension")
+    parser.add_argument("--queries", type=int, default=200, help="number of timed queries")
+    args = parser.parse_args()
+
+    data = synthesize(args.n, args.dim)
+    queries = synthesize(args.queries, args.dim, seed=1)[2]
+
+    configs = [
+        ("flat", {"dtype": "float32"}),
+        ("flat", {"dtype": "float16"}),
+        ("flat", {"dtype": "float16", "quantize": "int8"}),
+        ("flat", {"dtype": "float16", "quantize": "binary"}),
+        ("chroma", {}),
+    ]
+    print(f"{'backend':<24}{'build s':>10}{'cold s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, options in configs:
+        label = "/".join([name, *options.values()])
+        with tempfile.TemporaryDirectory() as db_path:
+            try:
+                build_time = build(db_path, name, data, **options)
+            except ImportError as e:
+                print(f"{label:<24}skipped ({e})")
+                continue
+            cold = cold_start(db_path, args.dim)
+            latencies = sorted(query_latency(db_path, queries))
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[int(len(latencies) * 0.95)]
+            print(f"{label:<24}{build_time:>10.2f}{cold:>10.3f}{p50:>10.2f}{p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
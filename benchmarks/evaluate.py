@@ -0,0 +1,296 @@
+"""Retrieval quality vs. latency evaluation against tests/test-repo.
+
+Runs every query of a fixture through each combination of embedding
+model, index backend, candidate pool size (fetch_count), rerank mode and
+lexical mode, and reports Recall@1/3/5, MRR and per-query latency.
+Queries take the path vec-search takes; with lexical off, the exact name
+short circuit and the fusion with identifier matches are skipped, which
+shows the recall they add. Configurations that
+no other configuration beats on both MRR and p50 latency form the Pareto
+frontier and are marked with *.
+
+The fixture is a JSON list of {"query": ..., "expected": [{"name": ...,
+"file": ...}]} objects, where file is relative to the repository and a
+query counts as found when any expected function is returned.
+
+Each (embedder, backend) index is built once with index_codebase in a
+temporary copy of the repository, reusing the embedding cache across
+backends; fetch_count, rerank and lexical variations reuse it.
+
+Usage:
+    python benchmarks/evaluate.py
+    python benchmarks/evaluate.py --backends chroma,flat,flat:int8,flat:binary --fetch 5,10,20 --rerank none,local
+    python benchmarks/evaluate.py --lexical on  # skip the vector-only baseline
+    python benchmarks/evaluate.py --write-results tests/test_results.txt  # first config, legacy report format
+"""
+
+import argparse
+import itertools
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TESTS_DIR = Path(__file__).resolve().parent.parent / "tests"
+DEFAULT_FIXTURE = TESTS_DIR / "eval_queries.json"
+DEFAULT_REPO = TESTS_DIR / "test-repo"
+N_RESULTS = 5
+
+
+def load_fixture(path):
+    """Load query -> expected function cases from a fixture file."""
+    cases = json.loads(Path(path).read_text())
+    for case in cases:
+        if not case.get("query") or not case.get("expected"):
+            raise ValueError(f"Fixture case needs 'query' and 'expected': {case}")
+    return cases
+
+
+def parse_backend(spec):
+    """Split a backend spec such as "flat:int8" into (name, options)."""
+    name, _, variant = spec.partition(":")
+    if name == "flat" and variant in ("float16",):
+        return name, {"dtype": variant}
+    if name == "flat" and variant in ("int8", "binary"):
+        return name, {"quantize": variant}
+    if variant or name not in ("chroma", "flat"):
+        raise ValueError(f"Unknown backend spec '{spec}'")
+    return name, {}
+
+
+def create_model(kind, name):
+    """Create an embedder or reranker by name ("remote" uses the model server)."""
+    from codevec import models
+    if kind == "embedder":
+        return models.RemoteEmbedder() if name == "remote" else models.LocalEmbedder(name)
+    if name == "none":
+        return None
+    if name == "remote":
+        return models.RemoteReranker()
+    return models.LocalReranker() if name == "local" else models.LocalReranker(name)
+
+
+def build_index(root, backend, embedder):
+    """Index a repository the way vec-index does and hold the result.
+
+    Builds after the first one for an embedder reuse its embedding cache.
+
+    Returns:
+        Tuple of (ReaderLease of the generation, opened store, lexical index)
+    """
+    from codevec import index
+    from codevec.backends import open_backend
+    from codevec.generations import acquire_reader
+    from codevec.lexical import open_lexical
+
+    name, options = parse_backend(backend)
+    if name == "flat":
+        # Explicit, so a variant never inherits the previous build's options
+        options = {"dtype": options.get("dtype", "float32"), "quantize": options.get("quantize", "none")}
+    index.set_embedder(embedder)
+    index.index_codebase(root, backend=name, by_reference=False, full=True, **options)
+    lease = acquire_reader(index.get_db_path(root))
+    return lease, open_backend(lease.path), open_lexical(lease.path)
+
+
+def expected_rank(results, expected, root):
+    """1-based rank of the first expected function in results, or None."""
+    targets = {(e["name"], str(Path(root) / e["file"])) for e in expected}
+    for rank, metadata in enumerate(results, start=1):
+        if (metadata["name"], metadata["file_path"]) in targets:
+            return rank
+    return None
+
+
+def run_query(query, index, embedder, reranker, fetch_count, lexical=True):
+    """Search for one query and return (ranked metadatas, stage timings in ms).
+
+    Follows vec-search: two-stage candidate files for large indexes and,
+    with lexical, the exact name short circuit and fusion with identifier
+    matches (see codevec.lexical).
+    """
+    from codevec.hierarchy import candidate_files
+    from codevec.lexical import exact_matches, fuse_candidates
+
+    lease, store, lexical_index = index
+    timings = {}
+    if lexical:
+        exact = exact_matches(store, lexical_index, query, N_RESULTS)
+        if exact is not None:
+            return exact["metadatas"], timings
+
+    start = time.perf_counter()
+    embedding = embedder.embed([query], task_type="query")[0]
+    timings["embed_ms"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    files = candidate_files(lease.path, embedding, store.count())
+    raw = store.query(query_embeddings=[embedding], n_results=fetch_count, files=files)
+    if lexical:
+        documents, metadatas, _ = fuse_candidates(store, lexical_index, query, embedding, raw, fetch_count)
+    else:
+        documents, metadatas = raw["documents"][0], raw["metadatas"][0]
+    timings["query_ms"] = (time.perf_counter() - start) * 1000
+
+    if reranker is not None and metadatas:
+        start = time.perf_counter()
+        ranks = reranker.rank(query, documents, return_documents=False)
+        timings["rerank_ms"] = (time.perf_counter() - start) * 1000
+        metadatas = [metadatas[r["corpus_id"]] for r in ranks]
+    return metadatas[:N_RESULTS], timings
+
+
+def evaluate(cases, root, index, embedder, reranker, fetch_count, lexical=True):
+    """Run all cases against one configuration.
+
+    Returns:
+        Tuple of (metrics dict, per-query result list)
+    """
+    run_query(cases[0]["query"], index, embedder, reranker, fetch_count, lexical)  # warm up
+    per_query = []
+    for case in cases:
+        start = time.perf_counter()
+        results, timings = run_query(case["query"], index, embedder, reranker, fetch_count, lexical)
+        total_ms = (time.perf_counter() - start) * 1000
+        per_query.append({
+            "query": case["query"],
+            "expected": case["expected"],
+            "rank": expected_rank(results, case["expected"], root),
+            "latency_ms": total_ms,
+            **timings,
+        })
+
+    ranks = [q["rank"] for q in per_query]
+    latencies = sorted(q["latency_ms"] for q in per_query)
+    metrics = {f"recall@{k}": sum(1 for r in ranks if r and r <= k) / len(ranks) for k in (1, 3, 5)}
+    metrics["mrr"] = sum(1 / r for r in ranks if r) / len(ranks)
+    metrics["p50_ms"] = statistics.median(latencies)
+    metrics["p95_ms"] = latencies[min(len(latencies) - 1, round(0.95 * (len(latencies) - 1)))]
+    for stage in ("embed_ms", "query_ms", "rerank_ms"):
+        values = [q[stage] for q in per_query if stage in q]
+        if values:
+            metrics[f"mean_{stage}"] = statistics.mean(values)
+    return metrics, per_query
+
+
+def pareto_frontier(rows):
+    """Indices of rows not dominated on (higher MRR, lower p50 latency)."""
+    frontier = []
+    for i, a in enumerate(rows):
+        dominated = any(
+            b["mrr"] >= a["mrr"] and b["p50_ms"] <= a["p50_ms"] and (b["mrr"] > a["mrr"] or b["p50_ms"] < a["p50_ms"])
+            for j, b in enumerate(rows) if j != i
+        )
+        if not dominated:
+            frontier.append(i)
+    return frontier
+
+
+def print_table(rows, frontier):
+    """Print one line per configuration, frontier rows marked with *."""
+    print("\n" + "-" * 120)
+    print(f"  {'embedder':<22}{'backend':<14}{'fetch':>6}{'rerank':>8}{'lexical':>8}"
+          f"{'R@1':>8}{'R@3':>8}{'R@5':>8}{'MRR':>8}{'p50 ms':>10}{'p95 ms':>10}{'rerank ms':>11}")
+    print("-" * 120)
+    for i, row in enumerate(rows):
+        mark = "*" if i in frontier else " "
+        print(f"{mark} {row['embedder'][-22:]:<22}{row['backend']:<14}{row['fetch_count']:>6}{row['rerank']:>8}{row['lexical']:>8}"
+              f"{row['recall@1']:>8.1%}{row['recall@3']:>8.1%}{row['recall@5']:>8.1%}{row['mrr']:>8.3f}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row.get('mean_rerank_ms', 0):>11.1f}")
+    print("-" * 120)
+    print("* Pareto frontier (no configuration has both higher MRR and lower p50 latency)")
+
+
+def write_results_report(path, per_query):
+    """Write per-query results in the tests/test_results.txt format."""
+    lines = ["SEMANTIC SEARCH TEST RESULTS", "=" * 80, f"Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}", ""]
+    for i, q in enumerate(per_query, start=1):
+        expected = q["expected"][0]
+        rank = q["rank"]
+        lines += [
+            f"Test {i}: {q['query']}",
+            f"  Expected: {expected['name']} in {expected['file']}",
+            f"  Found: {'Yes' if rank else 'No'}",
+        ]
+        if rank:
+            lines.append(f"  Rank: {rank}")
+        lines += [f"  Recall@{k}: {bool(rank and rank <= k)}" for k in (1, 3, 5)]
+        lines.append("")
+
+    total = len(per_query)
+    found = sum(1 for q in per_query if q["rank"])
+    lines += ["=" * 80, "SUMMARY", "=" * 80, f"Total tests: {total}", f"Found: {found} ({found / total:.1%})"]
+    for k in (1, 3, 5):
+        hits = sum(1 for q in per_query if q["rank"] and q["rank"] <= k)
+        lines.append(f"Recall@{k}: {hits} ({hits / total:.1%})")
+    Path(path).write_text("\n".join(lines) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixture", default=str(DEFAULT_FIXTURE), help="query -> expected function JSON")
+    parser.add_argument("--repo", default=str(DEFAULT_REPO), help="repository the fixture refers to")
+    parser.add_argument("--embedders", default="all-MiniLM-L6-v2",
+                        help="comma-separated embedding models (\"remote\" for the model server)")
+    parser.add_argument("--backends", default="chroma,flat",
+                        help="comma-separated backends: chroma, flat, flat:float16, flat:int8, flat:binary")
+    parser.add_argument("--fetch", default="10", help="comma-separated candidate pool sizes (fetch_count)")
+    parser.add_argument("--rerank", default="none,local",
+                        help="comma-separated rerank modes: none, local, remote or a cross-encoder model")
+    parser.add_argument("--lexical", default="off,on",
+                        help="comma-separated lexical modes: off (vector candidates only) or on (as vec-search)")
+    parser.add_argument("--output", help="JSON file to write all metrics and per-query results to")
+    parser.add_argument("--write-results", metavar="FILE", help="write the first configuration as a test_results.txt report")
+    args = parser.parse_args()
+
+    cases = load_fixture(args.fixture)
+    backends = args.backends.split(",")
+    fetch_counts = [int(n) for n in args.fetch.split(",")]
+    if min(fetch_counts) < N_RESULTS:
+        parser.error(f"--fetch values must be at least {N_RESULTS}")
+    for backend in backends:
+        parse_backend(backend)
+    rerankers = {name: create_model("reranker", name) for name in args.rerank.split(",")}
+    lexical_modes = args.lexical.split(",")
+    if set(lexical_modes) - {"off", "on"}:
+        parser.error("--lexical values must be off or on")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Index a copy so the fixture repository never gets a .codevec directory
+        root = str(Path(tmp, "repo").resolve())
+        shutil.copytree(args.repo, root, ignore=shutil.ignore_patterns(".codevec"))
+        for embedder_name in args.embedders.split(","):
+            embedder = create_model("embedder", embedder_name)
+            for backend in backends:
+                print(f"Indexing {args.repo} with {embedder_name}, {backend}...")
+                index = build_index(root, backend, embedder)
+                try:
+                    for fetch_count, (rerank_name, reranker), lexical in itertools.product(
+                            fetch_counts, rerankers.items(), lexical_modes):
+                        print(f"  {backend}, fetch {fetch_count}, rerank {rerank_name}, lexical {lexical}")
+                        metrics, per_query = evaluate(cases, root, index, embedder, reranker, fetch_count,
+                                                      lexical == "on")
+                        rows.append({"embedder": embedder_name, "backend": backend, "fetch_count": fetch_count,
+                                     "rerank": rerank_name, "lexical": lexical, **metrics, "queries": per_query})
+                finally:
+                    index[0].release()
+
+    frontier = pareto_frontier(rows)
+    print_table(rows, frontier)
+
+    if args.write_results:
+        write_results_report(args.write_results, rows[0]["queries"])
+        print(f"Report for the first configuration written to {args.write_results}")
+    if args.output:
+        for i, row in enumerate(rows):
+            row["pareto"] = i in frontier
+        Path(args.output).write_text(json.dumps({"fixture": args.fixture, "configs": rows}, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Indexing throughput and search latency benchmark suite.
+
+For each repository size, synthesizes a repository (see synth.py) and
+measures, each phase in a fresh interpreter so peak RSS is per phase:
+
+- index: model load, then index_codebase with per-stage throughput
+  (scan, embed, coarse, store, lexical, publish) from its profiling spans
+- search (warm): p50/p95/p99 latency of search_code in a loaded process
+- search (cold): p50/p95/p99 wall time of a fresh process running one search
+
+Results are written as JSON. With --compare, each metric is checked
+against a stored baseline and regressions beyond --threshold are flagged
+(exit status 1).
+
+Usage:
+    python benchmarks/run.py --sizes 1000,10000 --output results.json
+    python benchmarks/run.py --sizes 1000,10000 --compare baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from synth import synthesize_repo  # noqa: E402
+
+QUERIES_FILE = Path(__file__).resolve().parent.parent / "tests" / "eval_queries.json"
+
+# Metrics where a higher value is better; all others are lower-is-better
+HIGHER_IS_BETTER = ("_per_s",)
+
+
+def benchmark_queries():
+    """Queries from the retrieval evaluation fixture."""
+    return [case["query"] for case in json.loads(QUERIES_FILE.read_text())]
+
+
+def percentiles(samples):
+    """Return p50/p95/p99 (nearest rank) of samples in milliseconds."""
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+    return {"p50_ms": pick(50), "p95_ms": pick(95), "p99_ms": pick(99)}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def rate(count, seconds):
+    """Items per second, or 0 when nothing was timed (an empty repository)."""
+    return count / seconds if seconds else 0.0
+
+
+def phase_index(root, backend):
+    """Build an index with index_codebase and report per-stage throughput.
+
+    Stage times come from the profiling spans index_codebase records, so
+    every stage of a real build is covered, including the coarse and
+    lexical indexes. No progress callback is passed: it makes the build
+    embed in smaller batches than a plain vec-index does.
+    """
+    from codevec import profiling
+    start = time.perf_counter()
+    from codevec import index
+    index.get_embedder()
+    load_s = time.perf_counter() - start
+
+    profiling.enable()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        functions = index.index_codebase(root, backend=backend, full=True)
+    total_s = time.perf_counter() - start
+    stages = profiling.stage_totals()
+    files = sum(1 for _ in index.walk_codebase(root))
+
+    return {
+        "files": files,
+        "functions": functions,
+        "model_load_s": load_s,
+        "scan_files_per_s": rate(files, stages.get("scan and parse files", 0)),
+        "embed_functions_per_s": rate(functions, stages.get("embed chunks", 0)),
+        "coarse_s": stages.get("build coarse vectors", 0.0),
+        "store_functions_per_s": rate(functions, stages.get("store embeddings", 0)),
+        "lexical_functions_per_s": rate(functions, stages.get("build lexical index", 0)),
+        "publish_s": stages.get("publish generation", 0.0),
+        "index_total_s": total_s,
+        "index_peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def phase_search(root, rounds):
+    """Time search_code repeatedly in one loaded process."""
+    from codevec.search import search_code
+    queries = benchmark_queries()
+    with contextlib.redirect_stdout(io.StringIO()):
+        search_code(queries[0], root_path=root)  # warm up caches
+        latencies = []
+        for _ in range(rounds):
+            for query in queries:
+                start = time.perf_counter()
+                search_code(query, root_path=root)
+                latencies.append((time.perf_counter() - start) * 1000)
+    return {**{f"search_warm_{k}": v for k, v in percentiles(latencies).items()}, "search_peak_rss_mb": peak_rss_mb()}
+
+
+def run_phase(phase, root, **kwargs):
+    """Run a phase in a fresh interpreter and return its JSON result."""
+    cmd = [sys.executable, __file__, "--phase", phase, "--root", str(root)]
+    for key, value in kwargs.items():
+        cmd += [f"--{key}", str(value)]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def cold_search(root, runs):
+    """Wall time of fresh processes that each import codevec and search once."""
+    queries = benchmark_queries()
+    script = "import sys; from codevec.search import search_code; search_code(sys.argv[1], root_path=sys.argv[2])"
+    latencies = []
+    for i in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", script, queries[i % len(queries)], str(root)],
+                       capture_output=True, check=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {f"search_cold_{k}": v for k, v in percentiles(latencies).items()}
+
+
+def compare(results, baseline, threshold):
+    """Compare results against a baseline.
+
+    Args:
+        results: Current results dict
+        baseline: Baseline results dict
+        threshold: Allowed relative slowdown (0.1 = 10%)
+
+    Returns:
+        List of regression descriptions
+    """
+    regressions = []
+    for size, metrics in results["results"].items():
+        for name, value in metrics.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not isinstance(base, (int, float)) or not base or name in ("files", "functions"):
+                continue
+            change = (value - base) / base
+            worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+            if worse > threshold:
+                regressions.append(f"{size} functions: {name} {base:.4g} -> {value:.4g} ({worse:+.0%} worse)")
+    return regressions
+
+
+def environment(backend):
+    """Describe the machine and code version the results were produced on."""
+    commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                            cwd=Path(__file__).resolve().parent).stdout.strip()
+    return {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "backend": backend,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated function counts")
+    parser.add_argument("--backend", default="chroma", choices=["chroma", "flat"])
+    parser.add_argument("--rounds", type=int, default=3, help="warm search passes over the query set")
+    parser.add_argument("--cold-runs", type=int, default=10, help="fresh-process searches per size")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to write")
+    parser.add_argument("--compare", metavar="BASELINE", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression")
+    parser.add_argument("--phase", choices=["index", "search"], help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase == "index":
+        print(json.dumps(phase_index(args.root, args.backend)))
+        return
+    if args.phase == "search":
+        print(json.dumps(phase_search(args.root, args.rounds)))
+        return
+
+    results = {"environment": environment(args.backend), "results": {}}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as root:
+            print(f"[{size} functions] synthesizing repository...")
+            synthesize_repo(root, size)
+            print(f"[{size} functions] indexing...")
+            metrics = run_phase("index", root, backend=args.backend)
+            print(f"[{size} functions] searching...")
+            metrics.update(run_phase("search", root, rounds=args.rounds))
+            metrics.update(cold_search(root, args.cold_runs))
+        results["results"][str(size)] = metrics
+        for name, value in metrics.items():
+            print(f"    {name:<28}{value:>12.2f}")
+
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  REGRESSION {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Synthesize Python repositories of configurable size for benchmarking.
+
+Functions are taken from tests/test-repo and replicated with renamed
+definitions, so every copy has distinct source (and a distinct content
+hash) while keeping realistic size and vocabulary.
+
+Usage:
+    python benchmarks/synth.py <output-dir> --functions 10000
+"""
+
+import argparse
+import ast
+import textwrap
+from pathlib import Path
+
+TEST_REPO = Path(__file__).resolve().parent.parent / "tests" / "test-repo"
+FUNCTIONS_PER_FILE = 25
+FILES_PER_PACKAGE = 40
+
+
+def template_functions(repo=TEST_REPO):
+    """Collect (name, dedented source) for every function in the template repo."""
+    templates = []
+    for py_file in sorted(repo.rglob("*.py")):
+        content = py_file.read_text(encoding="utf-8")
+        lines = content.splitlines()
+        for node in ast.walk(ast.parse(content)):
+            if isinstance(node, ast.FunctionDef):
+                source = "\n".join(lines[node.lineno - 1:node.end_lineno])
+                templates.append((node.name, textwrap.dedent(source)))
+    return templates
+
+
+def synthesize_repo(output_dir, n_functions):
+    """Write a repository containing n_functions functions.
+
+    Args:
+        output_dir: Directory to create the repository in
+        n_functions: Total number of functions to generate
+
+    Returns:
+        Number of files written
+    """
+    templates = template_functions()
+    output_dir = Path(output_dir)
+    files = 0
+    for start in range(0, n_functions, FUNCTIONS_PER_FILE):
+        package = output_dir / f"pkg_{files // FILES_PER_PACKAGE:04d}"
+        package.mkdir(parents=True, exist_ok=True)
+        parts = [f'"""Synthetic module {files}"""\n']
+        for i in range(start, min(start + FUNCTIONS_PER_FILE, n_functions)):
+            name, source = templates[i % len(templates)]
+            variant = i // len(templates)
+            parts.append(f"# variant {variant}\n" + source.replace(f"def {name}(", f"def {name}_v{variant}(", 1) + "\n")
+        (package / f"mod_{files % FILES_PER_PACKAGE:03d}.py").write_text("\n".join(parts), encoding="utf-8")
+        files += 1
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="directory to create")
+    parser.add_argument("--functions", type=int, default=10000, help="number of functions")
+    args = parser.parse_args()
+    files = synthesize_repo(args.output, args.functions)
+    print(f"Wrote {args.functions} functions in {files} files to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,12 @@ def __getattr__(name):
     elif name == "run_server":
         from .cli import run_server
         return run_server
+    elif name == "CodeVecIndex":
+        from .api import CodeVecIndex
+        return CodeVecIndex
+    elif name == "SearchResult":
+        from .api import SearchResult
+        return SearchResult
     raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ["indexer", "searcher", "show_help", "run_server", "__version__"]
\ No newline at end of file
+__all__ = ["indexer", "searcher", "show_help", "run_server", "CodeVecIndex", "SearchResult", "__version__"]
\ No newline at end of file
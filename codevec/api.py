@@ -0,0 +1,289 @@
+"""In-process Python API for services that search code.
+
+search_code and index_codebase are command-line helpers: they print,
+exit on errors and open the index on every call. CodeVecIndex opens a
+repository's index once and keeps it, together with the process-wide
+embedder and reranker, so a long-running service pays no setup cost per
+search:
+
+    index = CodeVecIndex("/path/to/repo")
+    for result in index.search("email validation"):
+        print(result.file_path, result.line, result.rerank_score)
+
+A CodeVecIndex can be shared by any number of threads. Searches work on
+a snapshot of the open index (which also keeps its generation from being
+collected), and update() and refresh() swap in a new snapshot without
+blocking searches already in flight.
+"""
+
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from codevec.backends import open_backend
+from codevec.generations import acquire_reader, current_generation
+from codevec.hierarchy import candidate_files
+from codevec.lexical import batch_candidates, exact_matches, fuse_candidates, open_lexical
+from codevec.models import RemoteEmbedder, base_model, create_reranker
+from codevec.sources import load_sources
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker():
+    """Return the process-wide reranker, creating it on first use."""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = create_reranker()
+    return _reranker
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    """One function found by a search.
+
+    Attributes:
+        file_path: Absolute path of the function's file
+        name: Function name
+        line: Line the function starts on
+        code: Function source
+        similarity: Cosine similarity of the function to the query, or
+            None for an exact name match
+        rerank_score: Cross-encoder score, or None if not reranked
+    """
+
+    file_path: str
+    name: str
+    line: int
+    code: str
+    similarity: Optional[float]
+    rerank_score: Optional[float]
+
+
+class _Snapshot:
+    """An open generation of the index: the store and lexical index, the
+    lease holding them and the embedder for its model.
+
+    Published generations are never modified, so a snapshot's lazily read
+    files (such as flat documents) stay consistent with what it opened.
+    """
+
+    def __init__(self, lease, store, query_embedder):
+        self.lease = lease
+        self.store = store
+        self.lexical = open_lexical(lease.path)
+        self.query_embedder = query_embedder
+        self.by_reference = store.manifest.get("source") == "reference"
+
+    def documents(self, raw_documents, metadatas):
+        if self.by_reference:
+            return load_sources(metadatas, self.lease.path)
+        return raw_documents
+
+
+class CodeVecIndex:
+    """A repository's index, opened once and searched from any thread.
+
+    Args:
+        root_path: Root of an indexed repository
+
+    Raises:
+        FileNotFoundError: If the repository has no index
+        ValueError: If the index was built with an embedding model that
+            isn't available here
+    """
+
+    def __init__(self, root_path):
+        from codevec.index import get_embedder
+
+        self.root_path = str(Path(root_path).resolve())
+        self.db_path = Path(self.root_path) / ".codevec"
+        if not self.db_path.is_dir():
+            raise FileNotFoundError(f"No index found at {self.db_path} (run vec-index first)")
+        self.embedder = get_embedder()
+        self.reranker = get_reranker()
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._snapshot = self._open()
+
+    def _open(self):
+        lease = acquire_reader(self.db_path)
+        try:
+            store = open_backend(lease.path)
+        except Exception as e:
+            lease.release()
+            raise FileNotFoundError(f"Could not load index at {self.db_path}") from e
+
+        model = store.manifest.get("model")
+        # Runtimes of one model are interchangeable for queries
+        if model is not None and base_model(model) != base_model(self.embedder.model_name):
+            if not isinstance(self.embedder, RemoteEmbedder):
+                lease.release()
+                raise ValueError(f"Index at {self.db_path} was built with {model}, not {self.embedder.model_name}")
+            # The model server loads the index's model on request
+            return _Snapshot(lease, store, RemoteEmbedder(self.embedder.url, model_name=base_model(model)))
+        return _Snapshot(lease, store, self.embedder)
+
+    def _current(self):
+        with self._lock:
+            if self._snapshot is None:
+                raise RuntimeError(f"Index at {self.db_path} is closed")
+            return self._snapshot
+
+    def _swap(self):
+        snapshot = self._open()
+        with self._lock:
+            self._snapshot = snapshot
+        # The old lease is released once the last search using it finishes
+
+    def refresh(self):
+        """Reopen the index if another process published a new generation.
+
+        Returns:
+            True if the index was reopened
+        """
+        with self._update_lock:
+            if current_generation(self.db_path) == self._current().lease.path:
+                return False
+            self._swap()
+            return True
+
+    def count(self):
+        """Return the number of indexed functions."""
+        return self._current().store.count()
+
+    def search(self, query, n_results=5, modules=None, rerank=True):
+        """Search the index for functions matching a query.
+
+        Args:
+            query: Natural language search query
+            n_results: Number of results to return
+            modules: Modules and classes searched on large indexes (see
+                codevec.hierarchy; default: automatic, 0: all functions)
+            rerank: Reorder the candidates with the cross-encoder
+
+        Returns:
+            List of SearchResult, best first; a query naming at most
+            n_results functions exactly returns just those (see
+            codevec.lexical)
+        """
+        snapshot = self._current()
+        exact = exact_matches(snapshot.store, snapshot.lexical, query, n_results)
+        if exact is not None:
+            documents = snapshot.documents(exact['documents'], exact['metadatas'])
+            return self._results(documents, exact['metadatas'], [None] * len(documents), None, n_results)
+
+        query_embedding = snapshot.query_embedder.embed([query], task_type="query")[0]
+        files = candidate_files(snapshot.lease.path, query_embedding, snapshot.store.count(), modules)
+        fetch_count = n_results * 2
+        raw_results = snapshot.store.query(query_embeddings=[query_embedding], n_results=fetch_count, files=files)
+        documents, metadatas, distances = fuse_candidates(snapshot.store, snapshot.lexical, query, query_embedding,
+                                                          raw_results, fetch_count)
+        if not metadatas:
+            return []
+        documents = snapshot.documents(documents, metadatas)
+        ranks = self.reranker.rank(query, documents, return_documents=False) if rerank else None
+        return self._results(documents, metadatas, distances, ranks, n_results)
+
+    def search_many(self, queries, n_results=5, batch_size=256):
+        """Search the index for many queries at once.
+
+        Each query gets the results search() would give it with rerank
+        on. Each batch of queries is embedded in one call, looked up with
+        one multi-vector query and reranked with all pairs scored together
+        (see codevec.search.search_many).
+
+        Args:
+            queries: Natural language search queries
+            n_results: Number of results per query
+            batch_size: Queries per batch
+
+        Returns:
+            List with a list of SearchResult for each query
+        """
+        snapshot = self._current()
+        all_results = []
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            results = [None] * len(batch)
+            for i, query in enumerate(batch):
+                exact = exact_matches(snapshot.store, snapshot.lexical, query, n_results)
+                if exact is not None:
+                    documents = snapshot.documents(exact['documents'], exact['metadatas'])
+                    results[i] = self._results(documents, exact['metadatas'], [None] * len(documents), None,
+                                               n_results)
+
+            pending = [i for i, result in enumerate(results) if result is None]
+            if pending:
+                pending_queries = [batch[i] for i in pending]
+                query_embeddings = snapshot.query_embedder.embed(pending_queries, task_type="query")
+                candidates = batch_candidates(snapshot.store, snapshot.lexical, snapshot.lease.path, pending_queries,
+                                              query_embeddings, n_results * 2)
+                documents = [snapshot.documents(docs, metas) for docs, metas, _ in candidates]
+                found = [j for j, (_, metas, _) in enumerate(candidates) if metas]
+                rankings = self.reranker.rank_many([pending_queries[j] for j in found],
+                                                   [documents[j] for j in found]) if found else []
+                for j in range(len(pending)):
+                    results[pending[j]] = []
+                for j, ranks in zip(found, rankings):
+                    _, metadatas, distances = candidates[j]
+                    results[pending[j]] = self._results(documents[j], metadatas, distances, ranks, n_results)
+            all_results.extend(results)
+        return all_results
+
+    @staticmethod
+    def _results(documents, metadatas, distances, ranks, n_results):
+        if ranks is None:
+            ranks = [{'corpus_id': i, 'score': None} for i in range(len(documents))]
+        return [
+            SearchResult(
+                file_path=metadatas[r['corpus_id']]['file_path'],
+                name=metadatas[r['corpus_id']]['name'],
+                line=metadatas[r['corpus_id']]['line'],
+                code=documents[r['corpus_id']],
+                similarity=None if distances[r['corpus_id']] is None else 1 - float(distances[r['corpus_id']]),
+                rerank_score=None if r['score'] is None else float(r['score']),
+            )
+            for r in ranks[:n_results]
+        ]
+
+    def update(self, paths, renamed=()):
+        """Re-index files and start searching the updated index.
+
+        The update is published as a new generation (see
+        codevec.index.update_index); searches already in flight finish on
+        the previous one.
+
+        Args:
+            paths: Changed, added or deleted files, absolute or relative
+                to the repository root
+            renamed: (old, new) path pairs whose content is unchanged
+
+        Returns:
+            Number of functions indexed from the updated files
+        """
+        from codevec.index import update_index
+
+        root = Path(self.root_path)
+        paths = [str((root / p).resolve()) for p in paths]
+        renamed = [(str((root / old).resolve()), str((root / new).resolve())) for old, new in renamed]
+        with self._update_lock:
+            count = update_index(self.root_path, paths, renamed)
+            self._swap()
+        return count
+
+    def close(self):
+        """Release the open index; searches after this fail."""
+        with self._lock:
+            snapshot, self._snapshot = self._snapshot, None
+        if snapshot is not None:
+            snapshot.lease.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,934 @@
+"""Storage backends for CodeVec indexes.
+
+A backend stores function embeddings alongside their source and metadata
+inside the .codevec directory, and answers nearest-neighbour queries.
+Two implementations are provided:
+
+- ChromaBackend: ChromaDB persistent collection (SQLite + HNSW)
+- FlatBackend: exact brute-force search over a memory-mapped NumPy matrix
+
+Both expose the same duck-typed interface (create, open, add, delete_files,
+replace_files, rename_file, query, count)
+and return query results in ChromaDB's nested-list layout, so callers can
+treat them interchangeably.
+"""
+
+import json
+import os
+import shutil
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+from codevec.profiling import span
+
+MANIFEST_NAME = "manifest.json"
+COLLECTION_NAME = "code_index"
+
+
+def read_manifest(db_path):
+    """Read the index manifest describing how an index was built.
+
+    Indexes created before manifests existed are ChromaDB indexes, so a
+    missing manifest is reported as a chroma backend.
+
+    Args:
+        db_path: Path to the .codevec directory
+
+    Returns:
+        Manifest dictionary (always contains a 'backend' key)
+    """
+    manifest_path = Path(db_path) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {"backend": "chroma"}
+    return json.loads(manifest_path.read_text())
+
+
+def update_manifest(db_path, **fields):
+    """Merge fields into the existing index manifest.
+
+    Args:
+        db_path: Path to the .codevec directory
+        **fields: Manifest entries to set
+    """
+    write_manifest(db_path, {**read_manifest(db_path), **fields})
+
+
+def write_manifest(db_path, manifest):
+    """Write the index manifest atomically.
+
+    Args:
+        db_path: Path to the .codevec directory
+        manifest: Dictionary to store
+    """
+    Path(db_path).mkdir(parents=True, exist_ok=True)
+    tmp = Path(db_path) / f"{MANIFEST_NAME}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, Path(db_path) / MANIFEST_NAME)
+
+
+class ChromaBackend:
+    """Vector storage in a ChromaDB persistent collection.
+
+    ChromaDB is imported lazily so that flat indexes never pay its
+    import and startup cost.
+    """
+
+    name = "chroma"
+
+    def __init__(self, path: str):
+        """Connect to the ChromaDB store at path.
+
+        Args:
+            path: Directory holding the ChromaDB files
+        """
+        with span("import chromadb"):
+            import chromadb
+        self.path = path
+        with span("open chroma client"):
+            self.client = chromadb.PersistentClient(path=path, settings=chromadb.Settings(anonymized_telemetry=False))
+        self.collection = None
+
+    def create(self):
+        """Create a fresh collection, deleting an existing one if present."""
+        try:
+            self.client.delete_collection(COLLECTION_NAME)
+        except Exception:
+            pass  # Collection doesn't exist yet
+        self.collection = self.client.create_collection(name=COLLECTION_NAME)
+
+    def open(self):
+        """Open the existing collection.
+
+        Raises:
+            Exception: If the collection does not exist
+        """
+        with span("open chroma collection"):
+            self.collection = self.client.get_collection(COLLECTION_NAME)
+
+    def add(self, ids, documents, embeddings, metadatas):
+        """Add embeddings with their documents (or None) and metadata."""
+        self.collection.add(
+            ids=ids,
+            documents=documents,
+            embeddings=embeddings,
+            metadatas=metadatas
+        )
+
+    def delete_files(self, file_paths):
+        """Remove every entry whose file_path is in file_paths."""
+        self.collection.delete(where={"file_path": {"$in": list(file_paths)}})
+
+    def replace_files(self, file_paths, ids, documents, embeddings, metadatas):
+        """Replace every entry of file_paths with the given entries.
+
+        The new entries are added before the old ones are deleted, so a
+        search of a store updated in place never misses a file.
+        """
+        old_ids = self.collection.get(where={"file_path": {"$in": list(file_paths)}}, include=[])["ids"]
+        if ids:
+            self.add(ids, documents, embeddings, metadatas)
+        if old_ids:
+            self.collection.delete(ids=old_ids)
+
+    def rename_file(self, old_path, new_path):
+        """Point every entry of old_path at new_path, keeping its embedding."""
+        entries = self.collection.get(where={"file_path": old_path}, include=["metadatas"])
+        if not entries["ids"]:
+            return
+        metadatas = [{**m, "file_path": new_path} for m in entries["metadatas"]]
+        self.collection.update(ids=entries["ids"], metadatas=metadatas)
+
+    def query(self, query_embeddings, n_results, files=None):
+        """Return the nearest neighbours of each query embedding.
+
+        Args:
+            query_embeddings: List of query vectors
+            n_results: Number of neighbours per query
+            files: Only consider entries of these file paths (default: all)
+
+        Returns:
+            Dict with 'ids', 'documents', 'metadatas' and 'distances',
+            each a list with one entry per query
+        """
+        where = {"file_path": {"$in": list(files)}} if files is not None else None
+        with span("chroma query"):
+            return self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where
+            )
+
+    def get(self, ids):
+        """Return stored entries by id.
+
+        Args:
+            ids: Ids of the entries; unknown ids are skipped
+
+        Returns:
+            Dict with 'ids', 'documents', 'metadatas' and a float32
+            'embeddings' matrix, in the order of ids
+        """
+        results = self.collection.get(ids=list(ids), include=["documents", "embeddings", "metadatas"])
+        position = {id_: i for i, id_ in enumerate(results["ids"])}
+        rows = [position[id_] for id_ in ids if id_ in position]
+        return {
+            "ids": [results["ids"][i] for i in rows],
+            "documents": [results["documents"][i] for i in rows],
+            "metadatas": [results["metadatas"][i] for i in rows],
+            "embeddings": np.asarray([results["embeddings"][i] for i in rows], dtype=np.float32),
+        }
+
+    def count(self):
+        """Return the number of stored embeddings."""
+        return self.collection.count()
+
+    def sample(self, limit):
+        """Return stored documents and metadata without a query.
+
+        Args:
+            limit: Maximum number of entries
+
+        Returns:
+            Tuple of (documents, metadatas) lists
+        """
+        results = self.collection.get(limit=limit, include=["documents", "metadatas"])
+        return results["documents"], results["metadatas"]
+
+    def entries(self):
+        """Return every stored entry.
+
+        Returns:
+            Tuple of (documents, float32 embedding matrix, metadatas)
+        """
+        results = self.collection.get(include=["documents", "embeddings", "metadatas"])
+        embeddings = np.asarray(results["embeddings"], dtype=np.float32)
+        return results["documents"], embeddings, results["metadatas"]
+
+    def entry_batches(self, batch_size):
+        """Yield every stored entry in batches, so callers can bound memory.
+
+        Args:
+            batch_size: Entries per batch
+
+        Yields:
+            Tuples of (documents, float32 embedding matrix, metadatas)
+        """
+        for offset in range(0, self.count(), batch_size):
+            results = self.collection.get(limit=batch_size, offset=offset,
+                                          include=["documents", "embeddings", "metadatas"])
+            if not results["ids"]:
+                return  # Entries deleted by a concurrent update
+            yield results["documents"], np.asarray(results["embeddings"], dtype=np.float32), results["metadatas"]
+
+
+class FlatBackend:
+    """Exact vector search over a memory-mapped NumPy matrix.
+
+    Vectors are stored row-wise in vectors.npy and opened with mmap, so
+    opening an index costs a header read and pages are loaded on demand.
+    Metadata is kept column-wise in metadata.json, with the row ranges of
+    each file, and function source in
+    documents.json, which is only read once results are returned.
+
+    With quantization enabled, compact codes are stored in codes.npy and
+    scanned first (int8 dot products or binary Hamming distances); only a
+    shortlist of candidates is then rescored against the full vectors, so
+    a query pages in a fraction of the index.
+
+    Distances are squared L2 between normalized vectors (2 - 2 * cosine),
+    matching ChromaDB's default space so scores are comparable across
+    backends.
+
+    Only the first add to an empty store writes the main files. Later
+    changes go to a small delta store (delta/) and a list of deleted rows
+    (deleted.npy), so an incremental update writes only the rows it
+    changes; queries merge both. They are compacted into the main files
+    once they outgrow COMPACT_FRACTION of the index.
+    """
+
+    name = "flat"
+
+    # Every file is replaced on save, never modified in place, so
+    # generations can share them (see codevec.generations.clone_generation)
+    FILES = ("vectors.npy", "metadata.json", "documents.json", "codes.npy", "scales.npy", "deleted.npy", "delta")
+
+    # Pending delta and deleted rows, as a share of the main rows, that trigger a compaction
+    COMPACT_FRACTION = 0.1
+    COMPACT_MIN_ROWS = 2000
+
+    # Rows converted to float32 per matmul when scanning float16 or int8 data;
+    # small blocks stay cache-resident and bound the working set
+    BLOCK_ROWS = 4096
+
+    # Shortlist size, as a multiple of n_results, rescored at full precision
+    RESCORE_FACTOR = {"int8": 4, "binary": 20}
+
+    def __init__(self, path: str, dtype: str = "float32", quantize: str = None):
+        """Initialize a flat store rooted at path.
+
+        Args:
+            path: Directory holding the flat index files
+            dtype: Storage precision for vectors ("float32" or "float16")
+            quantize: Optional first-pass quantization ("int8" or "binary")
+        """
+        if quantize not in (None, *self.RESCORE_FACTOR):
+            raise ValueError(f"Unknown quantization {quantize!r}. Choose from: {', '.join(self.RESCORE_FACTOR)}")
+        self.path = Path(path)
+        self.dtype = dtype
+        self.quantize = quantize
+        self.vectors = None
+        self.codes = None
+        self.scales = None
+        self.ids = []
+        self.columns = {}
+        self._documents = None
+        self._file_ranges = None
+        self._id_rows = None
+        self.delta = None
+        self.deleted = np.zeros(0, dtype=np.int64)
+        self._alive = None
+
+    @property
+    def vectors_path(self):
+        return self.path / "vectors.npy"
+
+    @property
+    def metadata_path(self):
+        return self.path / "metadata.json"
+
+    @property
+    def documents_path(self):
+        return self.path / "documents.json"
+
+    @property
+    def codes_path(self):
+        return self.path / "codes.npy"
+
+    @property
+    def scales_path(self):
+        return self.path / "scales.npy"
+
+    @property
+    def deleted_path(self):
+        return self.path / "deleted.npy"
+
+    @property
+    def delta_path(self):
+        return self.path / "delta"
+
+    def create(self):
+        """Create an empty store, replacing any existing files."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.vectors = np.zeros((0, 0), dtype=self.dtype)
+        self.ids = []
+        self.columns = {}
+        self._documents = []
+        self._save()
+        self._drop_changes()
+
+    def open(self):
+        """Open an existing store.
+
+        Raises:
+            FileNotFoundError: If the store has not been created
+        """
+        if not self.metadata_path.exists():
+            raise FileNotFoundError(f"No flat index at {self.path}")
+        with span("open flat index"):
+            self._open()
+
+    def _open(self):
+        """Map vectors and codes and load metadata."""
+        # Metadata is written last, so retry if an update lands mid-open
+        for _ in range(3):
+            self.vectors = np.load(self.vectors_path, mmap_mode="r")
+            meta = json.loads(self.metadata_path.read_text())
+            if len(meta["ids"]) == len(self.vectors):
+                break
+        self.ids = meta["ids"]
+        self.columns = meta["columns"]
+        # Stored since indexes have had file row ranges; older ones compute them on first use
+        self._file_ranges = meta.get("file_rows")
+        self._documents = None
+        self._id_rows = None
+        self.dtype = str(self.vectors.dtype)
+        if self.quantize and self.ids:
+            self.codes = np.load(self.codes_path, mmap_mode="r")
+            if self.quantize == "int8":
+                self.scales = np.load(self.scales_path)
+        self.deleted = np.load(self.deleted_path) if self.deleted_path.exists() else np.zeros(0, dtype=np.int64)
+        self._alive = None
+        self.delta = None
+        if (self.delta_path / "metadata.json").exists():
+            self.delta = _DeltaStore(self.delta_path, self.dtype)
+            self.delta._open()
+
+    def add(self, ids, documents, embeddings, metadatas):
+        """Add embeddings with their documents (or None) and metadata.
+
+        The first add to an empty store writes the main files; later ones
+        go to the delta store.
+        """
+        if not ids:
+            return
+        if len(self.ids) or self.delta is not None:
+            self._delta_store().add(ids, documents, embeddings, metadatas)
+            self._compact_if_needed()
+            return
+        self._append(ids, documents, embeddings, metadatas)
+
+    def delete_files(self, file_paths):
+        """Remove every entry whose file_path is in file_paths.
+
+        Rows of the main files are only marked as deleted.
+        """
+        if self.delta is not None:
+            self.delta.delete_files(file_paths)
+        rows = self.rows_of_files(file_paths)
+        if len(rows):
+            self._delete_rows(rows)
+            self._compact_if_needed()
+
+    def replace_files(self, file_paths, ids, documents, embeddings, metadatas):
+        """Replace every entry of file_paths with the given entries."""
+        self.delete_files(file_paths)
+        self.add(ids, documents, embeddings, metadatas)
+
+    def rename_file(self, old_path, new_path):
+        """Point every entry of old_path at new_path, keeping its embedding.
+
+        Rows of the main files move to the delta store under the new path,
+        so the main metadata isn't rewritten.
+        """
+        if self.delta is not None:
+            self.delta.rename_file(old_path, new_path)
+        rows = self.rows_of_files([old_path])
+        if not len(rows):
+            return
+        documents = self.documents
+        self._delta_store().add(
+            ids=[self.ids[row] for row in rows],
+            documents=[documents[row] for row in rows],
+            embeddings=np.asarray(self.vectors[rows]),
+            metadatas=[{**self.metadata(row), "file_path": new_path} for row in rows],
+        )
+        self._delete_rows(rows)
+        self._compact_if_needed()
+
+    def compact(self):
+        """Merge the delta store and deleted rows into the main files."""
+        with span("compact flat index"):
+            rows = np.flatnonzero(self._alive_rows()) if len(self.deleted) else np.arange(len(self.ids))
+            documents = self.documents
+            ids = [self.ids[row] for row in rows]
+            documents = [documents[row] for row in rows]
+            metadatas = [self.metadata(row) for row in rows]
+            vectors = np.asarray(self.vectors[rows])
+            if self.delta is not None:
+                ids += self.delta.ids
+                documents += self.delta.documents
+                metadatas += [self.delta.metadata(row) for row in range(len(self.delta.ids))]
+                vectors = np.concatenate([vectors, np.asarray(self.delta.vectors)]) if len(vectors) else self.delta.vectors
+
+            self.vectors = np.zeros((0, 0), dtype=self.dtype)
+            self.ids = []
+            self.columns = {}
+            self._documents = []
+            if ids:
+                self._append(ids, documents, vectors, metadatas)
+            else:
+                self._save()
+            self._drop_changes()
+
+    def _compact_if_needed(self):
+        pending = len(self.deleted) + (len(self.delta.ids) if self.delta is not None else 0)
+        if pending > max(self.COMPACT_MIN_ROWS, self.COMPACT_FRACTION * len(self.ids)):
+            self.compact()
+
+    def _delta_store(self):
+        """Return the delta store, creating it on first use."""
+        if self.delta is None:
+            self.delta = _DeltaStore(self.delta_path, self.dtype)
+            self.delta.create()
+        return self.delta
+
+    def _delete_rows(self, rows):
+        """Mark rows of the main files as deleted."""
+        self.deleted = np.union1d(self.deleted, rows).astype(np.int64)
+        self._replace(self.deleted_path, lambda f: np.save(f, self.deleted))
+        self._alive = None
+        self._id_rows = None
+
+    def _drop_changes(self):
+        """Remove the delta store and deleted rows, once merged or replaced."""
+        shutil.rmtree(self.delta_path, ignore_errors=True)
+        self.deleted_path.unlink(missing_ok=True)
+        self.delta = None
+        self.deleted = np.zeros(0, dtype=np.int64)
+        self._alive = None
+        self._id_rows = None
+
+    def _alive_rows(self):
+        """Boolean mask of the main rows not marked as deleted, or None if all are."""
+        if self._alive is None and len(self.deleted):
+            self._alive = np.ones(len(self.ids), dtype=bool)
+            self._alive[self.deleted] = False
+        return self._alive
+
+    def _append(self, ids, documents, embeddings, metadatas):
+        """Append rows to the main files, rewriting them."""
+        new_vectors = np.asarray(embeddings, dtype=self.dtype)
+        if len(self.ids):
+            new_vectors = np.concatenate([np.asarray(self.vectors), new_vectors])
+
+        existing = len(self.ids)
+        for key in {k for m in metadatas for k in m} | set(self.columns):
+            column = self.columns.setdefault(key, [None] * existing)
+            column.extend(m.get(key) for m in metadatas)
+
+        self.vectors = new_vectors
+        self.ids = self.ids + list(ids)
+        self._documents = self.documents + (list(documents) if documents is not None else [None] * len(ids))
+        self._save()
+
+    def _remove_files(self, file_paths):
+        """Remove the rows of file_paths from the main files, rewriting them."""
+        file_paths = set(file_paths)
+        paths = self.columns.get("file_path", [])
+        keep = [row for row, path in enumerate(paths) if path not in file_paths]
+        if len(keep) == len(self.ids):
+            return
+        documents = self.documents
+        self.vectors = np.asarray(self.vectors)[keep] if keep else np.zeros((0, 0), dtype=self.dtype)
+        self.ids = [self.ids[row] for row in keep]
+        self.columns = {key: [column[row] for row in keep] for key, column in self.columns.items()}
+        self._documents = [documents[row] for row in keep]
+        self._save()
+
+    def _rename(self, old_path, new_path):
+        """Rename a file in the main metadata, rewriting it."""
+        paths = self.columns.get("file_path", [])
+        if old_path not in paths:
+            return
+        self.columns["file_path"] = [new_path if p == old_path else p for p in paths]
+        self._save()
+
+    def query(self, query_embeddings, n_results, files=None):
+        """Return the nearest neighbours of each query embedding.
+
+        Scores every stored vector with a matrix product and selects the
+        top n with argpartition, so results are exact.
+
+        Args:
+            query_embeddings: List of query vectors
+            n_results: Number of neighbours per query
+            files: Only consider entries of these file paths (default: all);
+                only their rows of the full vectors are read
+
+        Returns:
+            Dict with 'ids', 'documents', 'metadatas' and 'distances',
+            each a list with one entry per query
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        with span("flat query"):
+            if files is not None:
+                results = self._query_rows(queries, n_results, self.rows_of_files(files))
+            else:
+                results = self._query(queries, n_results)
+            if self.delta is not None:
+                results = _merge_results(results, self.delta.query(queries, n_results, files), n_results)
+            return results
+
+    def rows_of_files(self, files):
+        """Return the sorted main rows of the given file paths, except deleted ones.
+
+        Rows are looked up in the row ranges of each file saved in
+        metadata.json, so opening a store never scans every row.
+        """
+        if self._file_ranges is None:
+            self._file_ranges = _row_ranges(self.columns.get("file_path", []))
+        ranges = [np.arange(start, stop) for path in set(files) for start, stop in self._file_ranges.get(path, ())]
+        if not ranges:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.sort(np.concatenate(ranges))
+        alive = self._alive_rows()
+        return rows[alive[rows]] if alive is not None else rows
+
+    def _query_rows(self, queries, n_results, rows):
+        """Exact search over a subset of rows; see query()."""
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if len(rows) == 0:
+            for key in results:
+                results[key] = [[] for _ in queries]
+            return results
+
+        scores = np.asarray(self.vectors[rows], dtype=np.float32) @ queries.T
+        k = min(n_results, len(rows))
+        for q in range(len(queries)):
+            top = self.top_k(scores[:, q], k)
+            self._append_rows(results, rows[top], 2.0 - 2.0 * scores[top, q])
+        return results
+
+    def _query(self, queries, n_results):
+        """Score queries against the store; see query()."""
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        total = len(self.ids) - len(self.deleted)
+        if total == 0:
+            for key in results:
+                results[key] = [[] for _ in queries]
+            return results
+
+        k = min(n_results, total)
+        if self.quantize:
+            for query in queries:
+                top, scores = self._quantized_search(query, k)
+                self._append_rows(results, top, 2.0 - 2.0 * scores)
+            return results
+
+        scores = self._scores(queries)
+        if len(self.deleted):
+            scores[self.deleted] = -np.inf
+        for q in range(len(queries)):
+            top = self.top_k(scores[:, q], k)
+            self._append_rows(results, top, 2.0 - 2.0 * scores[top, q])
+        return results
+
+    def get(self, ids):
+        """Return stored entries by id; see ChromaBackend.get()."""
+        if self._id_rows is None:
+            alive = self._alive_rows()
+            self._id_rows = {id_: row for row, id_ in enumerate(self.ids) if alive is None or alive[row]}
+        rows = [self._id_rows[id_] for id_ in ids if id_ in self._id_rows]
+        documents = self.documents
+        found = {
+            "ids": [self.ids[row] for row in rows],
+            "documents": [documents[row] for row in rows],
+            "metadatas": [self.metadata(row) for row in rows],
+            "embeddings": np.asarray(self.vectors[rows], dtype=np.float32),
+        }
+        if self.delta is None:
+            return found
+        changed = self.delta.get([id_ for id_ in ids if id_ not in self._id_rows])
+        if not changed["ids"]:
+            return found
+
+        # Back into the order of ids
+        position = {id_: (part, i) for part in (found, changed) for i, id_ in enumerate(part["ids"])}
+        entries = [position[id_] for id_ in ids if id_ in position]
+        return {
+            "ids": [part["ids"][i] for part, i in entries],
+            "documents": [part["documents"][i] for part, i in entries],
+            "metadatas": [part["metadatas"][i] for part, i in entries],
+            "embeddings": np.asarray([part["embeddings"][i] for part, i in entries], dtype=np.float32),
+        }
+
+    def count(self):
+        """Return the number of stored embeddings."""
+        return len(self.ids) - len(self.deleted) + (self.delta.count() if self.delta is not None else 0)
+
+    def sample(self, limit):
+        """Return stored documents and metadata without a query.
+
+        Args:
+            limit: Maximum number of entries
+
+        Returns:
+            Tuple of (documents, metadatas) lists
+        """
+        alive = self._alive_rows()
+        rows = list(islice((row for row in range(len(self.ids)) if alive is None or alive[row]), limit))
+        documents, metadatas = [self.documents[row] for row in rows], [self.metadata(row) for row in rows]
+        if self.delta is not None and len(rows) < limit:
+            delta_documents, delta_metadatas = self.delta.sample(limit - len(rows))
+            documents += delta_documents
+            metadatas += delta_metadatas
+        return documents, metadatas
+
+    def entries(self):
+        """Return every stored entry.
+
+        The embedding matrix is the memory-mapped main file unless the
+        store has pending changes (see compact()).
+
+        Returns:
+            Tuple of (documents, embedding matrix, metadatas)
+        """
+        metadatas = [self.metadata(row) for row in range(len(self.ids))]
+        if not len(self.deleted) and self.delta is None:
+            return self.documents, self.vectors, metadatas
+        rows = np.flatnonzero(self._alive_rows()) if len(self.deleted) else np.arange(len(self.ids))
+        documents = [self.documents[row] for row in rows]
+        metadatas = [metadatas[row] for row in rows]
+        vectors = np.asarray(self.vectors[rows])
+        if self.delta is not None:
+            delta_documents, delta_vectors, delta_metadatas = self.delta.entries()
+            documents += delta_documents
+            metadatas += delta_metadatas
+            vectors = np.concatenate([vectors, np.asarray(delta_vectors)]) if len(vectors) else np.asarray(delta_vectors)
+        return documents, vectors, metadatas
+
+    def entry_batches(self, batch_size):
+        """Yield every stored entry in batches, so callers can bound memory.
+
+        Args:
+            batch_size: Entries per batch
+
+        Yields:
+            Tuples of (documents, embedding matrix, metadatas)
+        """
+        alive = self._alive_rows()
+        rows = np.flatnonzero(alive) if alive is not None else np.arange(len(self.ids))
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            yield ([self.documents[row] for row in batch], np.asarray(self.vectors[batch]),
+                   [self.metadata(row) for row in batch])
+        if self.delta is not None:
+            yield from self.delta.entry_batches(batch_size)
+
+    @property
+    def documents(self):
+        """Function source for every row, loaded on first access."""
+        if self._documents is None:
+            self._documents = json.loads(self.documents_path.read_text())
+        return self._documents
+
+    def metadata(self, row):
+        """Return the metadata dictionary for a row."""
+        return {key: column[row] for key, column in self.columns.items() if column[row] is not None}
+
+    @staticmethod
+    def top_k(scores, k):
+        """Return indices of the k highest scores, best first."""
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def _scores(self, queries):
+        """Compute dot products of every stored vector with each query."""
+        if self.vectors.dtype == np.float32:
+            return self.vectors @ queries.T
+        blocks = []
+        for start in range(0, len(self.vectors), self.BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + self.BLOCK_ROWS], dtype=np.float32)
+            blocks.append(block @ queries.T)
+        return np.concatenate(blocks)
+
+    def _quantized_search(self, query, k):
+        """Shortlist rows using quantized codes, then rescore exactly.
+
+        Args:
+            query: Query vector (float32)
+            k: Number of results to return
+
+        Returns:
+            Tuple of (row indices best first, exact dot product scores)
+        """
+        shortlist_size = min(k * self.RESCORE_FACTOR[self.quantize], len(self.ids))
+        if self.quantize == "int8":
+            approx = self._int8_scores(query)
+        else:
+            approx = -self._hamming_distances(query).astype(np.float32)
+        if len(self.deleted):
+            approx[self.deleted] = -np.inf
+        shortlist = np.sort(self.top_k(approx, shortlist_size))
+
+        # Only the shortlisted rows of the full vectors are paged in
+        exact = np.asarray(self.vectors[shortlist], dtype=np.float32) @ query
+        if len(self.deleted):
+            exact[~self._alive_rows()[shortlist]] = -np.inf
+        order = self.top_k(exact, k)
+        return shortlist[order], exact[order]
+
+    def _int8_scores(self, query):
+        """Approximate dot products from int8 codes and per-dimension scales."""
+        scaled_query = (query * self.scales).astype(np.float32)
+        blocks = []
+        for start in range(0, len(self.codes), self.BLOCK_ROWS):
+            block = np.asarray(self.codes[start:start + self.BLOCK_ROWS], dtype=np.float32)
+            blocks.append(block @ scaled_query)
+        return np.concatenate(blocks)
+
+    def _hamming_distances(self, query):
+        """Hamming distances between sign-bit codes and the query's signs."""
+        query_bits = np.packbits(query > 0)
+        blocks = []
+        for start in range(0, len(self.codes), self.BLOCK_ROWS):
+            xor = np.bitwise_xor(self.codes[start:start + self.BLOCK_ROWS], query_bits)
+            blocks.append(_POPCOUNT[xor].sum(axis=1, dtype=np.int32))
+        return np.concatenate(blocks)
+
+    def _encode(self):
+        """Compute quantized codes (and int8 scales) from the full vectors."""
+        vectors = np.asarray(self.vectors, dtype=np.float32)
+        if self.quantize == "binary":
+            self.codes = np.packbits(vectors > 0, axis=1)
+            return
+        self.codes, self.scales = quantize_int8(vectors)
+
+    def storage_report(self):
+        """Summarize on-disk vector storage against an unquantized float32 index.
+
+        Returns:
+            Dict with 'vectors_bytes', 'codes_bytes' and 'float32_bytes'
+        """
+        rows, dim = self.vectors.shape if self.vectors.ndim == 2 else (0, 0)
+        report = {
+            "vectors_bytes": self.vectors_path.stat().st_size,
+            "codes_bytes": self.codes_path.stat().st_size if self.quantize else 0,
+            "float32_bytes": rows * dim * 4,
+        }
+        if self.delta is not None:
+            delta = self.delta.storage_report()
+            report["vectors_bytes"] += delta["vectors_bytes"]
+            report["float32_bytes"] += delta["float32_bytes"]
+        return report
+
+    def _append_rows(self, results, rows, distances):
+        """Append one query's result rows in ChromaDB's layout."""
+        documents = self.documents
+        results["ids"].append([self.ids[r] for r in rows])
+        results["documents"].append([documents[r] for r in rows])
+        results["metadatas"].append([self.metadata(r) for r in rows])
+        results["distances"].append([float(d) for d in distances])
+
+    def _save(self):
+        """Write vectors, metadata and documents to disk.
+
+        Each file is written to a temporary name and renamed into place, so
+        readers that have the previous files mapped are unaffected.
+        """
+        self._replace(self.vectors_path, lambda f: np.save(f, self.vectors))
+        if self.quantize and len(self.ids):
+            self._encode()
+            self._replace(self.codes_path, lambda f: np.save(f, self.codes))
+            if self.quantize == "int8":
+                self._replace(self.scales_path, lambda f: np.save(f, self.scales))
+            self.codes = np.load(self.codes_path, mmap_mode="r")
+        documents = json.dumps(self.documents, separators=(",", ":"))
+        self._replace(self.documents_path, lambda f: f.write(documents.encode("utf-8")))
+        self._file_ranges = _row_ranges(self.columns.get("file_path", []))
+        meta = json.dumps({"ids": self.ids, "columns": self.columns, "file_rows": self._file_ranges},
+                          separators=(",", ":"))
+        self._replace(self.metadata_path, lambda f: f.write(meta.encode("utf-8")))
+        self.vectors = np.load(self.vectors_path, mmap_mode="r")
+        self._id_rows = None
+
+    @staticmethod
+    def _replace(path, write):
+        """Atomically replace path with the bytes written by write(file)."""
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+
+
+class _DeltaStore(FlatBackend):
+    """Delta store of a FlatBackend; small, so changes rewrite its files."""
+
+    def add(self, ids, documents, embeddings, metadatas):
+        self._append(ids, documents, embeddings, metadatas)
+
+    def delete_files(self, file_paths):
+        self._remove_files(file_paths)
+
+    def rename_file(self, old_path, new_path):
+        self._rename(old_path, new_path)
+
+
+def _row_ranges(paths):
+    """Map each file path to the [start, stop) ranges of the rows holding it.
+
+    Rows of a file are added together, so most files have one range.
+    """
+    ranges = {}
+    start = 0
+    for row in range(1, len(paths) + 1):
+        if row == len(paths) or paths[row] != paths[start]:
+            ranges.setdefault(paths[start], []).append([start, row])
+            start = row
+    return ranges
+
+
+def _merge_results(first, second, n_results):
+    """Merge two query results in ChromaDB's layout, nearest first per query."""
+    merged = {key: [] for key in first}
+    for q in range(len(first["ids"])):
+        entries = [(part, i) for part in (first, second) for i in range(len(part["ids"][q]))]
+        entries = sorted(entries, key=lambda entry: entry[0]["distances"][q][entry[1]])[:n_results]
+        for key in merged:
+            merged[key].append([part[key][q][i] for part, i in entries])
+    return merged
+
+
+def quantize_int8(vectors):
+    """Quantize vectors to int8 with a symmetric per-dimension scale.
+
+    Each dimension's range [-max|x|, max|x|] is mapped onto [-127, 127];
+    codes * scales approximates the original vectors.
+
+    Args:
+        vectors: 2-D float32 array
+
+    Returns:
+        Tuple of (int8 codes, float32 scale per dimension)
+    """
+    max_abs = np.abs(vectors).max(axis=0) if len(vectors) else np.ones(vectors.shape[1], dtype=np.float32)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    return np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8), scales
+
+
+# Number of set bits in every byte value, for Hamming distances
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+BACKENDS = {
+    "chroma": ChromaBackend,
+    "flat": FlatBackend,
+}
+
+
+def create_backend(db_path, name="chroma", **options):
+    """Create a new, empty index at db_path and record it in the manifest.
+
+    Args:
+        db_path: Path to the .codevec directory
+        name: Backend name ("chroma" or "flat")
+        **options: Backend-specific options (e.g. dtype and quantize for flat)
+
+    Returns:
+        Backend instance ready for add()
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}. Choose from: {', '.join(BACKENDS)}")
+    backend = BACKENDS[name](db_path, **options)
+    backend.create()
+    write_manifest(db_path, {"backend": name, "options": options})
+    return backend
+
+
+def open_backend(db_path):
+    """Open the existing index at db_path using the backend it was built with.
+
+    Args:
+        db_path: Path to the .codevec directory
+
+    Returns:
+        Opened backend instance, with the manifest available as .manifest
+
+    Raises:
+        Exception: If no index exists at db_path
+    """
+    manifest = read_manifest(db_path)
+    # Updated ChromaDB generations share the store of an older one (see codevec.generations)
+    store_path = Path(db_path).parent / manifest["store"] if "store" in manifest else db_path
+    backend = BACKENDS[manifest["backend"]](store_path, **manifest.get("options", {}))
+    backend.open()
+    backend.manifest = manifest
+    return backend
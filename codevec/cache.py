@@ -0,0 +1,108 @@
+"""Content-addressed cache of function embeddings.
+
+Maps the hash of a function's source to its embedding, so functions that
+were embedded before (for example on another branch) are never embedded
+again. The cache lives in .codevec/embedding-cache, outside any index
+generation, and is append-only: keys go to keys.txt and vectors are
+appended as raw float32 rows to vectors.bin, which is memory-mapped on
+load. When it outgrows MAX_ENTRIES, the oldest half is dropped.
+
+The cache is tied to the embedding model and is reset when it changes.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from codevec.generations import CACHE_NAME
+
+
+class EmbeddingCache:
+    """Append-only hash -> embedding store for one embedding model."""
+
+    MAX_ENTRIES = 100_000
+
+    def __init__(self, db_path, model_name):
+        """Load the cache for model_name, resetting it if built for another model.
+
+        Args:
+            db_path: Path to the .codevec directory
+            model_name: Identifier of the embedding model
+        """
+        self.path = Path(db_path) / CACHE_NAME
+        self.model_name = model_name
+        self.rows = {}
+        self.vectors = None
+        self.dim = None
+        self._pending_keys = []
+        self._pending_vectors = []
+
+        try:
+            meta = json.loads((self.path / "meta.json").read_text())
+            keys = (self.path / "keys.txt").read_text().split()
+        except (OSError, ValueError):
+            return
+        if meta.get("model") != model_name:
+            return
+        self.dim = meta["dim"]
+        self.vectors = np.memmap(self.path / "vectors.bin", dtype=np.float32, mode="r").reshape(-1, self.dim)
+        # Keys are written after vectors, so a torn append leaves extra rows, never missing ones
+        for row, key in enumerate(keys[:len(self.vectors)]):
+            self.rows[key] = row
+
+    def __len__(self):
+        return len(self.rows)
+
+    def lookup(self, keys):
+        """Return cached vectors for keys.
+
+        Args:
+            keys: Content hashes
+
+        Returns:
+            List with a vector (list of floats) for each hit and None for each miss
+        """
+        return [self.vectors[self.rows[k]].tolist() if k in self.rows else None for k in keys]
+
+    def add(self, keys, vectors):
+        """Queue new entries; they are written by save()."""
+        self._pending_keys.extend(keys)
+        self._pending_vectors.extend(vectors)
+
+    def save(self):
+        """Append queued entries to disk. Call while holding the writer lock."""
+        if not self._pending_keys:
+            return
+        new_vectors = np.asarray(self._pending_vectors, dtype=np.float32)
+        if self.dim != new_vectors.shape[1] or len(self.rows) + len(new_vectors) > self.MAX_ENTRIES:
+            self._rewrite(new_vectors)
+        else:
+            with open(self.path / "vectors.bin", "ab") as f:
+                f.write(new_vectors.tobytes())
+            with open(self.path / "keys.txt", "a") as f:
+                f.write("".join(f"{k}\n" for k in self._pending_keys))
+        self._pending_keys = []
+        self._pending_vectors = []
+
+    def _rewrite(self, new_vectors):
+        """Rewrite the cache keeping the newest entries plus the queued ones."""
+        keep = []
+        if self.dim == new_vectors.shape[1]:
+            ordered = sorted(self.rows, key=self.rows.get)
+            keep = ordered[len(ordered) - self.MAX_ENTRIES // 2:] if len(ordered) > self.MAX_ENTRIES // 2 else ordered
+        old_vectors = np.asarray(self.vectors[[self.rows[k] for k in keep]]) if keep else new_vectors[:0]
+        vectors = np.concatenate([old_vectors, new_vectors])
+        keys = keep + self._pending_keys
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name, data in (
+            ("vectors.bin", vectors.tobytes()),
+            ("keys.txt", "".join(f"{k}\n" for k in keys).encode("utf-8")),
+            ("meta.json", json.dumps({"model": self.model_name, "dim": int(vectors.shape[1])}).encode("utf-8")),
+        ):
+            tmp = self.path / f"{name}.tmp"
+            tmp.write_bytes(data)
+            os.replace(tmp, self.path / name)
+        self.dim = int(vectors.shape[1])
@@ -0,0 +1,96 @@
+"""Git-aware change detection for incremental re-indexing.
+
+Each index records the commit it was built from and the .py files that
+were dirty (modified or untracked) at the time. On the next vec-index,
+the files to re-index are derived from git instead of scanning the tree:
+
+- files that differ between the recorded commit and the working tree
+- untracked files
+- files that were dirty when the index was built
+
+Pure renames (identical content) are reported separately so their
+entries can be moved without re-embedding.
+"""
+
+import subprocess
+from pathlib import Path
+
+
+def _git(root, *args):
+    """Run a git command in root and return its stdout, or None on failure."""
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(root), *args],
+            capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout
+
+
+def git_state(root):
+    """Describe the git state of a repository for the index manifest.
+
+    Args:
+        root: Absolute repository root (may be a subdirectory of the worktree)
+
+    Returns:
+        Dict with 'commit' (HEAD SHA) and 'dirty' (root-relative .py paths
+        that differ from HEAD or are untracked), or an empty dict outside git
+    """
+    head = _git(root, "rev-parse", "HEAD")
+    if head is None:
+        return {}
+    modified = _git(root, "diff", "--name-only", "-z", "--relative", "HEAD", "--", "*.py") or ""
+    untracked = _git(root, "ls-files", "--others", "--exclude-standard", "-z", "--", "*.py") or ""
+    dirty = {p for p in (modified + untracked).split("\0") if p}
+    return {"commit": head.strip(), "dirty": sorted(dirty)}
+
+
+def detect_changes(root, manifest):
+    """Find the files that changed since the index was built.
+
+    Args:
+        root: Absolute repository root
+        manifest: Manifest of the current index (with 'commit' and 'dirty')
+
+    Returns:
+        Dict with 'changed' (absolute paths to re-index) and 'renamed'
+        (list of (old, new) absolute path pairs with unchanged content),
+        or None if git can't answer (not a repository, unknown commit)
+    """
+    root = Path(root)
+    commit = manifest.get("commit")
+    if not commit or _git(root, "cat-file", "-e", f"{commit}^{{commit}}") is None:
+        return None
+
+    diff = _git(root, "diff", "--name-status", "-M", "-z", "--relative", commit, "--", "*.py")
+    untracked = _git(root, "ls-files", "--others", "--exclude-standard", "-z", "--", "*.py")
+    if diff is None or untracked is None:
+        return None
+
+    previously_dirty = set(manifest.get("dirty", []))
+    changed = previously_dirty | {p for p in untracked.split("\0") if p}
+    renamed = []
+
+    fields = diff.split("\0")
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i]
+        if status[0] in "RC":
+            old, new = fields[i + 1], fields[i + 2]
+            i += 3
+            if status == "R100" and old not in previously_dirty:
+                renamed.append((old, new))
+            else:
+                changed.add(new)
+                if status[0] == "R":
+                    changed.add(old)
+        else:
+            changed.add(fields[i + 1])
+            i += 2
+
+    return {
+        "changed": sorted(str(root / p) for p in changed),
+        "renamed": [(str(root / old), str(root / new)) for old, new in renamed],
+    }
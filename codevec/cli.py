@@ -4,7 +4,9 @@ Provides entry points for indexing codebases, searching indexed code,
 and running the embedding server.
 """
 
+import json
 import sys
+from pathlib import Path
 
 def show_help():
     """Display help message with available commands and usage examples."""
@@ -15,42 +17,368 @@ Commands:
     index <path>              Index a codebase (creates .codevec/ in the target)
     search <query> [options]  Search indexed code
     server                    Run background daemon to keep models loaded in memory
+    bench-server [options]    Load-test a running model server (see vec-bench-server --help)
+    dupes [options]           Find clusters of near-duplicate functions (see vec-dupes --help)
+
+Index Options (unspecified options keep the existing index's settings):
+    --backend <name>          Storage backend: chroma (default) or flat (NumPy, exact search)
+    --dtype <type>            Flat backend vector precision: float32 (default) or float16
+    --quantize <mode>         Flat backend first-pass quantization: int8, binary or none
+    --by-reference            Store file offsets instead of a copy of each function's source
+    --no-by-reference         Store a copy of each function's source (default)
+    --full                    Rebuild from scratch instead of re-indexing files changed since the last index
+    --watch                   Keep running and re-index files as they change
+    --jobs <N>                Without a model server, embed in N worker processes (default: 1; not with --via-server)
+    --via-server              Run the indexing job on vec-server and follow its progress
+    --shard <i>/<N>           Only index shard i of N (split by path hash) into a standalone directory
+    --output <dir>            With --shard, where to write it (default: ./codevec-shard-<i>-of-<N>)
+
+    --export <file>           Write the current index to a portable snapshot file
+    --precision <type>        With --export, vector precision: float16 (default) or int8
+    --import <file>           Build the index from a snapshot instead of embedding
+
+    vec-index merge <path> <shard-dir>...   Combine shards into <path>/.codevec without re-embedding
 
 Search Options:
     --repo <path>             Search a specific repository (default: auto-detect)
+    --repos <a,b,c>           Search several repositories at once and merge the results
+    --workspace <file>        Search the repositories listed in <file> (one path per line)
+    --batch <file>            Run one query per line of <file> ("-" for stdin), print JSON Lines
+    --output <file>           With --batch, write results to <file> instead of stdout
+    --modules <N>             Search functions of the N nearest modules/classes only (0: all functions;
+                              default: 100 on indexes of 50k+ functions)
+    --stream                  List the vector matches at once, then redraw them in reranked order
+    --jsonl                   Stream a JSON line for the vector matches, then one for the reranked results
+
+Profiling Options (index and search):
+    --profile                 Print a per-stage timing breakdown
+    --profile-trace <file>    Also write a Chrome trace (open in ui.perfetto.dev)
+    --cprofile <file>         Also run under cProfile and write stats to <file>
 
 Examples:
     vec-index ./my-project
+    vec-index ./my-project --backend flat
+    vec-index ./my-project --jobs 8
+    vec-index ./my-project --via-server
+    vec-index ./my-project --shard 0/4 --output shard-0
+    vec-index merge ./my-project shard-0 shard-1 shard-2 shard-3
+    vec-index ./my-project --export index.zip && vec-index ./my-project --import index.zip
     cd my-project && vec-search "email validation"
     vec-search "email validation" --repo ./my-project
+    vec-search --batch queries.txt --repo ./my-project --output results.jsonl
+    vec-search "email validation" --workspace services.txt
+    vec-search "email validation" --jsonl
 
 """)
 
+def parse_profile_options(args):
+    """Remove profiling flags from an argument list.
+    
+    Args:
+        args: Command-line arguments
+        
+    Returns:
+        Tuple of (remaining args, options dict or None if profiling is off)
+    """
+    remaining = []
+    options = {}
+    i = 0
+    while i < len(args):
+        if args[i] == "--profile":
+            options["report"] = True
+            i += 1
+        elif args[i] == "--profile-trace" and i + 1 < len(args):
+            options["trace"] = args[i + 1]
+            i += 2
+        elif args[i] == "--cprofile" and i + 1 < len(args):
+            options["cprofile"] = args[i + 1]
+            i += 2
+        else:
+            remaining.append(args[i])
+            i += 1
+    return remaining, (options or None)
+
+def run_profiled(func, options):
+    """Run func, recording stage spans and optionally cProfile data.
+    
+    Prints the stage breakdown and writes any requested trace even if
+    func exits early.
+    
+    Args:
+        func: Callable running the command
+        options: Options from parse_profile_options, or None to just run func
+    """
+    if options is None:
+        func()
+        return
+
+    from codevec import profiling
+    profiling.enable()
+    profiler = None
+    if "cprofile" in options:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        func()
+    finally:
+        if profiler is not None:
+            import pstats
+            profiler.disable()
+            profiler.dump_stats(options["cprofile"])
+            print(f"\ncProfile data written to {options['cprofile']} (top functions by cumulative time):")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+        profiling.print_report()
+        if "trace" in options:
+            profiling.write_trace(options["trace"])
+            print(f"Trace written to {options['trace']} (open in https://ui.perfetto.dev)")
+
 def indexer():
     """CLI entry point for indexing a codebase.
     """
     if len(sys.argv) < 2:
-        print("Usage: vec-index <path>")
+        print("Usage: vec-index <path> [--backend chroma|flat] [--dtype float32|float16] [--quantize int8|binary|none] [--by-reference] [--full] [--watch] [--jobs N] [--via-server]")
+        print("       vec-index <path> --shard <i>/<N> [--output <dir>] [--jobs N]")
+        print("       vec-index merge <path> <shard-dir>... [index options]")
+        print("       vec-index <path> --export <file> [--precision float16|int8]")
+        print("       vec-index <path> --import <file> [index options]")
         print('Example: vec-index ./my-project')
+        print('Example: vec-index ./my-project --backend flat')
+        print('Example: vec-index ./my-project --watch')
+        sys.exit(1)
+
+    # Parse arguments
+    args, profile = parse_profile_options(sys.argv[1:])
+    root_path = None
+    # Settings left as None keep the existing index's value
+    backend = None
+    dtype = None
+    quantize = None
+    by_reference = None
+    full = False
+    watch = False
+    shard = None
+    output = None
+    export_file = None
+    import_file = None
+    precision = "float16"
+    jobs = 1
+    via_server = False
+    merge = bool(args) and args[0] == "merge"
+    shard_paths = []
+    if merge:
+        args = args[1:]
+
+    i = 0
+    while i < len(args):
+        if args[i] == "--backend" and i + 1 < len(args):
+            backend = args[i + 1]
+            i += 2
+        elif args[i] == "--dtype" and i + 1 < len(args):
+            dtype = args[i + 1]
+            i += 2
+        elif args[i] == "--quantize" and i + 1 < len(args):
+            quantize = args[i + 1]
+            i += 2
+        elif args[i] == "--by-reference":
+            by_reference = True
+            i += 1
+        elif args[i] == "--no-by-reference":
+            by_reference = False
+            i += 1
+        elif args[i] == "--full":
+            full = True
+            i += 1
+        elif args[i] == "--watch":
+            watch = True
+            i += 1
+        elif args[i] == "--via-server":
+            via_server = True
+            i += 1
+        elif args[i] == "--export" and i + 1 < len(args):
+            export_file = args[i + 1]
+            i += 2
+        elif args[i] == "--import" and i + 1 < len(args):
+            import_file = args[i + 1]
+            i += 2
+        elif args[i] == "--precision" and i + 1 < len(args):
+            precision = args[i + 1]
+            i += 2
+        elif args[i] == "--shard" and i + 1 < len(args):
+            shard = args[i + 1]
+            i += 2
+        elif args[i] == "--jobs" and i + 1 < len(args):
+            try:
+                jobs = int(args[i + 1])
+            except ValueError:
+                jobs = 0
+            if jobs < 1:
+                print(f"Error: --jobs must be a positive integer, got '{args[i + 1]}'")
+                sys.exit(1)
+            i += 2
+        elif args[i] == "--output" and i + 1 < len(args):
+            output = args[i + 1]
+            i += 2
+        elif root_path is None:
+            root_path = args[i]
+            i += 1
+        elif merge:
+            shard_paths.append(args[i])
+            i += 1
+        else:
+            print(f"Error: Unexpected argument '{args[i]}'")
+            sys.exit(1)
+
+    if root_path is None:
+        print("Error: No path provided")
+        sys.exit(1)
+    if merge and not shard_paths:
+        print("Error: No shard directories provided")
+        print("Usage: vec-index merge <path> <shard-dir>... [--backend chroma|flat] [...]")
+        sys.exit(1)
+    if sum(map(bool, (merge, shard, export_file, import_file))) > 1:
+        print("Error: merge, --shard, --export and --import can't be combined")
+        sys.exit(1)
+    if via_server and (merge or shard or export_file or import_file or watch):
+        print("Error: --via-server can't be combined with merge, --shard, --export, --import or --watch")
+        sys.exit(1)
+    if via_server and jobs > 1:
+        # The server embeds with its own inference workers (CODEVEC_INFERENCE_WORKERS)
+        print("Error: --jobs has no effect with --via-server; the server's inference workers embed the job")
+        sys.exit(1)
+    if precision not in ("float16", "int8"):
+        print(f"Error: Unknown precision '{precision}' (choose float16 or int8)")
+        sys.exit(1)
+    if shard is not None:
+        from codevec.shards import parse_shard
+        try:
+            shard = parse_shard(shard)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if watch:
+            print("Error: --shard can't be combined with --watch")
+            sys.exit(1)
+    if backend not in (None, "chroma", "flat"):
+        print(f"Error: Unknown backend '{backend}' (choose chroma or flat)")
+        sys.exit(1)
+    if dtype not in (None, "float32", "float16"):
+        print(f"Error: Unknown dtype '{dtype}' (choose float32 or float16)")
+        sys.exit(1)
+    if quantize not in (None, "int8", "binary", "none"):
+        print(f"Error: Unknown quantization '{quantize}' (choose int8, binary or none)")
+        sys.exit(1)
+    if quantize in ("int8", "binary") and backend == "chroma":
+        print("Error: --quantize requires --backend flat")
         sys.exit(1)
 
     print("Initializing index system...")
-    from codevec.index import index_codebase
-    root_path = sys.argv[1]
-    index_codebase(root_path)
+
+    def run():
+        from codevec.profiling import span
+        with span("import codevec.index"):
+            from codevec.index import index_codebase
+        with span("index codebase"):
+            try:
+                index_codebase(root_path, backend=backend, dtype=dtype, quantize=quantize, by_reference=by_reference, full=full, jobs=jobs)
+            except ValueError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+
+    def run_via_server():
+        from codevec.jobs import follow_job, submit_job
+        url = "http://localhost:8000"
+        options = {"backend": backend, "dtype": dtype, "quantize": quantize, "by_reference": by_reference, "full": full}
+        try:
+            job = submit_job(url, root_path, options)
+        except ConnectionError as e:
+            print(f"Error: {e}")
+            print("Start the server with: vec-server")
+            sys.exit(1)
+        print(f"{'Following running' if job['deduplicated'] else 'Submitted'} job {job['id']} for {job['path']}")
+        try:
+            job = follow_job(url, job["id"])
+        except KeyboardInterrupt:
+            print(f"\nStopped following; the job keeps running (cancel with: curl -X DELETE {url}/jobs/{job['id']})")
+            sys.exit(1)
+        except ConnectionError as e:
+            print(f"\nError: {e}")
+            sys.exit(1)
+        if job["status"] != "done":
+            print(f"Error: Job {job['status']}{': ' + job['error'] if job['error'] else ''}")
+            sys.exit(1)
+        print(f"Indexing complete. {job['functions']} functions indexed in {job['elapsed_s']:.1f}s.")
+
+    def run_shard():
+        from codevec.shards import build_shard
+        index, count = shard
+        try:
+            build_shard(root_path, index, count, output or f"codevec-shard-{index}-of-{count}", jobs=jobs)
+        except FileExistsError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    def run_merge():
+        from codevec.shards import merge_shards
+        try:
+            merge_shards(root_path, shard_paths, backend=backend, dtype=dtype, quantize=quantize, by_reference=by_reference)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    def run_export():
+        from codevec.snapshot import export_index
+        try:
+            header = export_index(root_path, export_file, precision)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        size = Path(export_file).stat().st_size / (1024 * 1024)
+        print(f"Exported {header['count']} functions to {export_file} ({size:.1f} MB, {precision} vectors)")
+
+    def run_import():
+        from codevec.snapshot import import_index
+        try:
+            header = import_index(root_path, import_file, backend=backend, dtype=dtype, quantize=quantize, by_reference=by_reference)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not import snapshot: {e}")
+            sys.exit(1)
+        print(f"Import complete. {header['count']} functions indexed.")
+
+    if via_server:
+        run_via_server()
+        return
+    if shard is not None:
+        run_profiled(run_shard, profile)
+        return
+    if export_file is not None:
+        run_profiled(run_export, profile)
+        return
+    run_profiled(run_import if import_file else run_merge if merge else run, profile)
+
+    if watch:
+        from codevec.watch import watch_codebase
+        watch_codebase(root_path)
 
 def searcher():
     """CLI entry point for searching indexed code.
     """
     if len(sys.argv) < 2:
-        print("Usage: vec-search <query> [--repo <path>]")
+        print("Usage: vec-search <query> [--repo <path> | --repos <a,b,c> | --workspace <file>]")
+        print("       vec-search --batch <queries.txt> [--repo <path>] [--output <results.jsonl>]")
         print('Example: vec-search "email validation"')
         print('Example: vec-search "email validation" --repo ./my-project')
+        print('Example: vec-search "email validation" --repos ./billing,./accounts')
         sys.exit(1)
     
     # Parse arguments
-    args = sys.argv[1:]
+    args, profile = parse_profile_options(sys.argv[1:])
     root_path = None
+    repos = None
+    batch_file = None
+    output = None
+    modules = None
+    stream = None
     query_parts = []
     
     i = 0
@@ -58,19 +386,361 @@ def searcher():
         if args[i] == "--repo" and i + 1 < len(args):
             root_path = args[i + 1]
             i += 2
+        elif args[i] == "--repos" and i + 1 < len(args):
+            repos = (repos or []) + [p for p in args[i + 1].split(",") if p]
+            i += 2
+        elif args[i] == "--workspace" and i + 1 < len(args):
+            repos = (repos or []) + read_workspace(args[i + 1])
+            i += 2
+        elif args[i] == "--batch" and i + 1 < len(args):
+            batch_file = args[i + 1]
+            i += 2
+        elif args[i] == "--output" and i + 1 < len(args):
+            output = args[i + 1]
+            i += 2
+        elif args[i] == "--modules" and i + 1 < len(args):
+            if not args[i + 1].isdigit():
+                print(f"Error: --modules must be a non-negative integer, got '{args[i + 1]}'")
+                sys.exit(1)
+            modules = int(args[i + 1])
+            i += 2
+        elif args[i] == "--stream":
+            stream = "terminal"
+            i += 1
+        elif args[i] == "--jsonl":
+            stream = "jsonl"
+            i += 1
         else:
             query_parts.append(args[i])
             i += 1
     
+    if repos is not None and (root_path is not None or batch_file is not None):
+        print("Error: --repos/--workspace can't be combined with --repo or --batch")
+        sys.exit(1)
+    if stream is not None and (repos is not None or batch_file is not None):
+        print("Error: --stream/--jsonl can't be combined with --repos, --workspace or --batch")
+        sys.exit(1)
+    if batch_file is not None:
+        run_profiled(lambda: batch_search(batch_file, root_path, output), profile)
+        return
+
     if not query_parts:
         print("Error: No search query provided")
         sys.exit(1)
     
     query = " ".join(query_parts)
 
-    print(f"Initializing search system...")
-    from codevec.search import search_code
-    search_code(query, root_path=root_path)
+    if stream != "jsonl":
+        print(f"Initializing search system...")
+
+    def run():
+        from codevec.profiling import span
+        with span("import codevec.search"):
+            from codevec.search import search_code
+        with span("search code"):
+            search_code(query, root_path=root_path, modules=modules, stream=stream)
+
+    run_profiled(run if repos is None else lambda: federated_search(query, repos), profile)
+
+def read_workspace(path):
+    """Read repository paths from a workspace file.
+    
+    The file lists one repository per line; blank lines and lines starting
+    with # are ignored, and relative paths are relative to the file.
+    
+    Args:
+        path: Workspace file
+        
+    Returns:
+        List of repository paths
+    """
+    try:
+        lines = Path(path).read_text().splitlines()
+    except OSError as e:
+        print(f"Error: Could not read workspace file: {e}")
+        sys.exit(1)
+    base = Path(path).resolve().parent
+    return [str(base / line.strip()) for line in lines if line.strip() and not line.strip().startswith("#")]
+
+def federated_search(query, repos):
+    """Search several repositories and print the merged results.
+    
+    Args:
+        query: Search query string
+        repos: Paths to indexed repositories
+    """
+    if not repos:
+        print("Error: No repositories given")
+        sys.exit(1)
+
+    from codevec.profiling import span
+    with span("import codevec.search"):
+        from codevec.search import print_results, search_repos
+    with span("search repositories"):
+        results, errors = search_repos(query, repos)
+
+    for repo, error in errors.items():
+        print(f"Warning: Skipping {repo}: {error}")
+    if len(errors) == len(repos):
+        print("Error: None of the repositories could be searched")
+        print("To index a project: vec-index /path/to/project")
+        sys.exit(1)
+    if not results:
+        print("No results found")
+        return
+    with span("render results"):
+        print_results(results)
+
+def parse_mix(value):
+    """Parse a request mix such as "embed-doc=0.5,embed-query=0.3,rerank=0.2".
+    
+    Args:
+        value: Comma-separated kind=weight pairs
+        
+    Returns:
+        Dict of request kind -> weight
+    """
+    from codevec.loadtest import DEFAULT_MIX
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"unknown request kind '{kind}' (choose {', '.join(DEFAULT_MIX)})")
+        mix[kind] = float(weight)
+    if not any(mix.values()):
+        raise ValueError("at least one weight must be positive")
+    return mix
+
+def bench_server():
+    """CLI entry point for load-testing the model server.
+    """
+    args = sys.argv[1:]
+    if args and args[0] in ("-h", "--help"):
+        print("Usage: vec-bench-server [--repo <path>] [--url <url>] [--concurrency N] [--rate R] [--duration S]")
+        print("                        [--mix embed-doc=0.5,embed-query=0.3,rerank=0.2] [--doc-batch N] [--rerank-docs N] [--output FILE]")
+        print("Example: vec-bench-server --repo ./my-project --concurrency 16 --duration 60")
+        print("Example: vec-bench-server --repo ./my-project --rate 50 --mix embed-query=1")
+        sys.exit(0)
+
+    root_path = "."
+    url = "http://localhost:8000"
+    output = None
+    options = {}
+    numeric = {
+        "--concurrency": ("concurrency", int),
+        "--rate": ("rate", float),
+        "--duration": ("duration", float),
+        "--doc-batch": ("doc_batch", int),
+        "--rerank-docs": ("rerank_docs", int),
+    }
+
+    i = 0
+    try:
+        while i < len(args):
+            if args[i] == "--repo" and i + 1 < len(args):
+                root_path = args[i + 1]
+            elif args[i] == "--url" and i + 1 < len(args):
+                url = args[i + 1].rstrip("/")
+            elif args[i] == "--output" and i + 1 < len(args):
+                output = args[i + 1]
+            elif args[i] == "--mix" and i + 1 < len(args):
+                options["mix"] = parse_mix(args[i + 1])
+            elif args[i] in numeric and i + 1 < len(args):
+                name, convert = numeric[args[i]]
+                options[name] = convert(args[i + 1])
+                if options[name] <= 0:
+                    raise ValueError(f"{args[i]} must be positive")
+            else:
+                print(f"Error: Unknown option '{args[i]}'")
+                sys.exit(1)
+            i += 2
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    from codevec.loadtest import load_test
+    try:
+        load_test(root_path, url=url, output=output, **options)
+    except (ConnectionError, FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+def find_dupes():
+    """CLI entry point for finding near-duplicate functions.
+    """
+    args = sys.argv[1:]
+    if args and args[0] in ("-h", "--help"):
+        print("Usage: vec-dupes [--repo <path>] [--threshold 0.95] [--min-lines 3] [--memory-mb 256] [--output FILE]")
+        print("Finds clusters of near-duplicate functions in an index. Prints JSON, or a summary with --output.")
+        print("Example: vec-dupes --repo ./my-project --threshold 0.97 --output dupes.json")
+        sys.exit(0)
+
+    root_path = "."
+    output = None
+    options = {}
+    numeric = {
+        "--threshold": ("threshold", float),
+        "--min-lines": ("min_lines", int),
+        "--memory-mb": ("memory_mb", float),
+    }
+
+    i = 0
+    try:
+        while i < len(args):
+            if args[i] == "--repo" and i + 1 < len(args):
+                root_path = args[i + 1]
+            elif args[i] == "--output" and i + 1 < len(args):
+                output = args[i + 1]
+            elif args[i] in numeric and i + 1 < len(args):
+                name, convert = numeric[args[i]]
+                options[name] = convert(args[i + 1])
+                if options[name] <= 0:
+                    raise ValueError(f"{args[i]} must be positive")
+            else:
+                print(f"Error: Unknown option '{args[i]}'")
+                sys.exit(1)
+            i += 2
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if options.get("threshold", 0.5) > 1:
+        print("Error: --threshold is a cosine similarity and can't exceed 1")
+        sys.exit(1)
+
+    from codevec.dupes import find_duplicates, print_report, write_report
+    try:
+        report = find_duplicates(root_path, **options)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if output:
+        write_report(report, output)
+        print_report(report)
+        print(f"\nClusters written to {output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+def batch_search(batch_file, root_path=None, output=None):
+    """Run every query in a file and write the results as JSON Lines.
+    
+    Args:
+        batch_file: File with one query per line ("-" for stdin)
+        root_path: Indexed repository (default: auto-detect)
+        output: File to write results to (default: stdout)
+    """
+    try:
+        source = sys.stdin if batch_file == "-" else open(batch_file)
+        with source:
+            queries = [line.strip() for line in source if line.strip()]
+    except OSError as e:
+        print(f"Error: Could not read queries: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    from codevec.profiling import span
+    with span("import codevec.search"):
+        from codevec.search import find_repo_root, search_many, write_jsonl
+    root_path = root_path or find_repo_root()
+    if root_path is None:
+        print("Error: No indexed repository found. Specify one with --repo /path/to/project", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        with span(f"search {len(queries)} queries"):
+            results = search_many(queries, root_path)
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if output is None:
+        write_jsonl(queries, results, sys.stdout)
+    else:
+        with open(output, "w") as out:
+            write_jsonl(queries, results, out)
+        print(f"Wrote results for {len(queries)} queries to {output}", file=sys.stderr)
+
+def onnx_tool():
+    """CLI entry point for exporting and checking the ONNX runtime models.
+    """
+    args = sys.argv[1:]
+    if not args or args[0] not in ("export", "check"):
+        print("Usage: vec-onnx export [--no-quantize]")
+        print("       vec-onnx check [--repo <path>] [--texts N] [--queries N]")
+        print("Exports the embedding model and reranker to ONNX (int8 by default) for CODEVEC_RUNTIME=onnx,")
+        print("or compares the ONNX and torch runtimes for parity, throughput, latency and memory.")
+        sys.exit(1)
+
+    command = args[0]
+    root_path = "."
+    quantize = True
+    counts = {"--texts": 256, "--queries": 32}
+    i = 1
+    while i < len(args):
+        if args[i] == "--no-quantize":
+            quantize = False
+            i += 1
+        elif args[i] == "--repo" and i + 1 < len(args):
+            root_path = args[i + 1]
+            i += 2
+        elif args[i] in counts and i + 1 < len(args) and args[i + 1].isdigit():
+            counts[args[i]] = int(args[i + 1])
+            i += 2
+        else:
+            print(f"Error: Unknown option '{args[i]}'")
+            sys.exit(1)
+
+    from codevec import onnx_runtime
+    if command == "export":
+        try:
+            for kind, model_name in (("embedder", onnx_runtime.EMBEDDER_MODEL), ("reranker", onnx_runtime.RERANKER_MODEL)):
+                onnx_runtime.export_model(kind, model_name, quantize=quantize)
+        except ImportError as e:
+            print(f"Error: Exporting needs the optional ONNX dependencies: pip install \"codevec[onnx]\" ({e})")
+            sys.exit(1)
+        print(f"Models exported to {onnx_runtime.onnx_dir()}. Set CODEVEC_RUNTIME=onnx to use them.")
+        return
+
+    import subprocess
+    from codevec.index import extract_chunks, walk_codebase
+    from codevec.loadtest import derive_queries
+    documents, metadatas = [], []
+    for file_path, content in walk_codebase(root_path):
+        file_documents, file_metadatas = extract_chunks(file_path, content)
+        documents.extend(file_documents)
+        metadatas.extend(file_metadatas)
+    if not documents:
+        print(f"Error: No Python functions found in {root_path}")
+        sys.exit(1)
+    texts = documents[:counts["--texts"]]
+    queries = derive_queries(documents, metadatas)[:counts["--queries"]]
+    candidates = documents[:10]
+
+    print(f"Comparing runtimes on {len(texts)} functions and {len(queries)} queries from {root_path}...")
+    try:
+        results = onnx_runtime.compare_runtimes(texts, queries, candidates)
+    except subprocess.CalledProcessError as e:
+        print(f"Error: A runtime failed to run:\n{e.stderr}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print("\n" + "-" * 52)
+    print(f"{'':<24}{'torch':>14}{'onnx':>14}")
+    print("-" * 52)
+    for key, label in (("load_s", "model load (s)"), ("embed_texts_per_s", "embed texts/s"),
+                       ("query_p50_ms", "query p50 (ms)"), ("query_p95_ms", "query p95 (ms)"),
+                       ("rerank_pairs_per_s", "rerank pairs/s"), ("peak_rss_mb", "peak RSS (MB)")):
+        print(f"{label:<24}{results['torch'][key]:>14.1f}{results['onnx'][key]:>14.1f}")
+    print("-" * 52)
+
+    parity = results["parity"]
+    print(f"Embedding cosine similarity: min {parity['cosine_min']:.4f}, mean {parity['cosine_mean']:.4f}")
+    print(f"Rerank top-1 agreement: {parity['rerank_top1_agreement']:.1%}, "
+          f"mean Spearman correlation: {parity['rerank_spearman_mean']:.3f}")
+    if parity["cosine_min"] < onnx_runtime.MIN_COSINE or parity["rerank_spearman_mean"] < onnx_runtime.MIN_SPEARMAN:
+        print("FAIL: ONNX outputs diverge from torch beyond tolerance")
+        sys.exit(1)
+    print("PASS: ONNX outputs match torch within tolerance")
 
 def run_server(host: str = "0.0.0.0", port: int = 8000):
     """Run the embedding server.
@@ -0,0 +1,258 @@
+"""Near-duplicate function detection.
+
+Finds every pair of indexed functions whose embeddings have a cosine
+similarity above a threshold, using the vectors already in the index:
+the normalized vectors are multiplied tile by tile against the rows
+after them (an exact self-join of the upper triangle), with the tile
+size chosen so one tile of scores and its vectors fit the memory
+budget. Pairs are then grouped into clusters of functions connected
+by a chain of similar pairs, using union-find.
+
+On 100k functions of 384 dimensions this is about 4 TFLOP of matrix
+products, which multi-threaded BLAS finishes in seconds on a laptop; no
+approximate index is needed at that scale.
+
+The vectors are read from the index in batches into a temporary float32
+file that is memory-mapped, so with either backend only the tiles being
+compared (and the metadata) are held in memory.
+"""
+
+import json
+import math
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from codevec.backends import open_backend
+from codevec.generations import acquire_reader
+from codevec.profiling import span
+from codevec.sources import load_sources
+
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_MIN_LINES = 3
+DEFAULT_MEMORY_MB = 256
+MAX_PAIRS = 5_000_000
+LOAD_BATCH_SIZE = 4096
+
+
+def similar_pairs(vectors, threshold, memory_mb=DEFAULT_MEMORY_MB, rows=None):
+    """Find all pairs of rows with a dot product of at least threshold.
+
+    Rows are compared in square tiles, each converted to float32 only
+    while it is scored, so memory_mb bounds the whole working set: one
+    tile of scores plus the float32 copies of its rows and columns.
+
+    Args:
+        vectors: (n, d) matrix of unit vectors (may be memory-mapped, of
+            any float dtype)
+        threshold: Minimum similarity
+        memory_mb: Memory for one tile of scores and its vectors
+        rows: Rows of vectors to compare (default: all); returned pairs
+            are positions in rows
+
+    Returns:
+        Tuple of (rows i, rows j, similarities) arrays with i < j
+
+    Raises:
+        ValueError: If more than MAX_PAIRS pairs are found
+    """
+    rows = np.arange(len(vectors)) if rows is None else np.asarray(rows)
+    n = len(rows)
+    dimensions = vectors.shape[1] if n else 0
+    # Largest tile t with t * t scores and 2 * t * d vector values in the budget
+    values = memory_mb * 1024 * 1024 // 4
+    tile = max(1, int(math.sqrt(dimensions * dimensions + values)) - dimensions)
+
+    def load(start, stop):
+        return np.asarray(vectors[rows[start:stop]], dtype=np.float32)
+
+    found_i, found_j, found_s = [], [], []
+    total = 0
+    for start in range(0, n, tile):
+        left = load(start, min(start + tile, n))
+        # Only tiles from the diagonal on: each pair is scored once
+        for column in range(start, n, tile):
+            right = left if column == start else load(column, min(column + tile, n))
+            scores = left @ right.T
+            if column == start:
+                np.fill_diagonal(scores, -1.0)  # Self-similarity
+            # Most rows have no match; a row max is far cheaper than nonzero over the whole tile
+            hits = np.flatnonzero(scores.max(axis=1) >= threshold)
+            i, j = np.nonzero(scores[hits] >= threshold)
+            i = hits[i]
+            if column == start:
+                keep = j > i  # Drop the lower half of the diagonal tile
+                i, j = i[keep], j[keep]
+            found_i.append(i + start)
+            found_j.append(j + column)
+            found_s.append(scores[i, j])
+            total += len(i)
+            if total > MAX_PAIRS:
+                raise ValueError(f"More than {MAX_PAIRS} pairs above {threshold}; raise the threshold")
+    if not found_i:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_s)
+
+
+def cluster_pairs(count, rows_i, rows_j):
+    """Group rows connected by pairs (union-find).
+
+    Args:
+        count: Number of rows
+        rows_i, rows_j: Pair endpoints
+
+    Returns:
+        List of clusters, each a sorted list of rows (singletons omitted)
+    """
+    parent = list(range(count))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in zip(rows_i.tolist(), rows_j.tolist()):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups = {}
+    for row in set(rows_i.tolist()) | set(rows_j.tolist()):
+        groups.setdefault(find(row), []).append(row)
+    return [sorted(rows) for rows in groups.values()]
+
+
+def load_vectors(store, directory, min_lines, source_path=None):
+    """Copy the index's vectors into a memory-mapped float32 file.
+
+    Entries are read in batches of LOAD_BATCH_SIZE and their source is
+    dropped once its length is checked.
+
+    Args:
+        store: Backend opened with open_backend()
+        directory: Directory for the vectors file
+        min_lines: Functions shorter than this many lines are not kept
+        source_path: Generation to read source from for indexes storing
+            references (None if the index stores source)
+
+    Returns:
+        Tuple of (vectors, metadatas, rows kept for comparison)
+    """
+    count = store.count()
+    vectors, metadatas, keep = None, [], []
+    for documents, batch, batch_metadatas in store.entry_batches(LOAD_BATCH_SIZE):
+        batch = batch[:count - len(metadatas)]  # Rows added by a concurrent update of a shared store
+        if not len(batch):
+            break
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(Path(directory) / "vectors.npy", mode="w+", dtype=np.float32,
+                                                shape=(count, batch.shape[1]))
+        vectors[len(metadatas):len(metadatas) + len(batch)] = batch
+        batch_metadatas = batch_metadatas[:len(batch)]
+        if source_path is not None:
+            documents = load_sources(batch_metadatas, source_path)
+        # Short functions (trivial getters, pass-through wrappers) are near-identical by nature
+        keep.extend(len(metadatas) + i for i, doc in enumerate(documents[:len(batch)])
+                    if doc and doc.count("\n") + 1 >= min_lines)
+        metadatas.extend(batch_metadatas)
+    if vectors is None:
+        vectors = np.zeros((0, 0), dtype=np.float32)
+    return vectors[:len(metadatas)], metadatas, np.array(keep, dtype=np.int64)
+
+
+def find_duplicates(root_path, threshold=DEFAULT_THRESHOLD, min_lines=DEFAULT_MIN_LINES, memory_mb=DEFAULT_MEMORY_MB):
+    """Find clusters of near-duplicate functions in an indexed repository.
+
+    Args:
+        root_path: Root of an indexed repository
+        threshold: Minimum cosine similarity of a duplicate pair
+        min_lines: Ignore functions shorter than this many lines
+        memory_mb: Memory for comparing vectors (see similar_pairs)
+
+    Returns:
+        Report dict with the settings, counts and 'clusters', largest
+        first; each cluster lists its functions (file relative to the
+        repository, name, line) and the similarity range of its pairs
+
+    Raises:
+        FileNotFoundError: If the repository has no index
+    """
+    root = Path(root_path).resolve()
+    db_path = root / ".codevec"
+    if not db_path.is_dir():
+        raise FileNotFoundError(f"No index found at {db_path} (run vec-index first)")
+
+    start = time.perf_counter()
+    with acquire_reader(db_path) as lease, tempfile.TemporaryDirectory(prefix="codevec-dupes-") as tmp:
+        store = open_backend(lease.path)
+        by_reference = store.manifest.get("source") == "reference"
+        with span("load vectors"):
+            vectors, metadatas, keep = load_vectors(store, tmp, min_lines, lease.path if by_reference else None)
+
+        if len(keep):
+            with span(f"self-join {len(keep)} vectors"):
+                rows_i, rows_j, similarities = similar_pairs(vectors, threshold, memory_mb, rows=keep)
+        else:
+            # Empty index, or nothing long enough to compare
+            rows_i, rows_j, similarities = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        del vectors  # Unmap before the file is removed
+    rows_i, rows_j = keep[rows_i], keep[rows_j]
+
+    with span("cluster pairs"):
+        clusters = cluster_pairs(len(metadatas), rows_i, rows_j)
+        cluster_of = {row: c for c, rows in enumerate(clusters) for row in rows}
+        ranges = [[1.0, 0.0] for _ in clusters]
+        for a, similarity in zip(rows_i.tolist(), similarities.tolist()):
+            bounds = ranges[cluster_of[a]]
+            bounds[0], bounds[1] = min(bounds[0], similarity), max(bounds[1], similarity)
+
+    def describe(row):
+        metadata = metadatas[row]
+        path = Path(metadata["file_path"])
+        return {
+            "file_path": path.relative_to(root).as_posix() if path.is_relative_to(root) else str(path),
+            "name": metadata["name"],
+            "line": metadata["line"],
+        }
+
+    report = [
+        {
+            "size": len(rows),
+            "min_similarity": round(bounds[0], 4),
+            "max_similarity": round(bounds[1], 4),
+            "functions": [describe(row) for row in rows],
+        }
+        for rows, bounds in zip(clusters, ranges)
+    ]
+    report.sort(key=lambda c: (-c["size"], -c["max_similarity"]))
+    return {
+        "repository": str(root),
+        "threshold": threshold,
+        "min_lines": min_lines,
+        "functions": len(metadatas),
+        "compared": len(keep),
+        "pairs": len(rows_i),
+        "elapsed_s": round(time.perf_counter() - start, 3),
+        "clusters": report,
+    }
+
+
+def print_report(report, limit=10):
+    """Print a summary of the largest clusters."""
+    clusters = report["clusters"]
+    print(f"Compared {report['compared']} of {report['functions']} functions in {report['elapsed_s']:.1f}s: "
+          f"{report['pairs']} pairs above {report['threshold']} in {len(clusters)} clusters")
+    for cluster in clusters[:limit]:
+        print(f"\n{cluster['size']} functions, similarity {cluster['min_similarity']:.3f}-{cluster['max_similarity']:.3f}")
+        for function in cluster["functions"]:
+            print(f"  {function['file_path']}:{function['line']}  {function['name']}")
+    if len(clusters) > limit:
+        print(f"\n... {len(clusters) - limit} more clusters")
+
+
+def write_report(report, output):
+    """Write the report as JSON to a file."""
+    Path(output).write_text(json.dumps(report, indent=2))
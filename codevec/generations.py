@@ -0,0 +1,290 @@
+"""Index generations for zero-downtime rebuilds.
+
+Each build of an index is written to its own generation directory
+inside .codevec. Incremental updates start from a clone of the current
+generation that shares its files by hard link (see clone_generation) and
+are published the same way. When a build completes, the CURRENT pointer
+file is swapped atomically to name the new generation, so concurrent
+searches keep using the previous generation until the swap and never
+see a partially built index.
+
+The one exception is a ChromaDB store, which is too costly to clone: an
+update changes it in place, and the new generation names the generation
+holding it in its manifest ("store"). A generation holding the store of
+another one is kept as long as that one is.
+
+Readers hold a shared lock on their generation's lock file while they
+use it. Old generations are garbage-collected once an exclusive lock can
+be taken, i.e. once no reader holds them. On platforms without fcntl,
+the most recent previous generation is always kept instead.
+
+Indexes built before generations existed live directly in .codevec and
+are still opened as-is until the first generation is published.
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from codevec.backends import MANIFEST_NAME
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+CURRENT_NAME = "CURRENT"
+LOCK_NAME = ".lock"
+WRITER_LOCK_NAME = ".write.lock"
+GENERATION_PREFIX = "gen-"
+CACHE_NAME = "embedding-cache"
+
+
+def current_generation(db_path):
+    """Return the path of the published generation.
+
+    Args:
+        db_path: Path to the .codevec directory
+
+    Returns:
+        Path of the current generation, or db_path itself for indexes
+        built before generations existed
+    """
+    pointer = Path(db_path) / CURRENT_NAME
+    try:
+        name = pointer.read_text().strip()
+    except FileNotFoundError:
+        return Path(db_path)
+    return Path(db_path) / name
+
+
+def begin_generation(db_path):
+    """Create an empty generation directory for a build.
+
+    The returned lease keeps the generation from being collected by a
+    concurrent writer until the build has published it. The directory is
+    created and leased under writer_lock(), so a collector never sees it
+    unleased; this must not be called while already holding the lock.
+
+    Args:
+        db_path: Path to the .codevec directory
+
+    Returns:
+        ReaderLease whose .path is the new generation
+    """
+    name = f"{GENERATION_PREFIX}{int(time.time() * 1000)}-{uuid.uuid4().hex[:6]}"
+    gen_path = Path(db_path) / name
+    with writer_lock(db_path):
+        gen_path.mkdir(parents=True)
+        (gen_path / LOCK_NAME).touch()
+        if fcntl is None:
+            return ReaderLease(gen_path)
+        lock_file = open(gen_path / LOCK_NAME, "rb")
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        return ReaderLease(gen_path, lock_file)
+
+
+def clone_generation(source, target, link=(), copy_others=True):
+    """Copy a generation's files into a new generation for an update.
+
+    Entries named in link (files, or directories copied file by file) are
+    hard-linked instead of copied, falling back to a copy where links
+    aren't supported. Only files that writers replace rather than modify
+    in place (or only append to) may be linked: the update then replaces
+    its own link and the source generation keeps the old file.
+
+    Args:
+        source: Generation to copy (db_path itself for indexes built
+            before generations existed)
+        target: Empty generation from begin_generation()
+        link: Names of entries to hard-link
+        copy_others: Copy the entries not in link; if False they are left out
+    """
+    source, target = Path(source), Path(target)
+    for entry in source.iterdir():
+        if (entry.name in (CURRENT_NAME, LOCK_NAME, WRITER_LOCK_NAME, CACHE_NAME)
+                or entry.name.startswith((GENERATION_PREFIX, "trash-", f"{CURRENT_NAME}."))):
+            continue
+        if entry.name not in link and not copy_others:
+            continue
+        copy = _link_or_copy if entry.name in link else shutil.copy2
+        if entry.is_dir():
+            shutil.copytree(entry, target / entry.name, copy_function=copy)
+        else:
+            copy(entry, target / entry.name)
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def publish(db_path, gen_path):
+    """Atomically make gen_path the current generation.
+
+    Args:
+        db_path: Path to the .codevec directory
+        gen_path: Completed generation to publish
+    """
+    tmp = Path(db_path) / f"{CURRENT_NAME}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(Path(gen_path).name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, Path(db_path) / CURRENT_NAME)
+
+
+class ReaderLease:
+    """Shared hold on a generation that keeps it from being collected.
+
+    The lease is released by release(), on leaving a with block, or when
+    the object is garbage-collected.
+    """
+
+    def __init__(self, path, lock_file=None):
+        self.path = path
+        self._lock_file = lock_file
+
+    def release(self):
+        """Release the hold on the generation."""
+        if self._lock_file is not None:
+            self._lock_file.close()  # Closing drops the flock
+            self._lock_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def acquire_reader(db_path, retries=5):
+    """Resolve the current generation and hold it for reading.
+
+    Retries if the generation is collected between reading the pointer
+    and taking the lock, which can only happen if a newer generation was
+    published in between.
+
+    Args:
+        db_path: Path to the .codevec directory
+        retries: Number of times to re-read the pointer
+
+    Returns:
+        ReaderLease whose .path is the generation to open
+    """
+    for _ in range(retries):
+        gen_path = current_generation(db_path)
+        if fcntl is None or gen_path == Path(db_path):
+            return ReaderLease(gen_path)
+        try:
+            lock_file = open(gen_path / LOCK_NAME, "rb")
+        except FileNotFoundError:
+            continue
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        # A collector renames the directory before deleting it
+        if (gen_path / LOCK_NAME).exists():
+            return ReaderLease(gen_path, lock_file)
+        lock_file.close()
+    return ReaderLease(current_generation(db_path))
+
+
+@contextmanager
+def writer_lock(db_path):
+    """Serialize index writers (builds, updates, garbage collection).
+
+    Args:
+        db_path: Path to the .codevec directory
+    """
+    Path(db_path).mkdir(parents=True, exist_ok=True)
+    with open(Path(db_path) / WRITER_LOCK_NAME, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def collect_garbage(db_path):
+    """Delete generations that are neither current nor held by a reader.
+
+    Generations holding the store of a remaining generation are kept.
+    Also removes files left behind by indexes built before generations
+    existed. Must be called while holding writer_lock().
+
+    Args:
+        db_path: Path to the .codevec directory
+
+    Returns:
+        Number of generations removed
+    """
+    db_path = Path(db_path)
+    current = current_generation(db_path)
+    if current == db_path:
+        return 0
+
+    keep = {CURRENT_NAME, WRITER_LOCK_NAME, CACHE_NAME, current.name}
+    generations = sorted(p for p in db_path.iterdir() if p.name.startswith(GENERATION_PREFIX))
+    if fcntl is None:
+        # Without locks, keep the previous generation for in-flight readers
+        older = [p for p in generations if p.name < current.name]
+        if older:
+            keep.add(older[-1].name)
+
+    for entry in db_path.iterdir():
+        if entry.name in keep or entry.name.startswith((f"{CURRENT_NAME}.", GENERATION_PREFIX)):
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry, ignore_errors=True)  # Pre-generation ChromaDB data
+        else:
+            entry.unlink(missing_ok=True)
+
+    removed = 0
+    candidates = [p for p in generations if p.name not in keep]
+    while candidates:
+        # Removing a generation can release the store it was sharing
+        stores = {_store_of(p) for p in generations if p.exists()}
+        failed = [p for p in candidates if p.name in stores or not _remove_generation(p)]
+        if len(failed) == len(candidates):
+            break
+        removed += len(candidates) - len(failed)
+        candidates = failed
+    return removed
+
+
+def _store_of(gen_path):
+    """Name of the generation holding gen_path's store, if it's another one."""
+    try:
+        return json.loads((gen_path / MANIFEST_NAME).read_text()).get("store")
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_generation(gen_path):
+    """Delete a generation unless a reader holds it.
+
+    Returns:
+        True if the generation was removed
+    """
+    trash = gen_path.with_name(f"trash-{gen_path.name}")
+    if fcntl is None:
+        gen_path.rename(trash)
+    else:
+        try:
+            lock_file = open(gen_path / LOCK_NAME, "rb")
+        except FileNotFoundError:
+            lock_file = None  # Incomplete generation from a failed build
+        if lock_file is not None:
+            with lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False  # In use by a reader
+                gen_path.rename(trash)
+        else:
+            gen_path.rename(trash)
+    shutil.rmtree(trash, ignore_errors=True)
+    return True
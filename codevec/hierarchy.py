@@ -0,0 +1,241 @@
+"""Coarse module and class vectors for two-stage search.
+
+Next to the function vectors, every index generation built by
+index_codebase holds a small flat store (coarse/) with one vector per
+module and per class. Each one combines two signals about the file:
+
+- the embedding of a summary: dotted module name, module or class
+  docstring, and the class and function signatures it contains
+- the mean of the vectors of the functions it contains
+
+Searching a large index first picks the modules and classes nearest to
+the query from the coarse store, then searches only the functions of
+their files. The coarse store grows with the number of files rather
+than functions, so the second stage scans a bounded number of function
+vectors however large the repository gets.
+
+Indexes assembled from stored vectors (shard merges, snapshot imports)
+get a coarse store from the mean function vectors alone, so building
+them still loads no model.
+"""
+
+import ast
+from pathlib import Path
+
+import numpy as np
+
+from codevec.backends import FlatBackend
+from codevec.profiling import span
+
+COARSE_DIR = "coarse"
+# Below this many functions a full scan is fast and two stages only cost recall
+TWO_STAGE_MIN_FUNCTIONS = 50000
+TOP_MODULES = 100
+MAX_SIGNATURES = 40
+
+
+def _signature(node):
+    """One-line signature of a class or function definition."""
+    if isinstance(node, ast.ClassDef):
+        bases = ", ".join(ast.unparse(base) for base in node.bases)
+        return f"class {node.name}({bases})" if bases else f"class {node.name}"
+    return f"def {node.name}({ast.unparse(node.args)})"
+
+
+def _summary(title, docstring, nodes):
+    lines = [title]
+    if docstring:
+        lines.append(docstring.strip())
+    lines.extend(_signature(node) for node in nodes[:MAX_SIGNATURES])
+    return "\n".join(lines)
+
+
+def module_name(file_path):
+    """Dotted name of a module from its path, e.g. "codevec.search".
+
+    The name covers every enclosing package (directory with an
+    __init__.py). A module outside any package is named after its
+    directory too, for context: "scripts.deploy".
+    """
+    path = Path(file_path)
+    parts = [] if path.stem == "__init__" else [path.stem]
+    directory = path.parent
+    while (directory / "__init__.py").is_file() and directory.name:
+        parts.insert(0, directory.name)
+        directory = directory.parent
+    if len(parts) < 2 and directory.name and path.stem != "__init__":
+        parts.insert(0, directory.name)
+    return ".".join(parts)
+
+
+def outline(file_path, content):
+    """Summarize the module and each class of a file.
+
+    Args:
+        file_path: Path of the file
+        content: File content
+
+    Returns:
+        Dict with 'file_path', module 'summary' and 'classes', a list of
+        dicts with 'name', 'line', 'end_line' and 'summary'; None if the
+        file doesn't parse
+    """
+    try:
+        tree = ast.parse(content)
+    except SyntaxError:
+        return None
+
+    definitions = (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+    nodes = sorted((n for n in ast.walk(tree) if isinstance(n, definitions)), key=lambda n: n.lineno)
+    classes = []
+    for node in nodes:
+        if isinstance(node, ast.ClassDef):
+            members = [n for n in ast.walk(node) if isinstance(n, definitions) and n is not node]
+            classes.append({
+                "name": node.name,
+                "line": node.lineno,
+                "end_line": node.end_lineno,
+                "summary": _summary(f"{_signature(node)} in {module_name(file_path)}", ast.get_docstring(node),
+                                    sorted(members, key=lambda n: n.lineno)),
+            })
+    return {
+        "file_path": file_path,
+        "summary": _summary(f"module {module_name(file_path)}", ast.get_docstring(tree), nodes),
+        "classes": classes,
+    }
+
+
+def coarse_entries(outlines, metadatas, embeddings, embed):
+    """Build module and class vectors for indexed files.
+
+    Args:
+        outlines: (outline, rows) pairs, where rows are the positions of the
+            file's functions in metadatas and embeddings
+        metadatas: Function metadata
+        embeddings: Function embedding vectors
+        embed: Function embedding a list of summary texts, or None to use
+            only the mean of the function vectors
+
+    Returns:
+        Tuple of (summaries, float32 vectors, metadatas) for the coarse store
+    """
+    entries = []
+    for file_outline, rows in outlines:
+        rows = list(rows)
+        if file_outline is None or not rows:
+            continue
+        file_path = file_outline["file_path"]
+        entries.append((file_outline["summary"], rows,
+                        {"level": "module", "file_path": file_path, "name": module_name(file_path), "line": 1}))
+        for cls in file_outline["classes"]:
+            members = [row for row in rows if cls["line"] <= metadatas[row]["line"] <= cls["end_line"]]
+            if members:
+                entries.append((cls["summary"], members,
+                                {"level": "class", "file_path": file_path, "name": cls["name"], "line": cls["line"]}))
+    if not entries:
+        return [], np.zeros((0, 0), dtype=np.float32), []
+
+    summaries = [summary for summary, _, _ in entries]
+    functions = np.asarray(embeddings, dtype=np.float32)
+    if embed is None:
+        vectors = np.zeros((len(entries), functions.shape[1]), dtype=np.float32)
+    else:
+        vectors = np.asarray(embed(summaries), dtype=np.float32)
+    for i, (_, rows, _) in enumerate(entries):
+        pooled = functions[rows].mean(axis=0)
+        vectors[i] = vectors[i] + pooled / max(np.linalg.norm(pooled), 1e-12)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return summaries, vectors, [metadata for _, _, metadata in entries]
+
+
+def stored_outlines(metadatas):
+    """Outline the files of stored functions from the working tree.
+
+    Used for indexes assembled from stored vectors, whose files were never
+    parsed here. Files that can't be read or parsed get a module entry
+    without classes.
+
+    Args:
+        metadatas: Function metadata with absolute file paths
+
+    Returns:
+        (outline, rows) pairs for coarse_entries
+    """
+    rows = {}
+    for row, metadata in enumerate(metadatas):
+        rows.setdefault(metadata["file_path"], []).append(row)
+    outlines = []
+    for file_path, file_rows in rows.items():
+        try:
+            file_outline = outline(file_path, Path(file_path).read_bytes().decode("utf-8"))
+        except (OSError, UnicodeDecodeError):
+            file_outline = None
+        if file_outline is None:
+            file_outline = {"file_path": file_path, "summary": f"module {module_name(file_path)}", "classes": []}
+        outlines.append((file_outline, file_rows))
+    return outlines
+
+
+def write_coarse(gen_path, summaries, vectors, metadatas):
+    """Create the coarse store of a new generation."""
+    store = FlatBackend(Path(gen_path) / COARSE_DIR)
+    store.create()
+    store.add(ids=[f"{m['level']}:{m['file_path']}:{m['name']}" for m in metadatas],
+              documents=summaries, embeddings=vectors, metadatas=metadatas)
+
+
+def open_coarse(gen_path):
+    """Open a generation's coarse store, or return None if it has none."""
+    store = FlatBackend(Path(gen_path) / COARSE_DIR)
+    if not store.metadata_path.exists():
+        return None
+    store.open()
+    return store
+
+
+def update_coarse(gen_path, paths, renames, summaries, vectors, metadatas):
+    """Replace the coarse entries of re-indexed files in place.
+
+    Does nothing for generations without a coarse store, so it is never
+    left covering only part of the index.
+
+    Args:
+        gen_path: Generation directory
+        paths: Files whose entries are replaced
+        renames: (old, new) path pairs whose entries move unchanged
+        summaries, vectors, metadatas: New entries, from coarse_entries
+    """
+    store = open_coarse(gen_path)
+    if store is None:
+        return
+    for old, new in renames:
+        store.rename_file(old, new)
+    store.delete_files(paths)
+    store.add(ids=[f"{m['level']}:{m['file_path']}:{m['name']}" for m in metadatas],
+              documents=summaries, embeddings=vectors, metadatas=metadatas)
+
+
+def candidate_files(gen_path, query_embedding, function_count, modules=None):
+    """Pick the files a query's function search is restricted to.
+
+    Args:
+        gen_path: Generation directory
+        query_embedding: Query vector
+        function_count: Number of functions in the index
+        modules: Number of nearest modules and classes whose files are
+            searched; None for TOP_MODULES on indexes of at least
+            TWO_STAGE_MIN_FUNCTIONS functions, 0 to search everything
+
+    Returns:
+        List of file paths, or None to search all functions
+    """
+    if modules is None:
+        modules = TOP_MODULES if function_count >= TWO_STAGE_MIN_FUNCTIONS else 0
+    if not modules:
+        return None
+    store = open_coarse(gen_path)
+    if store is None or store.count() == 0:
+        return None
+    with span("select modules"):
+        hits = store.query(query_embeddings=[query_embedding], n_results=modules)
+    return list(dict.fromkeys(metadata["file_path"] for metadata in hits["metadatas"][0]))
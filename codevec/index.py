@@ -7,6 +7,7 @@ generating embeddings, and storing them in a ChromaDB collection.
 import logging
 from pathlib import Path
 import ast
+import uuid
 
 # Configure logging first, before heavy imports
 logging.basicConfig(
@@ -15,11 +16,53 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-import chromadb
+import numpy as np
+
+from codevec.backends import MANIFEST_NAME, FlatBackend, create_backend, open_backend, read_manifest, update_manifest
+from codevec.cache import EmbeddingCache
+from codevec.changes import detect_changes, git_state
+from codevec.generations import (begin_generation, clone_generation, collect_garbage, current_generation, publish,
+                                 writer_lock)
+from codevec.hierarchy import (COARSE_DIR, coarse_entries, open_coarse, outline, stored_outlines, update_coarse,
+                               write_coarse)
+from codevec.lexical import LEXICAL_DIR, update_lexical, write_lexical
 from codevec.models import create_embedder
+from codevec.profiling import span
+from codevec.sources import PACK_NAME, SourcePack, content_hash, line_offsets, source_reference
+
+
+_embedder = None
+EMBED_PROGRESS_BATCH = 256
+
+
+def set_embedder(embedder):
+    """Use the given embedder for indexing instead of creating one.
+    
+    The model server indexes with its own warm models this way.
+    
+    Args:
+        embedder: Object with a model_name attribute and an embed(texts) method
+    """
+    global _embedder
+    _embedder = embedder
 
 
-embedder = create_embedder()
+def get_embedder(jobs=1):
+    """Return the embedder, creating it on first use.
+    
+    Loading is deferred so operations that never embed (such as merging
+    shards) don't load a model or probe the server.
+    
+    Args:
+        jobs: Local worker processes, used if this call creates the embedder
+    
+    Returns:
+        Embedder from create_embedder()
+    """
+    global _embedder
+    if _embedder is None:
+        _embedder = create_embedder(jobs)
+    return _embedder
 
 
 def generate_embeddings(texts):
@@ -31,7 +74,29 @@ def generate_embeddings(texts):
     Returns:
         List of embedding vectors
     """
-    return embedder.embed(texts)
+    return get_embedder().embed(texts)
+
+def is_indexed_path(path, root):
+    """Check whether a file belongs in the index.
+    
+    Only Python files are indexed, and files inside hidden directories
+    or __pycache__ (relative to the repository root) are skipped.
+    
+    Args:
+        path: Absolute file path
+        root: Absolute repository root
+        
+    Returns:
+        True if the file should be indexed
+    """
+    path = Path(path)
+    if path.suffix != ".py":
+        return False
+    try:
+        parts = path.relative_to(root).parts
+    except ValueError:
+        return False
+    return not any(segment.startswith('.') or segment == '__pycache__' for segment in parts)
 
 def walk_codebase(root_path):
     """Find all Python files in a directory.
@@ -45,15 +110,15 @@ def walk_codebase(root_path):
     Yields:
         Tuple of (file_path, file_content) for each Python file
     """
-    root = Path(root_path)
+    root = Path(root_path).resolve()
     
     for py_file in root.rglob("*.py"):
         # Skip irrelevant directories 
-        if any(segment.startswith('.') or segment == '__pycache__' for segment in py_file.parts):
+        if not is_indexed_path(py_file, root):
             continue
         
-        # Read file content
-        content = py_file.read_text(encoding='utf-8')
+        # Read file content (decoded as-is so offsets match the bytes on disk)
+        content = py_file.read_bytes().decode('utf-8')
         yield (str(py_file), content)  # Returns (file_path, file_content)
 
 def extract_functions_ast(content):
@@ -96,7 +161,7 @@ def extract_functions_ast(content):
     return functions
 
 def get_db_path(root_path):
-    """Get the ChromaDB storage path for a given repository.
+    """Get the index storage path for a given repository.
     
     Args:
         root_path: Root path of the indexed repository
@@ -135,15 +200,44 @@ def add_to_gitignore(root_path):
     print("Added .codevec to .gitignore")
 
 
-def index_codebase(root_path):
+def index_codebase(root_path, backend=None, dtype=None, quantize=None, by_reference=None, full=False, jobs=1,
+                   progress=None):
     """Index all Python files in the specified directory.
     
     Walks the directory tree, extracts functions from Python files,
-    generates embeddings, and stores them in a ChromaDB collection
-    at .codevec/. Creates or replaces existing index.
+    generates embeddings, and stores them in the chosen backend
+    at .codevec/. The index is built as a new generation and swapped in
+    atomically when complete, so concurrent searches keep using the
+    previous index until then. Module and class vectors for two-stage
+    search (see codevec.hierarchy) and the lexical identifier index (see
+    codevec.lexical) are built alongside.
+    
+    If the repository is a git worktree that was indexed before with the
+    same settings, only files changed since the indexed commit are
+    re-indexed instead (see codevec.changes).
+    
+    Settings left as None keep the value of the existing index, or fall
+    back to the defaults shown.
     
     Args:
         root_path: Root directory of the codebase to index
+        backend: Storage backend, "chroma" or "flat" (default: "chroma")
+        dtype: Vector precision for the flat backend, "float32" or "float16"
+            (default: "float32")
+        quantize: Flat backend quantization, "int8", "binary" or "none"
+            (default: "none")
+        by_reference: Store file offsets and hashes instead of function source;
+            source is read back from the working tree at search time
+            (default: False)
+        full: Always rebuild from scratch
+        jobs: Worker processes to embed with when no model server is running
+        progress: Optional callback(stage, done, total) called as files are
+            scanned ("scan", total None) and chunks embedded ("embed"), then
+            once each for "store" and "publish"; an exception raised by it
+            aborts the build without touching the current index
+        
+    Returns:
+        Number of functions indexed (re-indexed, for an incremental update)
     """
     print(f"Indexing codebase: {root_path}")
     
@@ -152,47 +246,479 @@ def index_codebase(root_path):
     
     # Create persistent storage inside the indexed repository
     db_path = get_db_path(root_path)
-    client = chromadb.PersistentClient(path=db_path, settings=chromadb.Settings(anonymized_telemetry=False))
+    root = Path(root_path).resolve()
+    settings = resolve_settings(db_path, backend, dtype, quantize, by_reference)
+    by_reference = settings["source"] == "reference"
+    # Created here so the worker count applies to incremental updates too
+    get_embedder(jobs)
+
+    # Recorded before scanning, so edits made during the build are picked up next time
+    with span("read git state"):
+        state = git_state(root)
+    if not full:
+        functions = update_from_git(root_path, settings, state, progress)
+        if functions is not None:
+            return functions
+
+    # Build into a new generation; searches keep using the current one
+    build = begin_generation(db_path)
+    try:
+        gen_path = build.path
+        store = create_backend(gen_path, settings["backend"], **settings["options"])
+        
+        chunks = []
+        metadatas = []
+        outlines = []
+        
+        print("Scanning Python files...")
+        
+        with span("scan and parse files"):
+            for files, (file_path, content) in enumerate(walk_codebase(root_path), start=1):
+                file_chunks, file_metadatas = extract_chunks(file_path, content, by_reference)
+                outlines.append((outline(file_path, content), range(len(chunks), len(chunks) + len(file_chunks))))
+                chunks.extend(file_chunks)
+                metadatas.extend(file_metadatas)
+                if progress:
+                    progress("scan", files, None)
+
+        print(f"Generating embeddings for {len(chunks)} code chunks...")
+        with span("embed chunks"):
+            cache = EmbeddingCache(db_path, get_embedder().model_name)
+            embeddings, reused = embed_chunks(chunks, cache, progress)
+        if reused:
+            print(f"Reused {reused} cached embeddings")
+
+        with span("build coarse vectors"):
+            write_coarse(gen_path, *coarse_entries(outlines, metadatas, embeddings,
+                                                   lambda texts: embed_chunks(texts, cache)[0]))
+
+        if by_reference:
+            SourcePack(gen_path).reset()
+        update_manifest(gen_path, source=settings["source"], model=get_embedder().model_name, **state)
+
+        print("Storing embeddings in database...")
+        if progress:
+            progress("store", 0, None)
+        with span("store embeddings"):
+            ids = store_chunks(store, gen_path, chunks, embeddings, metadatas, by_reference)
+        with span("build lexical index"):
+            write_lexical(gen_path, ids, metadatas, chunks)
+        
+        if settings["backend"] == "flat":
+            print_storage_report(store)
+
+        # Swap the new generation in and remove ones no search is using
+        if progress:
+            progress("publish", 0, None)
+        with span("publish generation"), writer_lock(db_path):
+            cache.save()
+            publish(db_path, gen_path)
+            collect_garbage(db_path)
+    finally:
+        # An unpublished generation is removed by the next build's collection
+        build.release()
+
+    print(f"Indexing complete. {len(chunks)} functions indexed.")
+    return len(chunks)
+
+
+def resolve_settings(db_path, backend=None, dtype=None, quantize=None, by_reference=None):
+    """Fill in index settings that weren't given explicitly.
+    
+    Unspecified settings keep the value of the existing index, so a plain
+    vec-index refreshes an index the way it was built.
+    
+    Args:
+        db_path: Path to the .codevec directory
+        backend, dtype, quantize, by_reference: As for index_codebase
+        
+    Returns:
+        Dict with 'backend', 'options' and 'source', comparable with a manifest
+        
+    Raises:
+        ValueError: If flat storage options are given for a ChromaDB index
+    """
+    existing = read_manifest(current_generation(db_path))
+    existing_options = existing.get("options", {})
+    backend = backend or existing["backend"]
+
+    options = {}
+    if backend == "flat":
+        same = existing["backend"] == "flat"
+        if dtype is None:
+            dtype = existing_options.get("dtype", "float32") if same else "float32"
+        if quantize is None:
+            quantize = existing_options.get("quantize") if same else None
+        options = {"dtype": dtype, "quantize": None if quantize == "none" else quantize}
+    elif dtype not in (None, "float32") or quantize not in (None, "none"):
+        # The backend may come from the existing index rather than --backend
+        raise ValueError(f"--dtype and --quantize require the flat backend, not {backend} (add --backend flat)")
+
+    if by_reference is None:
+        by_reference = existing.get("source") == "reference"
+    return {"backend": backend, "options": options, "source": "reference" if by_reference else "copy"}
+
+
+def update_from_git(root_path, settings, state, progress=None):
+    """Re-index only the files git reports as changed since the last index.
+    
+    The changes are applied by update_index(), which publishes them as a
+    new generation.
+    
+    Args:
+        root_path: Root directory of the codebase
+        settings: Requested settings from resolve_settings()
+        state: Current git state from git_state()
+        progress: Optional progress callback (see index_codebase)
+        
+    Returns:
+        Number of functions re-indexed, or None if a full build is needed
+        (no previous index, different settings or model, or no git history)
+    """
+    db_path = get_db_path(root_path)
+    gen_path = current_generation(db_path)
+    manifest = read_manifest(gen_path)
+    if (gen_path == Path(db_path)
+            or manifest.get("model") != get_embedder().model_name
+            or manifest["backend"] != settings["backend"]
+            or manifest.get("options", {}) != settings["options"]
+            or manifest.get("source", "copy") != settings["source"]):
+        return None
+
+    with span("detect git changes"):
+        changes = detect_changes(Path(root_path).resolve(), manifest)
+    if changes is None:
+        return None
+
+    print(f"Changes since commit {manifest['commit'][:12]}: "
+          f"{len(changes['changed'])} files to re-index, {len(changes['renamed'])} renamed")
+    functions = update_index(root_path, changes["changed"], renamed=changes["renamed"], state=state,
+                             progress=progress)
+    print(f"Index updated. {functions} functions re-indexed.")
+    return functions
+
+
+def embed_chunks(chunks, cache, progress=None):
+    """Embed chunks, reusing cached embeddings of identical source.
+    
+    Args:
+        chunks: Function source strings
+        cache: EmbeddingCache for the current model; new embeddings are queued on it
+        progress: Optional callback("embed", done, total); if given, chunks
+            are embedded in batches of EMBED_PROGRESS_BATCH to report between
+        
+    Returns:
+        Tuple of (embeddings, number reused from the cache)
+    """
+    keys = [content_hash(chunk) for chunk in chunks]
+    embeddings = cache.lookup(keys)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    reused = len(chunks) - len(missing)
+    if progress:
+        progress("embed", reused, len(chunks))
+    step = EMBED_PROGRESS_BATCH if progress else max(len(missing), 1)
+    for start in range(0, len(missing), step):
+        batch = missing[start:start + step]
+        new_embeddings = generate_embeddings([chunks[i] for i in batch])
+        for i, embedding in zip(batch, new_embeddings):
+            embeddings[i] = embedding
+        cache.add([keys[i] for i in batch], new_embeddings)
+        if progress:
+            progress("embed", reused + start + len(batch), len(chunks))
+    return embeddings, reused
+
+
+def extract_chunks(file_path, content, by_reference=False):
+    """Build the documents and metadata for every function in a file.
+    
+    Args:
+        file_path: Absolute path of the file
+        content: File content
+        by_reference: Include source reference fields (offsets and hash)
+        
+    Returns:
+        Tuple of (documents, metadatas) lists
+    """
+    functions = extract_functions_ast(content)
+    offsets = line_offsets(content.encode('utf-8')) if by_reference else None
+    
+    chunks = []
+    metadatas = []
+    for func in functions:
+        chunks.append(func["data"])
+
+        metadata = {
+            "file_path": file_path,
+            "name": func["name"],
+            "line": func["lineno"],
+            "type": "function"
+        }
+        if by_reference:
+            metadata.update(source_reference(offsets, func))
+        metadatas.append(metadata)
+    return chunks, metadatas
+
+
+def store_chunks(store, gen_path, chunks, embeddings, metadatas, by_reference=False, replace=()):
+    """Add embedded chunks to an index generation.
+    
+    Args:
+        store: Open backend of the generation
+        gen_path: Path of the generation directory
+        chunks: Function source strings
+        embeddings: Embedding vector for each chunk
+        metadatas: Metadata dict for each chunk
+        by_reference: Keep source in the fallback pack instead of the backend
+        replace: Files whose stored functions the chunks replace
+        
+    Returns:
+        List of the ids the chunks were stored under
+    """
+    if not chunks and not replace:
+        return []
+
+    if by_reference:
+        # Compressed fallback copy, only read when a file changed since indexing
+        for metadata, (offset, length) in zip(metadatas, SourcePack(gen_path).append(chunks)):
+            metadata["pack_offset"] = offset
+            metadata["pack_length"] = length
+
+    ids = [uuid.uuid4().hex for _ in chunks]
+    entries = {
+        "ids": ids,
+        "documents": None if by_reference else chunks,
+        "embeddings": embeddings,
+        "metadatas": metadatas,
+    }
+    if replace:
+        store.replace_files(replace, **entries)
+    else:
+        store.add(**entries)
+    return ids
+
+
+def update_index(root_path, paths, renamed=(), state=None, progress=None):
+    """Re-index individual files into a new generation.
+    
+    Removes every indexed function from the given files, then re-parses
+    and embeds the files that still exist. Renamed files keep their
+    embeddings and only have their path updated. Used by watch mode and
+    git-based incremental indexing to avoid a full rebuild.
+    
+    Files are parsed and embedded before the writer lock is taken, so
+    other writers only wait for the changes to be written. They are
+    written to a clone of the current generation that shares its files by
+    hard link, where a flat store writes only the changed rows (see
+    FlatBackend), and published like a full build, so searches see either
+    the old or the updated index, never a mix. A ChromaDB store is shared
+    with the current generation and updated in place instead (see
+    codevec.generations).
+    
+    Args:
+        root_path: Root directory of the indexed codebase
+        paths: Absolute paths of changed, added or deleted files
+        renamed: (old, new) absolute path pairs whose content is unchanged
+        state: Git state to record in the manifest once updated
+        progress: Optional progress callback (see index_codebase)
+        
+    Returns:
+        Number of functions indexed from the updated files
+    """
+    root = Path(root_path).resolve()
+    paths = {str(Path(p)) for p in paths}
+    renames = []
+    for old, new in renamed:
+        if is_indexed_path(old, root) and is_indexed_path(new, root):
+            renames.append((old, new))
+        else:
+            paths |= {old, new}  # Moved into or out of the indexed tree
+    paths = sorted(p for p in paths if is_indexed_path(p, root))
+
+    db_path = get_db_path(root_path)
+    current = current_generation(db_path)
+    by_reference = read_manifest(current).get("source") == "reference"
+    cache = EmbeddingCache(db_path, get_embedder().model_name)
+    with span("parse and embed files"):
+        update = prepare_update(paths, by_reference, cache, open_coarse(current) is not None, progress)
 
-    # Create a fresh collection (delete existing one if present)
+    build = begin_generation(db_path)
     try:
-        client.delete_collection("code_index")
-    except Exception:
-        pass  # Collection doesn't exist yet
-    collection = client.create_collection(name="code_index")
+        gen_path = build.path
+        with writer_lock(db_path):
+            source = current_generation(db_path)
+            manifest = read_manifest(source)
+            if ((manifest.get("source") == "reference") != by_reference
+                    or (update[3] is None and open_coarse(source) is not None)):
+                # Rebuilt with other settings in the meantime
+                by_reference = manifest.get("source") == "reference"
+                update = prepare_update(paths, by_reference, cache)
+            chunks, metadatas, embeddings, coarse = update
+
+            # Files replaced on write (or only appended to) are shared with the current generation
+            link = {MANIFEST_NAME, COARSE_DIR, LEXICAL_DIR, PACK_NAME, *FlatBackend.FILES}
+            shared = manifest["backend"] == "chroma" and source != Path(db_path)
+            with span("clone generation"):
+                clone_generation(source, gen_path, link, copy_others=not shared)
+            if shared:
+                update_manifest(gen_path, store=manifest.get("store", source.name))
+            store = open_backend(gen_path)
+
+            if progress:
+                progress("store", 0, None)
+            for old, new in renames:
+                store.rename_file(old, new)
+            ids = store_chunks(store, gen_path, chunks, embeddings, metadatas, by_reference, replace=paths)
+            if coarse is not None:
+                update_coarse(gen_path, paths, renames, *coarse)
+            update_lexical(gen_path, paths, renames, ids, metadatas, chunks)
+            cache.save()
+            if state:
+                update_manifest(gen_path, **state)
+            if progress:
+                progress("publish", 0, None)
+            publish(db_path, gen_path)
+            collect_garbage(db_path)
+    finally:
+        # An unpublished generation is removed by the next build's collection
+        build.release()
+    return len(chunks)
+
+
+def prepare_update(paths, by_reference, cache, coarse=True, progress=None):
+    """Parse and embed the files of an incremental update.
     
+    Args:
+        paths: Absolute paths of the files; missing or unreadable files
+            contribute no functions
+        by_reference: Build metadata for an index storing source by reference
+        cache: EmbeddingCache; new embeddings are queued on it
+        coarse: Also build the files' coarse entries (see codevec.hierarchy)
+        progress: Optional progress callback (see index_codebase)
+        
+    Returns:
+        Tuple of (chunks, metadatas, embeddings, coarse entries or None)
+    """
     chunks = []
     metadatas = []
-    ids = []
-    chunk_id = 0
+    outlines = []
+    for files, file_path in enumerate(paths, start=1):
+        if progress:
+            progress("scan", files, len(paths))
+        try:
+            content = Path(file_path).read_bytes().decode('utf-8')
+        except (OSError, UnicodeDecodeError):
+            continue  # Deleted (or unreadable) files are only removed
+        file_chunks, file_metadatas = extract_chunks(file_path, content, by_reference)
+        outlines.append((outline(file_path, content), range(len(chunks), len(chunks) + len(file_chunks))))
+        chunks.extend(file_chunks)
+        metadatas.extend(file_metadatas)
+
+    embeddings, _ = embed_chunks(chunks, cache, progress)
+    # Generations imported before they had coarse stores are searched in one stage
+    entries = None
+    if coarse:
+        entries = coarse_entries(outlines, metadatas, embeddings, lambda texts: embed_chunks(texts, cache)[0])
+    return chunks, metadatas, embeddings, entries
+
+
+def build_from_embeddings(root_path, batches, model, state=None, backend=None, dtype=None, quantize=None, by_reference=None):
+    """Publish a new index generation from pre-computed embeddings.
     
-    print("Scanning Python files...")
+    Used to assemble an index from shards or a snapshot without loading
+    the embedding model. Entries are stored with the requested settings
+    and their embeddings are added to the embedding cache.
     
-    for file_path, content in walk_codebase(root_path):
-        functions = extract_functions_ast(content)
+    Args:
+        root_path: Root directory of the codebase
+        batches: Iterable of (chunks, float32 embedding matrix, metadatas)
+            tuples, with file paths in metadata relative to root_path
+        model: Name of the model that produced the embeddings
+        state: Git state to record in the manifest
+        backend, dtype, quantize, by_reference: As for index_codebase
         
-        for func in functions:
-            chunks.append(func["data"])
+    Returns:
+        Number of functions indexed
+    """
+    root = Path(root_path).resolve()
+    add_to_gitignore(root_path)
+    db_path = get_db_path(root_path)
+    settings = resolve_settings(db_path, backend, dtype, quantize, by_reference)
+    by_reference = settings["source"] == "reference"
 
-            metadatas.append({
-                "file_path": file_path,
-                "name": func["name"],
-                "line": func["lineno"],
-                "type": "function"
-            })
+    build = begin_generation(db_path)
+    try:
+        gen_path = build.path
+        store = create_backend(gen_path, settings["backend"], **settings["options"])
+        if by_reference:
+            SourcePack(gen_path).reset()
+        cache = EmbeddingCache(db_path, model)
+        cached = set(cache.rows)
+        offsets = {}
+
+        # Collected and stored with one add: each add rewrites every file of a flat store
+        all_chunks = []
+        all_embeddings = []
+        all_metadatas = []
+        for chunks, embeddings, metadatas in batches:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            for chunk, metadata in zip(chunks, metadatas):
+                metadata["file_path"] = str(root / metadata["file_path"])
+                if not by_reference:
+                    for field in ("start_byte", "end_byte", "end_line", "hash"):
+                        metadata.pop(field, None)
+                elif "hash" not in metadata:
+                    # Built without references: locate the function in the working tree
+                    file_path = metadata["file_path"]
+                    if file_path not in offsets:
+                        try:
+                            offsets[file_path] = line_offsets(Path(file_path).read_bytes())
+                        except OSError:
+                            offsets[file_path] = [0]
+                    func = {"lineno": metadata["line"], "end_lineno": metadata["line"] + chunk.count("\n"), "data": chunk}
+                    metadata.update(source_reference(offsets[file_path], func))
+
+            keys = [content_hash(chunk) for chunk in chunks]
+            new = [i for i, key in enumerate(keys) if key not in cached]
+            cached.update(keys)
+            cache.add([keys[i] for i in new], embeddings[new].tolist())
+            all_chunks.extend(chunks)
+            all_embeddings.append(embeddings)
+            all_metadatas.extend(metadatas)
 
-            ids.append(f"chunk_{chunk_id}")
-            chunk_id += 1
+        embeddings = np.concatenate(all_embeddings) if all_embeddings else np.zeros((0, 0), dtype=np.float32)
+        with span("store embeddings"):
+            ids = store_chunks(store, gen_path, all_chunks, embeddings, all_metadatas, by_reference)
+        with span("build lexical index"):
+            write_lexical(gen_path, ids, all_metadatas, all_chunks)
+        with span("build coarse vectors"):
+            write_coarse(gen_path, *coarse_entries(stored_outlines(all_metadatas), all_metadatas, embeddings, None))
+        update_manifest(gen_path, source=settings["source"], model=model, **(state or {}))
+        if settings["backend"] == "flat":
+            print_storage_report(store)
 
-    print(f"Generating embeddings for {len(chunks)} code chunks...")
-    embeddings = generate_embeddings(chunks)
+        with span("publish generation"), writer_lock(db_path):
+            cache.save()
+            publish(db_path, gen_path)
+            collect_garbage(db_path)
+    finally:
+        # An unpublished generation is removed by the next build's collection
+        build.release()
+    return len(all_chunks)
 
-    print("Storing embeddings in database...")
-    collection.add(
-        ids=ids,
-        documents=chunks,
-        embeddings=embeddings,
-        metadatas=metadatas
-    )
+
+def print_storage_report(store):
+    """Print vector storage size of a flat index against plain float32.
     
-    print(f"Indexing complete. {len(chunks)} functions indexed.")
\ No newline at end of file
+    Args:
+        store: Flat backend that has just been written
+    """
+    report = store.storage_report()
+    stored = report["vectors_bytes"] + report["codes_bytes"]
+    baseline = report["float32_bytes"]
+    if not baseline:
+        return
+    mb = 1024 * 1024
+    print(f"Vector storage: {stored / mb:.1f} MB on disk (float32 would be {baseline / mb:.1f} MB)")
+    if store.quantize:
+        print(f"Search scans {report['codes_bytes'] / mb:.1f} MB of {store.quantize} codes "
+              f"({baseline / report['codes_bytes']:.0f}x smaller than float32)")
\ No newline at end of file
@@ -0,0 +1,243 @@
+"""Background indexing jobs run by the model server.
+
+vec-server accepts index requests (POST /index) and runs them on a small
+pool of worker threads, embedding with the server's already loaded
+models. Each job reports its stage and counts as it goes, so clients can
+poll GET /jobs/{id} for progress and an ETA, and can cancel it: the
+build stops at its next progress report and the current index is left
+untouched. A repository has at most one queued or running job; indexing
+it again while one is active returns that job.
+
+The client side (submit_job, follow_job) is used by vec-index --via-server.
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+ACTIVE = ("queued", "running")
+POLL_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job when it has been cancelled."""
+
+
+class Job:
+    """State and progress of one indexing job.
+
+    Args:
+        job_id: Job identifier
+        root_path: Absolute path of the repository to index
+        options: Keyword arguments for index_codebase
+    """
+
+    def __init__(self, job_id, root_path, options):
+        self.id = job_id
+        self.root_path = root_path
+        self.options = options
+        self.status = "queued"
+        self.stage = None
+        self.files_scanned = 0
+        self.chunks_embedded = 0
+        self.chunks_total = None
+        self.functions = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._embed_started = None
+        self._cancel = threading.Event()
+
+    def progress(self, stage, done, total):
+        """Progress callback for index_codebase; raises once cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+        self.stage = stage
+        if stage == "scan":
+            self.files_scanned = done
+        elif stage == "embed":
+            if self._embed_started is None:
+                # Counts from here, so chunks reused from the cache don't skew the rate
+                self._embed_started = (time.perf_counter(), done)
+            self.chunks_embedded = done
+            self.chunks_total = total
+
+    def eta(self):
+        """Estimated seconds until embedding finishes, or None if unknown."""
+        if self.status != "running" or self.stage != "embed" or self._embed_started is None or not self.chunks_total:
+            return None
+        start, first = self._embed_started
+        done = self.chunks_embedded - first
+        if done <= 0:
+            return None
+        return (time.perf_counter() - start) / done * (self.chunks_total - self.chunks_embedded)
+
+    def to_dict(self):
+        """JSON-serializable view of the job."""
+        end = self.finished or time.time()
+        return {
+            "id": self.id,
+            "path": self.root_path,
+            "options": self.options,
+            "status": self.status,
+            "stage": self.stage,
+            "files_scanned": self.files_scanned,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_total": self.chunks_total,
+            "eta_s": self.eta(),
+            "elapsed_s": end - self.started if self.started else 0.0,
+            "functions": self.functions,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Runs indexing jobs on worker threads, at most one per repository.
+
+    Args:
+        run: Function(root_path, progress=..., **options) that performs a
+            job and returns the number of functions indexed
+        workers: Number of jobs run at the same time
+        keep: Number of finished jobs remembered for GET /jobs
+    """
+
+    def __init__(self, run, workers=1, keep=100):
+        self.run = run
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="codevec-index")
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, root_path, options):
+        """Queue a job for a repository, or return the one already active.
+
+        Args:
+            root_path: Repository to index
+            options: Keyword arguments for index_codebase
+
+        Returns:
+            Tuple of (job, True if a new job was queued)
+        """
+        root_path = str(Path(root_path).resolve())
+        with self._lock:
+            for job in self._jobs.values():
+                if job.root_path == root_path and job.status in ACTIVE:
+                    return job, False
+            job = Job(str(next(self._ids)), root_path, options)
+            self._jobs[job.id] = job
+            self._forget_finished()
+        self._executor.submit(self._execute, job)
+        return job, True
+
+    def _execute(self, job):
+        with self._lock:
+            if job.status != "queued":
+                return  # Cancelled while queued
+            job.status = "running"
+            job.started = time.time()
+        try:
+            job.functions = self.run(job.root_path, progress=job.progress, **job.options)
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job.finished = time.time()
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Return a job by id, or None."""
+        return self._jobs.get(job_id)
+
+    def list(self):
+        """Return all remembered jobs, oldest first."""
+        return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job.
+
+        Returns:
+            The job, or None if there is no such job
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished = time.time()
+            elif job.status == "running":
+                job._cancel.set()
+        return job
+
+
+def submit_job(url, root_path, options):
+    """Ask the model server to index a repository.
+
+    Args:
+        url: Base URL of the model server
+        root_path: Repository to index (sent as an absolute path)
+        options: Index options (backend, dtype, quantize, by_reference, full)
+
+    Returns:
+        Job dict from the server, with 'deduplicated' set if a job for the
+        repository was already running
+
+    Raises:
+        ConnectionError: If the server is unreachable or rejects the job
+    """
+    payload = {"path": str(Path(root_path).resolve()), **options}
+    try:
+        response = requests.post(f"{url}/index", json=payload, timeout=30)
+    except requests.RequestException as e:
+        raise ConnectionError(f"Failed to connect to model server at {url}: {e}") from e
+    if not response.ok:
+        raise ConnectionError(f"Model server rejected the job: {response.json().get('detail', response.text)}")
+    return response.json()
+
+
+def follow_job(url, job_id, interval=POLL_INTERVAL):
+    """Print a job's progress until it finishes.
+
+    Args:
+        url: Base URL of the model server
+        job_id: Job to follow
+        interval: Seconds between polls
+
+    Returns:
+        Final job dict
+
+    Raises:
+        ConnectionError: If the server becomes unreachable or no longer
+            knows the job
+    """
+    while True:
+        try:
+            response = requests.get(f"{url}/jobs/{job_id}", timeout=30)
+        except requests.RequestException as e:
+            raise ConnectionError(f"Lost connection to model server at {url}: {e}") from e
+        if not response.ok:
+            raise ConnectionError(f"Model server lost job {job_id}: {response.json().get('detail', response.text)}")
+        job = response.json()
+        line = f"  [{job['status']}] {job['stage'] or 'waiting'}: {job['files_scanned']} files scanned"
+        if job["chunks_total"] is not None:
+            line += f", {job['chunks_embedded']}/{job['chunks_total']} chunks embedded"
+        if job["eta_s"] is not None:
+            line += f", ETA {job['eta_s']:.0f}s"
+        print(f"\r{line:<100}", end="", flush=True)
+        if job["status"] not in ACTIVE:
+            print()
+            return job
+        time.sleep(interval)
@@ -0,0 +1,635 @@
+"""Lexical identifier index for hybrid search.
+
+Queries that name code ("create_jwt_token", "retry backoff http") are
+best answered by identifier matches, which embeddings only approximate.
+Next to the vectors, every index generation holds an inverted index
+(lexical/) over the words of each function: identifiers split at
+underscores and case changes ("parseHTTPResponse" -> parse, http,
+response) plus the whole identifier, with the function name counted
+NAME_BOOST times. Docstrings and comments contribute their words the
+same way.
+
+Searches use it twice:
+
+- a query that is exactly the name of at most n_results functions
+  returns those functions without embedding or reranking anything
+- otherwise the BM25 ranking of the query words is fused with the vector
+  ranking by reciprocal rank, so strong identifier matches reach the
+  reranker even when their embedding isn't among the nearest
+
+Postings are kept as NumPy arrays sorted by term, with the term-frequency
+part of each BM25 weight precomputed, so a lookup is a few slices and a
+bincount. They are saved in that form and memory-mapped when an index is
+opened, which costs no sorting or weighting. Indexes built before the lexical index existed
+are searched by vector only until they are rebuilt.
+"""
+
+import json
+import keyword
+import math
+import os
+import re
+import shutil
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from codevec.hierarchy import candidate_files
+from codevec.profiling import span
+
+LEXICAL_DIR = "lexical"
+DELTA_DIR = "delta"
+CHANGES_NAME = "changes.json"
+# Posting arrays saved as .npy files, in their sorted, weighted form
+ARRAYS = ("offsets", "docs", "tfs", "weights", "lengths")
+NAME_BOOST = 3
+RRF_K = 60
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+SUBWORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+STOPWORDS = {word.lower() for word in keyword.kwlist} | {
+    "self", "cls", "args", "kwargs", "the", "of", "to", "an", "is", "it", "on", "by", "be", "this", "that",
+}
+
+
+def split_identifier(word):
+    """Split an identifier into lowercase words at underscores and case changes."""
+    return [part.lower() for part in SUBWORD.findall(word)]
+
+
+@lru_cache(maxsize=65536)
+def _word_terms(word):
+    """Terms of one identifier (cached: code repeats the same identifiers)."""
+    parts = split_identifier(word)
+    found = tuple(part for part in parts if len(part) > 1 and part not in STOPWORDS)
+    whole = word.lower().strip("_")
+    if len(parts) > 1 and whole not in STOPWORDS:
+        found += (whole,)
+    return found
+
+
+def terms(text):
+    """Index terms of a text: split identifiers plus each whole identifier.
+
+    Args:
+        text: Source code, docstring or query
+
+    Returns:
+        List of terms, with repeats
+    """
+    found = []
+    for word in WORD.findall(text):
+        found.extend(_word_terms(word))
+    return found
+
+
+def _replace(path, write):
+    """Atomically replace path with the bytes written by write(file)."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _doc_ranges(paths):
+    """Map each file path to the [start, stop) ranges of its documents.
+
+    Functions of a file are added together, so most files have one range.
+    """
+    ranges = {}
+    start = 0
+    for doc in range(1, len(paths) + 1):
+        if doc == len(paths) or paths[doc] != paths[start]:
+            ranges.setdefault(paths[start], []).append([start, doc])
+            start = doc
+    return ranges
+
+
+class LexicalIndex:
+    """BM25 inverted index over function names and source words.
+
+    Functions are identified by their ids in the vector store.
+
+    Like a flat vector store, only the first add to an empty index writes
+    the main postings. Later changes go to a small delta index (delta/)
+    and a list of deleted functions and renamed files (changes.json), so
+    an incremental update writes only what it changes; searches combine
+    both. They are compacted into the main postings once they outgrow
+    COMPACT_FRACTION of the index.
+    """
+
+    # Pending delta and deleted functions, as a share of the main ones, that trigger a compaction
+    COMPACT_FRACTION = 0.1
+    COMPACT_MIN_DOCS = 2000
+
+    def __init__(self):
+        self.vocab = []
+        self.term_ids = {}
+        self.ids = []
+        self.file_paths = []
+        self.names = []
+        self.lengths = np.zeros(0, dtype=np.float32)
+        # One posting per (term, function): parallel arrays sorted by term
+        self.terms = np.zeros(0, dtype=np.int32)
+        self.docs = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.float32)
+        self.delta = None
+        self.deleted = np.zeros(0, dtype=np.int64)
+        # Path of a file in the main postings -> its path now
+        self.renamed = {}
+        self._alive = None
+        self._file_docs = None
+        self._finish()
+
+    def _finish(self):
+        """Sort postings by term and rebuild the lookup tables."""
+        order = np.argsort(self.terms, kind="stable")
+        self.terms, self.docs, self.tfs = self.terms[order], self.docs[order], self.tfs[order]
+        self.offsets = np.searchsorted(self.terms, np.arange(len(self.vocab) + 1))
+        average_length = float(self.lengths.mean()) if len(self.lengths) else 1.0
+        # BM25 term-frequency part of every posting; a query only multiplies in the idf
+        norm = K1 * (1 - B + B * self.lengths[self.docs] / average_length)
+        self.weights = (self.tfs * (K1 + 1) / (self.tfs + norm)).astype(np.float32)
+        self._by_name = None
+        self._file_docs = None
+        self._changed = True
+
+    def _expand(self):
+        """Recover the term of each posting of a loaded index before changing it."""
+        if self.terms is None:
+            self.terms = np.repeat(np.arange(len(self.vocab), dtype=np.int32), np.diff(self.offsets))
+
+    def _term_id(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = self.term_ids[term] = len(self.vocab)
+            self.vocab.append(term)
+        return term_id
+
+    def add(self, ids, metadatas, chunks):
+        """Index functions.
+
+        The first add to an empty index writes the main postings; later
+        ones go to the delta index.
+
+        Args:
+            ids: Vector store ids of the functions
+            metadatas: Metadata of each function (file_path and name are used)
+            chunks: Source of each function
+        """
+        if not ids:
+            return
+        if len(self.ids) or self.delta is not None:
+            if self.delta is None:
+                self.delta = _DeltaIndex()
+            self.delta.add(ids, metadatas, chunks)
+            self._compact_if_needed()
+            return
+        self._add(ids, metadatas, chunks)
+
+    def _add(self, ids, metadatas, chunks):
+        """Add functions to the main postings."""
+        self._expand()
+        new_terms, new_docs, new_tfs, new_lengths = [], [], [], []
+        for doc, (metadata, chunk) in enumerate(zip(metadatas, chunks), start=len(self.ids)):
+            counts = Counter(terms(chunk))
+            for term in terms(metadata["name"]):
+                counts[term] += NAME_BOOST - 1  # The name is also part of the source
+            for term, tf in counts.items():
+                new_terms.append(self._term_id(term))
+                new_docs.append(doc)
+                new_tfs.append(tf)
+            new_lengths.append(sum(counts.values()))
+        self.ids.extend(ids)
+        self.file_paths.extend(metadata["file_path"] for metadata in metadatas)
+        self.names.extend(metadata["name"] for metadata in metadatas)
+        self.terms = np.concatenate([self.terms, np.asarray(new_terms, dtype=np.int32)])
+        self.docs = np.concatenate([self.docs, np.asarray(new_docs, dtype=np.int32)])
+        self.tfs = np.concatenate([self.tfs, np.asarray(new_tfs, dtype=np.float32)])
+        self.lengths = np.concatenate([self.lengths, np.asarray(new_lengths, dtype=np.float32)])
+        self._finish()
+
+    def delete_files(self, file_paths):
+        """Remove every function of the given files.
+
+        Functions of the main postings are only marked as deleted.
+        """
+        if self.delta is not None:
+            self.delta.delete_files(file_paths)
+        file_paths = set(file_paths)
+        originals = ({path for path in file_paths if path not in self.renamed}
+                     | {old for old, new in self.renamed.items() if new in file_paths})
+        docs = [doc for path in originals for doc in self._docs_of_file(path)]
+        if docs:
+            self.deleted = np.union1d(self.deleted, docs).astype(np.int64)
+            self._alive = None
+            self._compact_if_needed()
+
+    def rename_file(self, old_path, new_path):
+        """Point every function of old_path at new_path."""
+        if self.delta is not None:
+            self.delta.rename_file(old_path, new_path)
+        for original in {old_path, *self.renamed}:
+            if self.renamed.get(original, original) == old_path and self._docs_of_file(original):
+                self.renamed[original] = new_path
+
+    def _remove_files(self, file_paths):
+        """Remove the functions of file_paths from the main postings."""
+        file_paths = set(file_paths)
+        keep = np.array([path not in file_paths for path in self.file_paths], dtype=bool)
+        if not keep.all():
+            self._keep(keep)
+
+    def _keep(self, keep):
+        """Drop the main postings of every function not in the keep mask."""
+        self._expand()
+        new_doc = np.cumsum(keep) - 1
+        postings = keep[self.docs]
+        self.terms, self.tfs = self.terms[postings], self.tfs[postings]
+        self.docs = new_doc[self.docs[postings]].astype(np.int32)
+        self.lengths = self.lengths[keep]
+        rows = np.flatnonzero(keep)
+        self.ids = [self.ids[row] for row in rows]
+        self.file_paths = [self.file_paths[row] for row in rows]
+        self.names = [self.names[row] for row in rows]
+        self._finish()
+
+    def _rename(self, old_path, new_path):
+        """Rename a file in the main postings."""
+        self.file_paths = [new_path if path == old_path else path for path in self.file_paths]
+
+    def _docs_of_file(self, file_path):
+        """Main documents of a file, by its path when they were written."""
+        if self._file_docs is None:
+            self._file_docs = _doc_ranges(self.file_paths)
+        return [doc for start, stop in self._file_docs.get(file_path, ()) for doc in range(start, stop)]
+
+    def _alive_docs(self):
+        """Boolean mask of the main documents not marked as deleted, or None if all are."""
+        if self._alive is None and len(self.deleted):
+            self._alive = np.ones(len(self.ids), dtype=bool)
+            self._alive[self.deleted] = False
+        return self._alive
+
+    def compact(self):
+        """Merge the delta index and pending changes into the main postings."""
+        with span("compact lexical index"):
+            self._expand()
+            if self.renamed:
+                self.file_paths = [self.renamed.get(path, path) for path in self.file_paths]
+            if len(self.deleted):
+                self._keep(self._alive_docs())
+            delta = self.delta
+            if delta is not None:
+                delta._expand()
+                term_ids = np.array([self._term_id(term) for term in delta.vocab], dtype=np.int32)
+                self.terms = np.concatenate([self.terms, term_ids[delta.terms]]).astype(np.int32)
+                self.docs = np.concatenate([self.docs, delta.docs + len(self.ids)]).astype(np.int32)
+                self.tfs = np.concatenate([self.tfs, delta.tfs]).astype(np.float32)
+                self.lengths = np.concatenate([self.lengths, delta.lengths]).astype(np.float32)
+                self.ids = self.ids + delta.ids
+                self.file_paths = self.file_paths + delta.file_paths
+                self.names = self.names + delta.names
+            self.delta = None
+            self.deleted = np.zeros(0, dtype=np.int64)
+            self.renamed = {}
+            self._alive = None
+            self._finish()
+
+    def _compact_if_needed(self):
+        pending = len(self.deleted) + (len(self.delta.ids) if self.delta is not None else 0)
+        if pending > max(self.COMPACT_MIN_DOCS, self.COMPACT_FRACTION * len(self.ids)):
+            self.compact()
+
+    def exact(self, query):
+        """Return the ids of functions named exactly like the query.
+
+        Args:
+            query: Search query; only a single identifier can match
+
+        Returns:
+            List of ids (empty if the query isn't an identifier)
+        """
+        query = query.strip()
+        if not WORD.fullmatch(query):
+            return []
+        if self._by_name is None:
+            by_name = {}
+            for doc, name in enumerate(self.names):
+                by_name.setdefault(name, []).append(doc)
+            self._by_name = by_name
+        alive = self._alive_docs()
+        ids = [self.ids[doc] for doc in self._by_name.get(query, ()) if alive is None or alive[doc]]
+        return ids + self.delta.exact(query) if self.delta is not None else ids
+
+    def search(self, query, n_results):
+        """Rank functions by BM25 score of the query terms.
+
+        Args:
+            query: Search query
+            n_results: Maximum number of functions to return
+
+        Returns:
+            List of (id, score) pairs, best first
+        """
+        segments = [self] if self.delta is None else [self, self.delta]
+        alive = self._alive_docs()
+        count = sum(len(segment.ids) for segment in segments) - len(self.deleted)
+        docs, weights = [[] for _ in segments], [[] for _ in segments]
+        for term in set(terms(query)):
+            postings = [segment._postings(term) for segment in segments]
+            # Document frequency over every segment, without deleted functions
+            frequency = sum(len(segment_docs) for segment_docs, _ in postings)
+            if alive is not None:
+                frequency -= int(np.count_nonzero(~alive[postings[0][0]]))
+            if frequency == 0:
+                continue
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for s, (segment_docs, segment_weights) in enumerate(postings):
+                if len(segment_docs):
+                    docs[s].append(segment_docs)
+                    weights[s].append(idf * segment_weights)
+
+        ranked = []
+        for s, segment in enumerate(segments):
+            matched, scores = _sum_postings(docs[s], weights[s], len(segment.ids))
+            if s == 0 and alive is not None:
+                matched, scores = matched[alive[matched]], scores[alive[matched]]
+            top = np.arange(len(matched))
+            if len(top) > n_results:
+                top = np.argpartition(-scores, n_results - 1)[:n_results]
+            ranked.extend((segment.ids[matched[i]], float(scores[i])) for i in top)
+        return sorted(ranked, key=lambda entry: -entry[1])[:n_results]
+
+    def _postings(self, term):
+        """Documents and term-frequency weights of a term's postings."""
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return self.docs[:0], self.weights[:0]
+        start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.docs[start:stop], self.weights[start:stop]
+
+    def save(self, gen_path):
+        """Write the index into a generation directory.
+
+        Only the delta index and changes.json are written unless the main
+        postings changed. Postings are written sorted and weighted (see
+        ARRAYS), so load() only maps them.
+        """
+        path = Path(gen_path) / LEXICAL_DIR
+        if self._changed:
+            self._write(path)
+        if self.delta is not None:
+            if self.delta._changed:
+                self.delta._write(path / DELTA_DIR)
+        else:
+            shutil.rmtree(path / DELTA_DIR, ignore_errors=True)
+        if len(self.deleted) or self.renamed:
+            changes = json.dumps({"deleted": self.deleted.tolist(), "renamed": self.renamed}, separators=(",", ":"))
+            _replace(path / CHANGES_NAME, lambda f: f.write(changes.encode("utf-8")))
+        else:
+            (path / CHANGES_NAME).unlink(missing_ok=True)
+
+    def _write(self, path):
+        """Write the postings and document table into path.
+
+        The document table is written last; _read() retries if it doesn't
+        match the postings.
+        """
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            _replace(path / f"{name}.npy", lambda f: np.save(f, getattr(self, name)))
+        self._file_docs = _doc_ranges(self.file_paths)
+        table = json.dumps({"vocab": self.vocab, "ids": self.ids, "file_paths": self.file_paths, "names": self.names,
+                            "file_docs": self._file_docs}, separators=(",", ":"))
+        _replace(path / "docs.json", lambda f: f.write(table.encode("utf-8")))
+        self._changed = False
+
+    @classmethod
+    def load(cls, gen_path):
+        """Read the index of a generation.
+
+        Raises:
+            FileNotFoundError: If the generation has no lexical index
+        """
+        path = Path(gen_path) / LEXICAL_DIR
+        index = cls._read(path)
+        if (path / DELTA_DIR / "docs.json").exists():
+            index.delta = _DeltaIndex._read(path / DELTA_DIR)
+        if (path / CHANGES_NAME).exists():
+            changes = json.loads((path / CHANGES_NAME).read_text())
+            index.deleted = np.asarray(changes["deleted"], dtype=np.int64)
+            index.renamed = changes["renamed"]
+        return index
+
+    @classmethod
+    def _read(cls, path):
+        """Map the postings and read the document table written by _write()."""
+        index = cls()
+        for _ in range(3):
+            arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in ARRAYS}
+            table = json.loads((path / "docs.json").read_text())
+            if len(table["ids"]) == len(arrays["lengths"]):
+                break
+        for name in ARRAYS:
+            setattr(index, name, arrays[name])
+        index.terms = None  # Only needed to change the index (see _expand)
+        index._by_name = None
+        index._changed = False
+        index.vocab, index.ids, index.file_paths, index.names = (
+            table[name] for name in ("vocab", "ids", "file_paths", "names"))
+        index.term_ids = {term: term_id for term_id, term in enumerate(index.vocab)}
+        # Missing from older indexes, which compute it on first use
+        index._file_docs = table.get("file_docs")
+        return index
+
+
+class _DeltaIndex(LexicalIndex):
+    """Delta index of a LexicalIndex; small, so changes rewrite its postings."""
+
+    def add(self, ids, metadatas, chunks):
+        self._add(ids, metadatas, chunks)
+
+    def delete_files(self, file_paths):
+        self._remove_files(file_paths)
+
+    def rename_file(self, old_path, new_path):
+        self._rename(old_path, new_path)
+        self._changed = True
+
+
+def _sum_postings(docs, weights, count):
+    """Sum the weights of each document over several posting lists.
+
+    Args:
+        docs: Document arrays of the posting lists
+        weights: Weight arrays of the posting lists
+        count: Number of documents in the index
+
+    Returns:
+        Tuple of (matched documents, their scores)
+    """
+    if not docs:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    if len(docs) == 1:
+        return np.asarray(docs[0]), weights[0]  # A posting list has one entry per function
+    if sum(len(d) for d in docs) * 8 < count:
+        # Few matches: sort them rather than sum into an array over every function
+        matched, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        return matched, np.bincount(inverse, weights=np.concatenate(weights))
+    totals = np.bincount(np.concatenate(docs), weights=np.concatenate(weights))
+    matched = np.flatnonzero(totals)
+    return matched, totals[matched]
+
+
+def write_lexical(gen_path, ids, metadatas, chunks):
+    """Create the lexical index of a new generation."""
+    index = LexicalIndex()
+    index.add(ids, metadatas, chunks)
+    index.save(gen_path)
+
+
+def open_lexical(gen_path):
+    """Open a generation's lexical index, or return None if it has none."""
+    if not (Path(gen_path) / LEXICAL_DIR / "docs.json").exists():
+        return None
+    with span("open lexical index"):
+        return LexicalIndex.load(gen_path)
+
+
+def update_lexical(gen_path, paths, renames, ids, metadatas, chunks):
+    """Replace the functions of re-indexed files in place.
+
+    Does nothing for generations without a lexical index.
+
+    Args:
+        gen_path: Generation directory
+        paths: Files whose functions are replaced
+        renames: (old, new) path pairs whose functions move unchanged
+        ids, metadatas, chunks: New functions, as for LexicalIndex.add
+    """
+    index = open_lexical(gen_path)
+    if index is None:
+        return
+    for old, new in renames:
+        index.rename_file(old, new)
+    index.delete_files(paths)
+    index.add(ids, metadatas, chunks)
+    index.save(gen_path)
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Merge rankings by summing 1 / (k + rank) over the lists an item is in.
+
+    Args:
+        rankings: Lists of items, best first
+        k: Damping constant; larger values flatten the rank weights
+
+    Returns:
+        All items, best fused score first (ties keep first-seen order)
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: -scores[item])
+
+
+def exact_matches(store, lexical, query, n_results):
+    """Look up functions named exactly like the query.
+
+    Args:
+        store: Open backend
+        lexical: LexicalIndex of the same generation, or None
+        query: Search query
+        n_results: Most matches to return; more matches than this are too
+            ambiguous to skip the ranked search
+
+    Returns:
+        Entries as returned by the backend's get(), or None
+    """
+    if lexical is None:
+        return None
+    with span("exact name lookup"):
+        ids = lexical.exact(query)
+    if not ids or len(ids) > n_results:
+        return None
+    return store.get(ids)
+
+
+def fuse_candidates(store, lexical, query, query_embedding, raw_results, fetch_count):
+    """Fuse a query's vector candidates with its BM25 candidates.
+
+    Lexical candidates missing from the vector results are fetched from
+    the store, and their distance to the query computed from their stored
+    vectors.
+
+    Args:
+        store: Open backend
+        lexical: LexicalIndex of the same generation, or None
+        query: Search query
+        query_embedding: Query vector
+        raw_results: Single-query result of store.query()
+        fetch_count: Number of candidates to return
+
+    Returns:
+        Tuple of (documents, metadatas, distances) lists, best fused rank first
+    """
+    documents, metadatas, distances = (raw_results[key][0] for key in ("documents", "metadatas", "distances"))
+    if lexical is None:
+        return documents, metadatas, distances
+    with span("lexical search"):
+        lexical_ids = [id_ for id_, _ in lexical.search(query, fetch_count)]
+    vector_ids = raw_results["ids"][0]
+    fused = reciprocal_rank_fusion([vector_ids, lexical_ids])[:fetch_count]
+
+    entries = {id_: entry for id_, entry in zip(vector_ids, zip(documents, metadatas, distances))}
+    missing = [id_ for id_ in fused if id_ not in entries]
+    if missing:
+        extra = store.get(missing)
+        similarities = extra["embeddings"] @ np.asarray(query_embedding, dtype=np.float32)
+        for id_, document, metadata, similarity in zip(extra["ids"], extra["documents"], extra["metadatas"],
+                                                        similarities):
+            entries[id_] = (document, metadata, float(2.0 - 2.0 * similarity))
+    fused = [entries[id_] for id_ in fused if id_ in entries]
+    return [list(column) for column in zip(*fused)] if fused else ([], [], [])
+
+
+def batch_candidates(store, lexical, gen_path, queries, query_embeddings, fetch_count, modules=None):
+    """Fetch the fused candidates of several queries, as fuse_candidates() does for one.
+
+    Queries searched over every function share one store query; on large
+    indexes, each query is restricted to the files of its nearest modules
+    (see codevec.hierarchy.candidate_files) and queried on its own.
+
+    Args:
+        store: Open backend
+        lexical: LexicalIndex of the same generation, or None
+        gen_path: Generation directory
+        queries: Search queries
+        query_embeddings: Vector of each query
+        fetch_count: Number of candidates per query
+        modules: As for candidate_files()
+
+    Returns:
+        List with a (documents, metadatas, distances) tuple for each query
+    """
+    count = store.count()
+    files = [candidate_files(gen_path, embedding, count, modules) for embedding in query_embeddings]
+    raw_results = [None] * len(queries)
+    unrestricted = [i for i, query_files in enumerate(files) if query_files is None]
+    if unrestricted:
+        results = store.query(query_embeddings=[query_embeddings[i] for i in unrestricted], n_results=fetch_count)
+        for j, i in enumerate(unrestricted):
+            raw_results[i] = {key: [results[key][j]] for key in ("ids", "documents", "metadatas", "distances")}
+    for i, query_files in enumerate(files):
+        if query_files is not None:
+            raw_results[i] = store.query(query_embeddings=[query_embeddings[i]], n_results=fetch_count,
+                                         files=query_files)
+    return [fuse_candidates(store, lexical, query, embedding, raw, fetch_count)
+            for query, embedding, raw in zip(queries, query_embeddings, raw_results)]
@@ -0,0 +1,253 @@
+"""Load generator for the model server.
+
+Replays a mix of the requests vec-index and vec-search send to
+vec-server, built from the functions stored in an index:
+
+- embed-doc: /embed with a batch of function sources (indexing)
+- embed-query: /embed with one short query (searching)
+- rerank: /rerank with a query and a page of candidate functions
+
+Requests are issued by a pool of worker threads, either as fast as the
+workers allow (closed loop) or on a fixed schedule at a target rate (open
+loop). In open-loop mode latency is measured from the scheduled send
+time, so time spent waiting for a free worker counts against the server
+instead of hiding it.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from codevec.backends import open_backend
+from codevec.generations import acquire_reader
+from codevec.sources import load_sources
+
+DEFAULT_MIX = {"embed-doc": 0.5, "embed-query": 0.3, "rerank": 0.2}
+SAMPLE_LIMIT = 5000
+
+
+def load_corpus(root_path):
+    """Collect function sources and query-like strings from an index.
+
+    Queries are made from function names and docstring summaries (see
+    derive_queries), which have the length and vocabulary of real queries.
+
+    Args:
+        root_path: Root of an indexed repository
+
+    Returns:
+        Tuple of (documents, queries) lists
+    """
+    db_path = Path(root_path).resolve() / ".codevec"
+    if not db_path.is_dir():
+        raise FileNotFoundError(f"No index found at {db_path} (run vec-index first)")
+
+    with acquire_reader(db_path) as lease:
+        store = open_backend(lease.path)
+        documents, metadatas = store.sample(SAMPLE_LIMIT)
+        if store.manifest.get("source") == "reference":
+            documents = load_sources(metadatas, lease.path)
+
+    return [d for d in documents if d], derive_queries(documents, metadatas)
+
+
+def derive_queries(documents, metadatas):
+    """Make search-like queries from function names and docstring summaries.
+
+    Args:
+        documents: Function sources
+        metadatas: Metadata of each function
+
+    Returns:
+        List of query strings
+    """
+    queries = []
+    for document, metadata in zip(documents, metadatas):
+        docstring = re.search(r'(?:"""|\'\'\')\s*(.+)', document or "")
+        if docstring:
+            queries.append(docstring.group(1).strip().rstrip("."))
+        queries.append(" ".join(part for part in metadata["name"].split("_") if part))
+    return [q for q in queries if q]
+
+
+def build_request(kind, documents, queries, rng, doc_batch, rerank_docs):
+    """Build the path and JSON payload of one request.
+
+    Args:
+        kind: Request kind (a key of DEFAULT_MIX)
+        documents: Function sources to draw from
+        queries: Query strings to draw from
+        rng: Random number generator
+        doc_batch: Texts per embed-doc request
+        rerank_docs: Candidate documents per rerank request
+
+    Returns:
+        Tuple of (path, payload, number of texts)
+    """
+    if kind == "embed-doc":
+        texts = rng.choices(documents, k=doc_batch)
+        return "/embed", {"texts": texts}, len(texts)
+    if kind == "embed-query":
+        return "/embed", {"texts": [rng.choice(queries)]}, 1
+    candidates = rng.choices(documents, k=rerank_docs)
+    return "/rerank", {"query": rng.choice(queries), "documents": candidates}, len(candidates)
+
+
+def percentiles(samples):
+    """Return p50/p95/p99/max (nearest rank) of latency samples in milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+    return {"p50_ms": pick(50), "p95_ms": pick(95), "p99_ms": pick(99), "max_ms": ordered[-1]}
+
+
+def run_load(url, documents, queries, mix=None, concurrency=8, rate=None, duration=30.0,
+             doc_batch=32, rerank_docs=10, timeout=60.0, seed=0):
+    """Drive the server with a request mix and collect per-request results.
+
+    Args:
+        url: Base URL of the model server
+        documents: Function sources to send
+        queries: Query strings to send
+        mix: Dict of request kind -> share of requests (default DEFAULT_MIX)
+        concurrency: Number of worker threads
+        rate: Target requests per second, or None to send as fast as possible
+        duration: Length of the run in seconds
+        doc_batch: Texts per embed-doc request
+        rerank_docs: Candidate documents per rerank request
+        timeout: Per-request timeout in seconds
+        seed: Seed for the request mix and payloads
+
+    Returns:
+        Dict with the run 'elapsed' time and 'results', a list of
+        (kind, texts, latency_ms, error or None) tuples
+    """
+    mix = mix or DEFAULT_MIX
+    kinds, weights = list(mix), list(mix.values())
+    lock = threading.Lock()
+    results = []
+    sequence = iter(range(10 ** 12))
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        session = requests.Session()
+        while True:
+            with lock:
+                n = next(sequence)
+            scheduled = start + n / rate if rate else time.perf_counter()
+            if scheduled >= deadline:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            kind = rng.choices(kinds, weights)[0]
+            path, payload, texts = build_request(kind, documents, queries, rng, doc_batch, rerank_docs)
+            error = None
+            try:
+                response = session.post(f"{url}{path}", json=payload, timeout=timeout)
+                if not response.ok:
+                    error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = type(e).__name__
+            latency = (time.perf_counter() - scheduled) * 1000
+            with lock:
+                results.append((kind, texts, latency, error))
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {"elapsed": time.perf_counter() - start, "results": results}
+
+
+def summarize(run):
+    """Aggregate run results per request kind and overall.
+
+    Args:
+        run: Return value of run_load
+
+    Returns:
+        Dict of kind (plus 'all') -> throughput, error and latency figures
+    """
+    elapsed = run["elapsed"]
+    groups = {"all": run["results"]}
+    for result in run["results"]:
+        groups.setdefault(result[0], []).append(result)
+
+    summary = {}
+    for kind, results in groups.items():
+        ok = [r for r in results if r[3] is None]
+        errors = {}
+        for r in results:
+            if r[3] is not None:
+                errors[r[3]] = errors.get(r[3], 0) + 1
+        summary[kind] = {
+            "requests": len(results),
+            "requests_per_s": len(ok) / elapsed,
+            "texts_per_s": sum(r[1] for r in ok) / elapsed,
+            "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+            "errors": errors,
+            **percentiles([r[2] for r in ok]),
+        }
+    return summary
+
+
+def print_summary(summary, elapsed):
+    """Print the summary as a table."""
+    print(f"\nCompleted in {elapsed:.1f}s")
+    print("-" * 92)
+    print(f"{'kind':<13}{'requests':>10}{'req/s':>10}{'texts/s':>10}{'errors':>9}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    print("-" * 92)
+    for kind, s in summary.items():
+        print(f"{kind:<13}{s['requests']:>10}{s['requests_per_s']:>10.1f}{s['texts_per_s']:>10.1f}"
+              f"{s['error_rate']:>9.1%}{s.get('p50_ms', 0):>10.1f}{s.get('p95_ms', 0):>10.1f}"
+              f"{s.get('p99_ms', 0):>10.1f}{s.get('max_ms', 0):>10.1f}")
+    print("-" * 92)
+    for kind, s in summary.items():
+        for error, count in s["errors"].items():
+            if kind != "all":
+                print(f"  {kind}: {count} x {error}")
+
+
+def load_test(root_path, url="http://localhost:8000", output=None, **options):
+    """Load-test a running model server and print the results.
+
+    Args:
+        root_path: Indexed repository to draw request texts from
+        url: Base URL of the model server
+        output: Optional JSON file to write the summary to
+        **options: Passed to run_load (concurrency, rate, duration, mix, ...)
+    """
+    try:
+        requests.get(f"{url}/health", timeout=5).raise_for_status()
+    except requests.RequestException as e:
+        raise ConnectionError(f"Model server at {url} is not reachable: {e}") from e
+
+    documents, queries = load_corpus(root_path)
+    if not documents:
+        raise ValueError(f"Index at {root_path} contains no functions")
+
+    rate = options.get("rate")
+    print(f"Loaded {len(documents)} functions and {len(queries)} queries from {root_path}")
+    print(f"Sending to {url} with {options.get('concurrency', 8)} workers "
+          f"{f'at {rate:g} req/s' if rate else 'as fast as possible'} for {options.get('duration', 30.0):g}s...")
+
+    run = run_load(url, documents, queries, **options)
+    summary = summarize(run)
+    print_summary(summary, run["elapsed"])
+
+    if output:
+        report = {"url": url, "options": {k: v for k, v in options.items()}, "elapsed_s": run["elapsed"], "summary": summary}
+        Path(output).write_text(json.dumps(report, indent=2))
+        print(f"Results written to {output}")
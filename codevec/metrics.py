@@ -0,0 +1,171 @@
+"""In-process metrics for the model server.
+
+Minimal counters, gauges and histograms that render in the Prometheus
+text exposition format. Recording is a dictionary update under a lock,
+cheap enough for the /embed and /rerank hot paths, and nothing is
+computed until a scrape.
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name + _format_labels(self.labels, k), v) for k, v in self.values.items()]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, *label_values):
+        self.inc(*label_values, amount=-1)
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self.values[label_values] = value
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        self.series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            items = [(k, list(v)) for k, v in self.series.items()]
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append((f"{self.name}_bucket" + _format_labels(self.labels, label_values, ("le", bound)), cumulative))
+            lines.append((f"{self.name}_sum" + _format_labels(self.labels, label_values), series[-1]))
+            lines.append((f"{self.name}_count" + _format_labels(self.labels, label_values), cumulative))
+        return lines
+
+    def summary(self, *label_values):
+        """Count, mean and estimated p50/p95/p99 for one label set."""
+        with self._lock:
+            series = list(self.series.get(label_values, []))
+        if not series or not sum(series[:-1]):
+            return {"count": 0}
+        counts = series[:-1]
+        total = sum(counts)
+        result = {"count": total, "mean": series[-1] / total}
+        for q in (50, 95, 99):
+            result[f"p{q}"] = self._quantile(counts, total, q / 100)
+        return result
+
+    def _quantile(self, counts, total, q):
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i >= len(self.buckets):
+                    return self.buckets[-1]  # Beyond the last bucket
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+def resident_memory_bytes():
+    """Current resident set size of this process.
+
+    Read from /proc on Linux, otherwise from psutil if it is installed,
+    then the peak RSS from resource (POSIX only); 0 if none is available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self.metrics = []
+        self.start_time = time.time()
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name} {value}" for name, value in metric.samples())
+        lines.append("# HELP process_resident_memory_bytes Resident memory size in bytes.")
+        lines.append("# TYPE process_resident_memory_bytes gauge")
+        lines.append(f"process_resident_memory_bytes {resident_memory_bytes()}")
+        lines.append("# HELP process_start_time_seconds Start time of the process since unix epoch in seconds.")
+        lines.append("# TYPE process_start_time_seconds gauge")
+        lines.append(f"process_start_time_seconds {self.start_time}")
+        return "\n".join(lines) + "\n"
@@ -4,22 +4,35 @@ Provides both local (in-process) and remote (server-based) implementations
 for generating embeddings and reranking search results.
 """
 
-from sentence_transformers import SentenceTransformer, CrossEncoder
+import os
+
 import requests
 
+from codevec.profiling import span
+
+RUNTIME_ENV = "CODEVEC_RUNTIME"
+RUNTIMES = ("torch", "onnx")
+DEFAULT_EMBEDDER = "all-MiniLM-L6-v2"
+DEFAULT_RERANKER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
 class LocalEmbedder:
     """Embedding model using local sentence-transformers.
     
     Runs the embedding model in-process without requiring a server.
     """
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = DEFAULT_EMBEDDER):
         """Initialize the local embedding model.
         
         Args:
             model_name: HuggingFace model identifier (default: "all-MiniLM-L6-v2")
         """
-        self.model = SentenceTransformer(model_name)
+        # Imported here so runs served by vec-server never load torch
+        with span("import sentence_transformers"):
+            from sentence_transformers import SentenceTransformer
+        with span("load embedding model"):
+            self.model_name = model_name
+            self.model = SentenceTransformer(model_name)
     
     def embed(self, texts: list[str], task_type: str = "document") -> list[list[float]]:
         """Generate embeddings for text snippets.
@@ -31,7 +44,8 @@ class LocalEmbedder:
         Returns:
             List of embedding vectors (normalized)
         """
-        embeddings = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        with span(f"embed {len(texts)} texts"):
+            embeddings = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
         return embeddings.tolist()
 
 class RemoteEmbedder:
@@ -41,8 +55,18 @@ class RemoteEmbedder:
     models loaded in memory for better performance.
     """
 
-    def __init__(self, url: str = "http://localhost:8000"):
+    def __init__(self, url: str = "http://localhost:8000", model_name: str = DEFAULT_EMBEDDER):
         self.url = url
+        # The server loads the requested model on first use
+        self.model = model_name
+        self._model_name = None
+
+    @property
+    def model_name(self):
+        """Name of the server's vectors, tagged with its runtime (see local_model_name)."""
+        if self._model_name is None:
+            self.embed([])
+        return self._model_name
     
     def embed(self, texts: list[str], task_type: str = "document") -> list[list[float]]:
         """Generate embeddings via remote server.
@@ -58,9 +82,12 @@ class RemoteEmbedder:
             ConnectionError: If server is unreachable or returns an error
         """
         try:
-            response = requests.post(f"{self.url}/embed", json={"texts": texts}, timeout=60)
-            response.raise_for_status()
-            return response.json()["embeddings"]
+            with span(f"remote embed {len(texts)} texts"):
+                response = requests.post(f"{self.url}/embed", json={"texts": texts, "model": self.model}, timeout=60)
+                response.raise_for_status()
+                data = response.json()
+                self._model_name = data["model"]
+                return data["embeddings"]
         except requests.RequestException as e:
             raise ConnectionError(f"Failed to connect to embedding server at {self.url}: {e}") from e
 
@@ -71,13 +98,16 @@ class LocalReranker:
     deeper semantic understanding of query-document pairs.
     """
     
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+    def __init__(self, model_name: str = DEFAULT_RERANKER):
         """Initialize the local reranker.
         
         Args:
             model_name: HuggingFace cross-encoder model identifier
         """
-        self.model = CrossEncoder(model_name)
+        with span("import sentence_transformers"):
+            from sentence_transformers import CrossEncoder
+        with span("load reranker model"):
+            self.model = CrossEncoder(model_name)
     
     def rank(self, query: str, documents: list[str], return_documents: bool = False):
         """Rank documents by relevance to query.
@@ -90,7 +120,26 @@ class LocalReranker:
         Returns:
             List of ranking results with scores and corpus IDs
         """
-        return self.model.rank(query, documents, return_documents=return_documents)
+        with span(f"rerank {len(documents)} documents"):
+            return self.model.rank(query, documents, return_documents=return_documents)
+
+    def rank_many(self, queries: list[str], documents: list[list[str]]):
+        """Rank candidate documents for several queries in shared batches.
+        
+        All (query, document) pairs are scored in one predict call, so the
+        cross-encoder runs full batches instead of one small batch per query.
+        
+        Args:
+            queries: Search query strings
+            documents: Candidate documents for each query
+            
+        Returns:
+            List with the rankings of each query (as returned by rank)
+        """
+        pairs = [(query, doc) for query, docs in zip(queries, documents) for doc in docs]
+        with span(f"rerank {len(pairs)} pairs"):
+            scores = self.model.predict(pairs, batch_size=64) if pairs else []
+        return split_rankings(scores, documents)
 
 
 class RemoteReranker:
@@ -118,13 +167,56 @@ class RemoteReranker:
             ConnectionError: If server is unreachable or returns an error
         """
         try:
-            response = requests.post(f"{self.url}/rerank", json={"query": query, "documents": documents}, timeout=60)
-            response.raise_for_status()
-            return response.json()["rankings"]
+            with span(f"remote rerank {len(documents)} documents"):
+                response = requests.post(f"{self.url}/rerank", json={"query": query, "documents": documents}, timeout=60)
+                response.raise_for_status()
+                return response.json()["rankings"]
+        except requests.RequestException as e:
+            raise ConnectionError(f"Failed to connect to reranker server at {self.url}: {e}") from e
+
+    def rank_many(self, queries: list[str], documents: list[list[str]]):
+        """Rank candidate documents for several queries via remote server.
+        
+        Args:
+            queries: Search query strings
+            documents: Candidate documents for each query
+            
+        Returns:
+            List with the rankings of each query
+            
+        Raises:
+            ConnectionError: If server is unreachable or returns an error
+        """
+        try:
+            with span(f"remote rerank {sum(len(d) for d in documents)} pairs"):
+                response = requests.post(f"{self.url}/rerank_batch", json={"queries": queries, "documents": documents}, timeout=300)
+                response.raise_for_status()
+                return response.json()["rankings"]
         except requests.RequestException as e:
             raise ConnectionError(f"Failed to connect to reranker server at {self.url}: {e}") from e
 
 
+def split_rankings(scores, documents):
+    """Turn a flat list of pair scores into per-query rankings.
+    
+    Args:
+        scores: Score of every (query, document) pair, grouped by query
+        documents: Candidate documents for each query
+        
+    Returns:
+        List with one ranking per query: dicts with 'corpus_id' and 'score',
+        best first
+    """
+    rankings = []
+    offset = 0
+    for docs in documents:
+        ranking = [{"corpus_id": i, "score": float(scores[offset + i])} for i in range(len(docs))]
+        ranking.sort(key=lambda r: r["score"], reverse=True)
+        rankings.append(ranking)
+        offset += len(docs)
+    return rankings
+
+
 # Cache server status to avoid multiple health checks
 _server_status = None
 
@@ -141,26 +233,118 @@ def is_server_running(url="http://localhost:8000"):
     """
     global _server_status
     if _server_status is None:
-        try:
-            _server_status = requests.get(f"{url}/health", timeout=1).ok
-        except requests.RequestException:
-            _server_status = False
+        with span("server health probe"):
+            try:
+                _server_status = requests.get(f"{url}/health", timeout=1).ok
+            except requests.RequestException:
+                _server_status = False
     return _server_status
 
 
-def create_embedder():
+def local_runtime():
+    """Return the configured in-process inference runtime.
+    
+    Set with the CODEVEC_RUNTIME environment variable: "torch" (default)
+    runs sentence-transformers, "onnx" runs exported int8 models on ONNX
+    Runtime (see codevec.onnx_runtime).
+    
+    Returns:
+        Runtime name
+        
+    Raises:
+        ValueError: If the variable names an unknown runtime
+    """
+    runtime = os.environ.get(RUNTIME_ENV, "torch").strip().lower() or "torch"
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown {RUNTIME_ENV} '{runtime}' (choose {' or '.join(RUNTIMES)})")
+    return runtime
+
+
+def local_model_name(model_name: str = DEFAULT_EMBEDDER):
+    """Return the name recorded for vectors of model_name from the configured runtime.
+    
+    Manifests and embedding caches record it, so vectors from different
+    runtimes are never mixed: the torch runtime records the model name,
+    ONNX Runtime tags it (see codevec.onnx_runtime.runtime_model_name).
+    
+    Args:
+        model_name: HuggingFace model identifier
+        
+    Returns:
+        Model name, tagged with the runtime if it isn't torch
+    """
+    if local_runtime() == "onnx":
+        from codevec.onnx_runtime import load_config, runtime_model_name
+        return runtime_model_name(model_name, load_config("embedder", model_name))
+    return model_name
+
+
+def base_model(model_name: str):
+    """Strip the runtime tag from a recorded model name.
+    
+    Runtimes of the same model stay within the parity vec-onnx check
+    enforces, so an index built with one can be searched with another.
+    
+    Args:
+        model_name: Model name from a manifest or an embedder
+        
+    Returns:
+        HuggingFace model identifier
+    """
+    return model_name.split("+", 1)[0]
+
+
+def create_local_embedder(model_name: str = DEFAULT_EMBEDDER):
+    """Create an in-process embedder for the configured runtime.
+    
+    Args:
+        model_name: HuggingFace model identifier
+        
+    Returns:
+        OnnxEmbedder if CODEVEC_RUNTIME is "onnx", otherwise LocalEmbedder
+    """
+    if local_runtime() == "onnx":
+        from codevec.onnx_runtime import OnnxEmbedder
+        return OnnxEmbedder(model_name)
+    return LocalEmbedder(model_name)
+
+
+def create_local_reranker(model_name: str = DEFAULT_RERANKER):
+    """Create an in-process reranker for the configured runtime.
+    
+    Args:
+        model_name: HuggingFace cross-encoder model identifier
+        
+    Returns:
+        OnnxReranker if CODEVEC_RUNTIME is "onnx", otherwise LocalReranker
+    """
+    if local_runtime() == "onnx":
+        from codevec.onnx_runtime import OnnxReranker
+        return OnnxReranker(model_name)
+    return LocalReranker(model_name)
+
+
+def create_embedder(jobs: int = 1):
     """Create an embedder instance (remote if server running, else local).
     
     Automatically detects if an embedding server is available and uses it
     for better performance, otherwise falls back to local processing.
     
+    Args:
+        jobs: Local worker processes to spread embedding over when no
+            server is running (see codevec.pool)
+        
     Returns:
-        RemoteEmbedder if server is available, otherwise LocalEmbedder
+        RemoteEmbedder if server is available, a PoolEmbedder if jobs > 1,
+        otherwise a local embedder for the configured runtime
     """
     if is_server_running():
         return RemoteEmbedder()
+    elif jobs > 1:
+        from codevec.pool import PoolEmbedder
+        return PoolEmbedder(jobs)
     else:
-        return LocalEmbedder()
+        return create_local_embedder()
 
 
 def create_reranker():
@@ -170,9 +354,10 @@ def create_reranker():
     for better performance, otherwise falls back to local processing.
     
     Returns:
-        RemoteReranker if server is available, otherwise LocalReranker
+        RemoteReranker if server is available, otherwise a local reranker
+        for the configured runtime
     """
     if is_server_running():
         return RemoteReranker()
     else:
-        return LocalReranker()
\ No newline at end of file
+        return create_local_reranker()
\ No newline at end of file
@@ -0,0 +1,377 @@
+"""ONNX Runtime inference for the embedding model and reranker.
+
+Selected with CODEVEC_RUNTIME=onnx. The models are exported once to ONNX
+with dynamic int8 quantization (which needs torch and optimum, via
+sentence-transformers), into CODEVEC_ONNX_DIR (default
+~/.cache/codevec/onnx). After that, embedding and reranking only need
+onnxruntime and tokenizers: torch is never imported, which saves seconds
+of startup and most of the resident memory on CPU-only machines.
+
+Install the optional dependencies with: pip install "codevec[onnx]"
+"""
+
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from codevec.profiling import span
+
+ONNX_DIR_ENV = "CODEVEC_ONNX_DIR"
+DEFAULT_ONNX_DIR = Path.home() / ".cache" / "codevec" / "onnx"
+CONFIG_NAME = "codevec-onnx.json"
+EMBEDDER_MODEL = "all-MiniLM-L6-v2"
+RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+BATCH_SIZE = 32
+# Parity with torch required by vec-onnx check: every embedding's cosine
+# similarity and the mean Spearman correlation of rerank scores
+MIN_COSINE = 0.97
+MIN_SPEARMAN = 0.9
+
+
+def onnx_dir():
+    """Return the directory holding exported models."""
+    return Path(os.environ.get(ONNX_DIR_ENV, DEFAULT_ONNX_DIR)).expanduser()
+
+
+def _model_dir(model_name):
+    return onnx_dir() / model_name.replace("/", "--")
+
+
+def _quantization_target():
+    """Pick the dynamic quantization preset for this CPU."""
+    return "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx2"
+
+
+def export_model(kind, model_name, quantize=True):
+    """Export a model to ONNX, optionally with dynamic int8 quantization.
+
+    Args:
+        kind: "embedder" or "reranker"
+        model_name: HuggingFace model identifier
+        quantize: Also write an int8 dynamically quantized model and use it
+
+    Returns:
+        Directory of the exported model
+    """
+    from sentence_transformers import CrossEncoder, SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    output = _model_dir(model_name)
+    print(f"Exporting {model_name} to ONNX in {output}...")
+    if kind == "embedder":
+        model = SentenceTransformer(model_name, backend="onnx")
+        config = {
+            "max_length": model.max_seq_length,
+            "pooling": model[1].get_pooling_mode_str(),
+            "normalize": True,
+        }
+    else:
+        model = CrossEncoder(model_name, backend="onnx")
+        config = {
+            "max_length": model.max_length,
+            "sigmoid": type(model.activation_fn).__name__ == "Sigmoid",
+        }
+    model.save_pretrained(str(output))
+
+    model_file = next(output.rglob("model.onnx"))
+    if quantize:
+        export_dynamic_quantized_onnx_model(model, _quantization_target(), str(output))
+        model_file = next(output.rglob(f"model_qint8_{_quantization_target()}.onnx"))
+
+    tokenizer = model.tokenizer
+    config.update({
+        "kind": kind,
+        "model": model_name,
+        "file": str(model_file.relative_to(output)),
+        "quantized": quantize,
+        "pad_token": tokenizer.pad_token,
+        "pad_id": tokenizer.pad_token_id,
+    })
+    (output / CONFIG_NAME).write_text(json.dumps(config, indent=2))
+    return output
+
+
+def load_config(kind, model_name):
+    """Return the export config of a model, exporting it on first use."""
+    path = _model_dir(model_name) / CONFIG_NAME
+    if not path.exists():
+        try:
+            export_model(kind, model_name)
+        except ImportError as e:
+            raise RuntimeError(
+                f"{model_name} has not been exported to ONNX and exporting needs optimum: "
+                f'pip install "codevec[onnx]" (or run vec-onnx export where it is installed)'
+            ) from e
+    return json.loads(path.read_text())
+
+
+def runtime_model_name(model_name, config):
+    """Name recorded in manifests and caches for vectors of an exported model.
+
+    Vectors from ONNX Runtime match torch only within quantization error,
+    so they are kept apart: a runtime switch rebuilds on the next
+    vec-index instead of mixing vectors in one index.
+
+    Args:
+        model_name: HuggingFace model identifier
+        config: Export config from load_config()
+
+    Returns:
+        model_name tagged with the runtime, e.g. "all-MiniLM-L6-v2+onnx-int8"
+    """
+    return f"{model_name}+onnx-int8" if config.get("quantized") else f"{model_name}+onnx"
+
+
+class _OnnxModel:
+    """Tokenizer and inference session of an exported model."""
+
+    def __init__(self, kind, model_name, threads=None):
+        with span("import onnxruntime"):
+            try:
+                import onnxruntime
+                from tokenizers import Tokenizer
+            except ImportError as e:
+                raise ImportError(f'CODEVEC_RUNTIME=onnx needs onnxruntime and tokenizers: pip install "codevec[onnx]" ({e})') from e
+        config = load_config(kind, model_name)
+        path = _model_dir(model_name)
+        with span(f"load onnx {kind}"):
+            self.tokenizer = Tokenizer.from_file(str(path / "tokenizer.json"))
+            self.tokenizer.enable_truncation(config["max_length"])
+            self.tokenizer.enable_padding(pad_id=config["pad_id"], pad_token=config["pad_token"])
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if threads:
+                options.intra_op_num_threads = threads
+            self.session = onnxruntime.InferenceSession(
+                str(path / config["file"]), options, providers=["CPUExecutionProvider"]
+            )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.config = config
+        self.model_name = model_name
+
+    def run(self, inputs):
+        """Tokenize texts (or text pairs) and return the first output and attention mask."""
+        encodings = self.tokenizer.encode_batch(inputs)
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feed = {name: value for name, value in feed.items() if name in self.input_names}
+        return self.session.run(None, feed)[0], feed["attention_mask"]
+
+
+class OnnxEmbedder:
+    """Embedding model running on ONNX Runtime; drop-in for LocalEmbedder."""
+
+    def __init__(self, model_name: str = EMBEDDER_MODEL, threads: int = None):
+        """Load the exported model, exporting it first if needed.
+
+        Args:
+            model_name: HuggingFace model identifier
+            threads: Intra-op threads (default: ONNX Runtime picks one per core)
+        """
+        self.model = _OnnxModel("embedder", model_name, threads)
+        self.model_name = runtime_model_name(model_name, self.model.config)
+
+    def embed(self, texts: list[str], task_type: str = "document") -> list[list[float]]:
+        """Generate normalized embeddings for text snippets.
+
+        Args:
+            texts: List of text strings to embed
+            task_type: Type of embedding task (unused, for API compatibility)
+
+        Returns:
+            List of embedding vectors
+        """
+        batches = []
+        with span(f"onnx embed {len(texts)} texts"):
+            for start in range(0, len(texts), BATCH_SIZE):
+                tokens, mask = self.model.run(texts[start:start + BATCH_SIZE])
+                if self.model.config["pooling"] == "cls":
+                    pooled = tokens[:, 0]
+                else:
+                    weights = mask[:, :, None].astype(np.float32)
+                    pooled = (tokens * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+                batches.append(pooled)
+        if not batches:
+            return []
+        embeddings = np.concatenate(batches)
+        embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.tolist()
+
+
+class OnnxReranker:
+    """Cross-encoder running on ONNX Runtime; drop-in for LocalReranker."""
+
+    def __init__(self, model_name: str = RERANKER_MODEL):
+        """Load the exported model, exporting it first if needed.
+
+        Args:
+            model_name: HuggingFace cross-encoder model identifier
+        """
+        self.model = _OnnxModel("reranker", model_name)
+
+    def predict(self, pairs):
+        """Score (query, document) pairs.
+
+        Args:
+            pairs: List of (query, document) tuples
+
+        Returns:
+            NumPy array with one relevance score per pair
+        """
+        scores = []
+        for start in range(0, len(pairs), BATCH_SIZE):
+            logits, _ = self.model.run(pairs[start:start + BATCH_SIZE])
+            scores.append(logits[:, 0])
+        scores = np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+        if self.model.config["sigmoid"]:
+            scores = 1 / (1 + np.exp(-scores))
+        return scores
+
+    def rank(self, query: str, documents: list[str], return_documents: bool = False):
+        """Rank documents by relevance to query.
+
+        Args:
+            query: Search query string
+            documents: List of document strings to rank
+            return_documents: Whether to include document text in results
+
+        Returns:
+            List of ranking results with scores and corpus IDs, best first
+        """
+        from codevec.models import split_rankings
+        with span(f"onnx rerank {len(documents)} documents"):
+            ranking = split_rankings(self.predict([(query, doc) for doc in documents]), [documents])[0]
+        if return_documents:
+            for r in ranking:
+                r["text"] = documents[r["corpus_id"]]
+        return ranking
+
+    def rank_many(self, queries: list[str], documents: list[list[str]]):
+        """Rank candidate documents for several queries in shared batches.
+
+        Args:
+            queries: Search query strings
+            documents: Candidate documents for each query
+
+        Returns:
+            List with the rankings of each query
+        """
+        from codevec.models import split_rankings
+        pairs = [(query, doc) for query, docs in zip(queries, documents) for doc in docs]
+        with span(f"onnx rerank {len(pairs)} pairs"):
+            return split_rankings(self.predict(pairs), documents)
+
+
+def _measure(runtime, texts, queries, documents, output):
+    """Load one runtime in this process and record its outputs and costs."""
+    import resource
+    import time
+
+    os.environ["CODEVEC_RUNTIME"] = runtime
+    start = time.perf_counter()
+    from codevec.models import create_local_embedder, create_local_reranker
+    embedder = create_local_embedder()
+    reranker = create_local_reranker()
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings = np.asarray(embedder.embed(texts), dtype=np.float32)
+    embed_s = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embedder.embed([query], task_type="query")
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    rankings = reranker.rank_many(queries, [documents] * len(queries))
+    rerank_s = time.perf_counter() - start
+    scores = np.zeros((len(queries), len(documents)), dtype=np.float32)
+    for q, ranking in enumerate(rankings):
+        for r in ranking:
+            scores[q, r["corpus_id"]] = r["score"]
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies.sort()
+    np.savez(output, embeddings=embeddings, scores=scores)
+    return {
+        "load_s": load_s,
+        "embed_texts_per_s": len(texts) / embed_s,
+        "query_p50_ms": latencies[len(latencies) // 2],
+        "query_p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "rerank_pairs_per_s": len(queries) * len(documents) / rerank_s,
+        "peak_rss_mb": peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024,
+    }
+
+
+def compare_runtimes(texts, queries, documents):
+    """Compare the ONNX runtime with torch on the same inputs.
+
+    Each runtime runs in a fresh interpreter so import time and memory
+    are measured separately.
+
+    Args:
+        texts: Documents to embed
+        queries: Queries to embed and rerank with
+        documents: Candidate documents reranked for every query
+
+    Returns:
+        Dict with 'torch' and 'onnx' measurements and 'parity' figures:
+        cosine similarity of embeddings, top-1 agreement and Spearman
+        correlation of rerank scores
+
+    Raises:
+        ValueError: If the runtimes' embeddings have different dimensions
+    """
+    import subprocess
+    import tempfile
+
+    results = {}
+    outputs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = Path(tmp, "inputs.json")
+        inputs.write_text(json.dumps({"texts": texts, "queries": queries, "documents": documents}))
+        for runtime in ("torch", "onnx"):
+            output = Path(tmp, f"{runtime}.npz")
+            out = subprocess.run(
+                [sys.executable, "-m", "codevec.onnx_runtime", runtime, str(inputs), str(output)],
+                capture_output=True, text=True, check=True,
+            )
+            results[runtime] = json.loads(out.stdout.strip().splitlines()[-1])
+            with np.load(output) as data:
+                outputs[runtime] = {key: data[key] for key in data.files}
+
+    if outputs["torch"]["embeddings"].shape != outputs["onnx"]["embeddings"].shape:
+        raise ValueError(f"Runtimes produced embeddings of different shapes: "
+                         f"{outputs['torch']['embeddings'].shape} and {outputs['onnx']['embeddings'].shape}")
+    cosine = (outputs["torch"]["embeddings"] * outputs["onnx"]["embeddings"]).sum(axis=1)
+    torch_scores, onnx_scores = outputs["torch"]["scores"], outputs["onnx"]["scores"]
+    top1 = (torch_scores.argmax(axis=1) == onnx_scores.argmax(axis=1)).mean()
+
+    def ranks(scores):
+        return scores.argsort(axis=1).argsort(axis=1).astype(np.float64)
+
+    a, b = ranks(torch_scores), ranks(onnx_scores)
+    a -= a.mean(axis=1, keepdims=True)
+    b -= b.mean(axis=1, keepdims=True)
+    spearman = (a * b).sum(axis=1) / np.sqrt((a * a).sum(axis=1) * (b * b).sum(axis=1))
+    results["parity"] = {
+        "cosine_min": float(cosine.min()),
+        "cosine_mean": float(cosine.mean()),
+        "rerank_top1_agreement": float(top1),
+        "rerank_spearman_mean": float(np.nanmean(spearman)),
+    }
+    return results
+
+
+if __name__ == "__main__":
+    # Worker for compare_runtimes: python -m codevec.onnx_runtime <runtime> <inputs.json> <output.npz>
+    data = json.loads(Path(sys.argv[2]).read_text())
+    print(json.dumps(_measure(sys.argv[1], data["texts"], data["queries"], data["documents"], sys.argv[3])))
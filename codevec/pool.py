@@ -0,0 +1,125 @@
+"""Multi-process local embedding.
+
+A single torch (or ONNX Runtime) process doesn't scale linearly across
+many cores: small matrix products and tokenization leave most threads
+idle. PoolEmbedder instead runs N worker processes, each with its own
+copy of the model and an equal share of the cores as intra-op threads,
+and sends them fixed-size batches of texts. vec-index --jobs N uses it
+when no model server is running.
+
+Workers are started with the spawn method on first use, so the parent
+never loads the model and workers don't inherit torch's thread pools.
+"""
+
+import atexit
+import multiprocessing
+import os
+
+import numpy as np
+
+from codevec.models import DEFAULT_EMBEDDER, LocalEmbedder, create_local_embedder, local_model_name, local_runtime
+from codevec.profiling import span
+
+TASK_SIZE = 64
+THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+# Embedder of the current worker process
+_worker_embedder = None
+
+
+def default_threads(jobs):
+    """Intra-op threads per worker so that jobs workers share the cores evenly."""
+    return max(1, (os.cpu_count() or 1) // jobs)
+
+
+def _start_worker(model_name, threads):
+    """Pool initializer: pin the thread count, then load the model."""
+    global _worker_embedder
+    # Must be set before torch or onnxruntime is imported in this process
+    for name in THREAD_ENV:
+        os.environ[name] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    if local_runtime() == "onnx":
+        from codevec.onnx_runtime import OnnxEmbedder
+        _worker_embedder = OnnxEmbedder(model_name, threads=threads)
+    else:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+        _worker_embedder = LocalEmbedder(model_name)
+
+
+def _embed_task(texts):
+    """Embed one batch in a worker; float32 arrays pickle far smaller than lists."""
+    return np.asarray(_worker_embedder.embed(texts), dtype=np.float32)
+
+
+class PoolEmbedder:
+    """Embedder that spreads batches over several local worker processes.
+
+    Drop-in for LocalEmbedder. Inputs too small to be worth starting the
+    workers for are embedded in-process instead.
+    """
+
+    def __init__(self, jobs: int, model_name: str = DEFAULT_EMBEDDER, threads: int = None):
+        """Configure the pool; workers start on the first large embed call.
+
+        Args:
+            jobs: Number of worker processes
+            model_name: HuggingFace model identifier
+            threads: Intra-op threads per worker (default: cores / jobs)
+        """
+        if jobs < 1:
+            raise ValueError(f"jobs must be at least 1, got {jobs}")
+        self.jobs = jobs
+        self.threads = threads or default_threads(jobs)
+        self.model = model_name
+        self.model_name = local_model_name(model_name)
+        self._pool = None
+        self._local = None
+
+    def _start(self):
+        with span(f"start {self.jobs} embedding workers"):
+            context = multiprocessing.get_context("spawn")
+            self._pool = context.Pool(self.jobs, initializer=_start_worker,
+                                      initargs=(self.model, self.threads))
+        atexit.register(self.close)
+
+    def embed(self, texts: list[str], task_type: str = "document") -> list[list[float]]:
+        """Generate embeddings for text snippets across the worker pool.
+
+        Texts are sent longest first, so batches pad little and the
+        slowest batches don't end up last; results come back in input order.
+
+        Args:
+            texts: List of text strings to embed
+            task_type: Type of embedding task (unused, for API compatibility)
+
+        Returns:
+            List of embedding vectors (normalized)
+        """
+        if self._pool is None and len(texts) <= TASK_SIZE:
+            if self._local is None:
+                self._local = create_local_embedder(self.model)
+            return self._local.embed(texts)
+        if self._pool is None:
+            self._start()
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        tasks = [[texts[i] for i in order[start:start + TASK_SIZE]] for start in range(0, len(order), TASK_SIZE)]
+        embeddings = [None] * len(texts)
+        position = 0
+        with span(f"embed {len(texts)} texts on {self.jobs} workers"):
+            # imap yields batches in submission order as soon as each one is done
+            for batch in self._pool.imap(_embed_task, tasks):
+                for vector in batch.tolist():
+                    embeddings[order[position]] = vector
+                    position += 1
+        return embeddings
+
+    def close(self):
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
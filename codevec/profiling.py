@@ -0,0 +1,103 @@
+"""Lightweight span instrumentation for profiling CLI runs.
+
+Code marks stages with the span() context manager. Spans are only
+recorded after enable() is called (by --profile), so instrumented code
+pays a single flag check otherwise. Recorded spans can be printed as a
+stage breakdown or written as a Chrome trace (viewable in Perfetto or
+chrome://tracing).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_enabled = False
+_spans = []
+_local = threading.local()
+_origin = time.perf_counter()
+
+
+def enable():
+    """Start recording spans."""
+    global _enabled, _origin
+    _enabled = True
+    _origin = time.perf_counter()
+    _spans.clear()
+
+
+def is_enabled():
+    """Return True if spans are being recorded."""
+    return _enabled
+
+
+@contextmanager
+def span(name):
+    """Record the duration of the enclosed block as a named stage.
+
+    Args:
+        name: Stage name shown in the report
+    """
+    if not _enabled:
+        yield
+        return
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        _local.depth = depth
+        _spans.append({
+            "name": name,
+            "start": start - _origin,
+            "duration": end - start,
+            "depth": depth,
+            "thread": threading.get_ident(),
+        })
+
+
+def stage_totals():
+    """Return the total recorded seconds of each span name.
+
+    Returns:
+        Dict mapping span names to the sum of their durations
+    """
+    totals = {}
+    for s in _spans:
+        totals[s["name"]] = totals.get(s["name"], 0.0) + s["duration"]
+    return totals
+
+
+def print_report():
+    """Print recorded spans as an indented stage breakdown."""
+    if not _spans:
+        return
+    total = max(s["start"] + s["duration"] for s in _spans)
+    print("\nProfile (wall time by stage)")
+    print("-" * 80)
+    for s in sorted(_spans, key=lambda s: (s["start"], s["depth"])):
+        label = "  " * s["depth"] + s["name"]
+        print(f"{label:<56}{s['duration'] * 1000:>10.1f} ms{s['duration'] / total:>9.1%}")
+    print("-" * 80)
+    print(f"{'total':<56}{total * 1000:>10.1f} ms")
+
+
+def write_trace(path):
+    """Write recorded spans in Chrome trace event format.
+
+    Args:
+        path: Output JSON file
+    """
+    events = [{
+        "name": s["name"],
+        "ph": "X",
+        "ts": s["start"] * 1e6,
+        "dur": s["duration"] * 1e6,
+        "pid": os.getpid(),
+        "tid": s["thread"],
+    } for s in _spans]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
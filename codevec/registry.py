@@ -0,0 +1,245 @@
+"""Model registry for the model server.
+
+The server loads models when the first request needs them instead of at
+startup, so several embedding models can be served side by side and a
+server that sees no traffic holds no model in memory. A background
+thread unloads models that haven't been used for a while, and models
+are unloaded least recently used first while the process is over its
+memory budget. Models in use by a request are never unloaded.
+
+Configured with environment variables read when the server starts:
+
+- CODEVEC_IDLE_TIMEOUT: seconds before an unused model is unloaded
+  (default 600, 0 keeps models loaded)
+- CODEVEC_MEMORY_BUDGET_MB: resident memory above which idle models are
+  unloaded (default: no budget)
+- CODEVEC_MODELS: comma-separated model names requests may ask for, in
+  addition to the defaults (default: any model)
+"""
+
+import ctypes
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from codevec.metrics import resident_memory_bytes
+
+IDLE_TIMEOUT_ENV = "CODEVEC_IDLE_TIMEOUT"
+MEMORY_BUDGET_ENV = "CODEVEC_MEMORY_BUDGET_MB"
+MODELS_ENV = "CODEVEC_MODELS"
+DEFAULT_IDLE_TIMEOUT = 600.0
+REAP_INTERVAL = 10.0
+
+
+def release_memory():
+    """Collect garbage and hand freed heap pages back to the OS.
+
+    Without malloc_trim, glibc keeps the memory of an unloaded model
+    mapped and RSS doesn't go down.
+    """
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class _Entry:
+    """A registry slot: the model once loaded, plus usage bookkeeping."""
+
+    def __init__(self):
+        self.model = None
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.load_seconds = None
+        self.rss_delta = None
+
+
+class ModelRegistry:
+    """Loads models on demand and unloads idle ones.
+
+    Args:
+        loaders: Dict of model kind (e.g. "embedder") -> function that
+            loads a model of that kind by name
+        defaults: Dict of model kind -> model used when a request names none
+        idle_timeout: Seconds before an unused model is unloaded (0: never)
+        memory_budget: Resident memory in bytes above which idle models are
+            unloaded, or None
+        allowed: Model names requests may ask for besides the defaults,
+            or None to allow any
+        on_event: Optional callback(model_name, event) for "load",
+            "idle_evict" and "memory_evict" events
+    """
+
+    def __init__(self, loaders, defaults, idle_timeout=DEFAULT_IDLE_TIMEOUT, memory_budget=None,
+                 allowed=None, on_event=None):
+        self.loaders = loaders
+        self.defaults = defaults
+        self.idle_timeout = idle_timeout
+        self.memory_budget = memory_budget
+        self.allowed = None if allowed is None else set(allowed) | set(defaults.values())
+        self.on_event = on_event or (lambda name, event: None)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    @classmethod
+    def from_environment(cls, loaders, defaults, on_event=None):
+        """Create a registry configured by the CODEVEC_* variables above."""
+        budget = os.environ.get(MEMORY_BUDGET_ENV)
+        allowed = os.environ.get(MODELS_ENV)
+        return cls(
+            loaders, defaults,
+            idle_timeout=float(os.environ.get(IDLE_TIMEOUT_ENV, DEFAULT_IDLE_TIMEOUT)),
+            memory_budget=float(budget) * 1024 * 1024 if budget else None,
+            allowed=[name.strip() for name in allowed.split(",") if name.strip()] if allowed else None,
+            on_event=on_event,
+        )
+
+    def acquire(self, kind, name=None):
+        """Take a model for a request, loading it if needed.
+
+        Every acquire must be paired with a release of the same model; a
+        model is never unloaded between the two.
+
+        Args:
+            kind: Model kind, a key of loaders
+            name: Model name, or None for the kind's default
+
+        Returns:
+            The loaded model
+
+        Raises:
+            ValueError: If the model isn't one requests may ask for
+        """
+        key = (kind, self._resolve(kind, name))
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            entry.in_use += 1
+        try:
+            # Per-model lock: concurrent first requests load once, other models keep serving
+            with entry.lock:
+                if entry.model is None:
+                    self._load(entry, *key)
+        except BaseException:
+            with self._lock:
+                entry.in_use -= 1
+                if entry.model is None and entry.in_use == 0:
+                    self._entries.pop(key, None)
+            raise
+        self.enforce_budget()
+        return entry.model
+
+    def release(self, kind, name=None):
+        """Return a model taken with acquire."""
+        with self._lock:
+            entry = self._entries[(kind, self._resolve(kind, name))]
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+
+    @contextmanager
+    def use(self, kind, name=None):
+        """Hold a model for the duration of a block (see acquire)."""
+        model = self.acquire(kind, name)
+        try:
+            yield model
+        finally:
+            self.release(kind, name)
+
+    def _resolve(self, kind, name):
+        name = name or self.defaults[kind]
+        if self.allowed is not None and name not in self.allowed:
+            raise ValueError(f"Model '{name}' is not served here (allowed: {', '.join(sorted(self.allowed))})")
+        return name
+
+    def _load(self, entry, kind, name):
+        before = resident_memory_bytes()
+        start = time.perf_counter()
+        entry.model = self.loaders[kind](name)
+        entry.load_seconds = time.perf_counter() - start
+        entry.rss_delta = resident_memory_bytes() - before
+        self.on_event(name, "load")
+
+    def _evict(self, select, event):
+        """Unload the idle models select() picks from (key, entry) pairs, oldest first."""
+        with self._lock:
+            idle = sorted(
+                ((key, entry) for key, entry in self._entries.items() if entry.in_use == 0 and entry.model is not None),
+                key=lambda item: item[1].last_used,
+            )
+            evicted = [key for key, entry in select(idle)]
+            for key in evicted:
+                self._entries.pop(key).model = None
+        if evicted:
+            release_memory()
+            for kind, name in evicted:
+                self.on_event(name, event)
+        return evicted
+
+    def evict_idle(self):
+        """Unload models unused for longer than the idle timeout.
+
+        Returns:
+            List of (kind, name) keys unloaded
+        """
+        if not self.idle_timeout:
+            return []
+        cutoff = time.monotonic() - self.idle_timeout
+        return self._evict(lambda idle: [item for item in idle if item[1].last_used < cutoff], "idle_evict")
+
+    def enforce_budget(self):
+        """Unload least recently used idle models while over the memory budget.
+
+        Returns:
+            List of (kind, name) keys unloaded
+        """
+        evicted = []
+        while self.memory_budget and resident_memory_bytes() > self.memory_budget:
+            unloaded = self._evict(lambda idle: idle[:1], "memory_evict")
+            if not unloaded:
+                break
+            evicted.extend(unloaded)
+        return evicted
+
+    def start(self, interval=None):
+        """Start the background thread that applies the idle timeout and budget.
+
+        Args:
+            interval: Seconds between checks (default: REAP_INTERVAL, or half
+                the idle timeout if that is shorter)
+        """
+        if interval is None:
+            interval = min(REAP_INTERVAL, self.idle_timeout / 2) if self.idle_timeout else REAP_INTERVAL
+        def reap():
+            while True:
+                time.sleep(interval)
+                self.evict_idle()
+                self.enforce_budget()
+
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=reap, name="codevec-model-reaper", daemon=True)
+            self._reaper.start()
+
+    def status(self):
+        """Describe the loaded models.
+
+        Returns:
+            List of dicts with kind, name, requests in progress, seconds
+            since last use, load time and resident memory added by loading
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "kind": kind,
+                    "name": name,
+                    "in_use": entry.in_use,
+                    "idle_s": 0.0 if entry.in_use else now - entry.last_used,
+                    "load_s": entry.load_seconds,
+                    "rss_delta_mb": entry.rss_delta / (1024 * 1024) if entry.rss_delta is not None else None,
+                }
+                for (kind, name), entry in self._entries.items() if entry.model is not None
+            ]
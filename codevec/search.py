@@ -4,6 +4,7 @@ Handles searching indexed codebases using natural language queries,
 including embedding generation, vector search, and result reranking.
 """
 
+import shutil
 import sys
 import logging
 
@@ -12,24 +13,49 @@ logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 logging.getLogger('sentence_transformers').setLevel(logging.WARNING)
 
-import chromadb
-from codevec.models import create_embedder, create_reranker
+from codevec.backends import open_backend
+from codevec.generations import acquire_reader
+from codevec.hierarchy import candidate_files
+from codevec.lexical import batch_candidates, exact_matches, fuse_candidates, open_lexical
+from codevec.models import RemoteEmbedder, base_model, create_embedder, create_reranker
+from codevec.profiling import span
+from codevec.sources import load_sources
 
 # Load embedding model and reranker
 embedder = create_embedder()
 reranker = create_reranker()
 
 
-def generate_query_embedding(query):
+def embedder_for(model):
+    """Return an embedder for the model an index was built with.
+    
+    The model server loads any model on request, so through the server an
+    index built with a non-default model is queried with that model.
+    Runtimes of one model are interchangeable for queries (see
+    codevec.models.base_model).
+    
+    Args:
+        model: Model name from the index manifest (None for unknown)
+        
+    Returns:
+        Embedder producing vectors comparable with the index
+    """
+    if model is None or not isinstance(embedder, RemoteEmbedder) or base_model(model) == embedder.model:
+        return embedder
+    return RemoteEmbedder(embedder.url, model_name=base_model(model))
+
+
+def generate_query_embedding(query, model=None):
     """Convert query text to embedding vector.
     
     Args:
         query: Natural language search query
+        model: Model the index was built with (default: the local model)
         
     Returns:
         Embedding vector for the query
     """
-    return embedder.embed([query], task_type="query")[0]
+    return embedder_for(model).embed([query], task_type="query")[0]
 
 
 def rerank(query, documents, metadatas, distances, n_results):
@@ -60,7 +86,7 @@ def rerank(query, documents, metadatas, distances, n_results):
 
 
 def get_db_path(root_path):
-    """Get the ChromaDB storage path for a given repository.
+    """Get the index storage path for a given repository.
     
     Args:
         root_path: Root path of the indexed repository
@@ -101,13 +127,31 @@ def find_repo_root(start_path=None):
     return None
 
 
-def search_code(query, root_path=None, n_results=5):
+def search_code(query, root_path=None, n_results=5, modules=None, stream=None):
     """Search the indexed codebase for relevant code snippets.
     
+    Large indexes are searched in two stages: the nearest modules and
+    classes first, then only the functions in their files (see
+    codevec.hierarchy).
+    
+    Candidates from the vector index are fused with identifier matches
+    from the lexical index, and a query that is exactly the name of a few
+    functions returns them right away (see codevec.lexical).
+    
+    With stream set, the vector matches are shown as soon as the index
+    query returns and replaced by the reranked results once the
+    cross-encoder finishes, so the reranker no longer delays the first
+    results.
+    
     Args:
         query: Search query string
         root_path: Path to indexed repo. If None, auto-detects by walking up from CWD.
         n_results: Number of results to return
+        modules: Modules and classes selected in the first stage
+            (default: automatic by index size, 0 to search all functions)
+        stream: None to print the reranked results only, "terminal" to
+            list the vector matches first and redraw them (on a terminal),
+            or "jsonl" to write a JSON Lines event for each stage
     """
     # Auto-detect repo if not provided
     if root_path is None:
@@ -119,54 +163,375 @@ def search_code(query, root_path=None, n_results=5):
             print("\nTo index a project: vec-index /path/to/project")
             sys.exit(1)
 
-    # Connect to ChromaDB in the repository's .codevec directory
+    # Open the index in the repository's .codevec directory
     db_path = get_db_path(root_path)
-    client = chromadb.PersistentClient(path=db_path, settings=chromadb.Settings(anonymized_telemetry=False))
+    # Hold the current generation so a concurrent rebuild can't remove it
+    with acquire_reader(db_path) as lease:
+        try:
+            with span("open index"):
+                store = open_backend(lease.path)
+        except Exception as e:
+            print(f"Error: Could not load index at {db_path}")
+            print("Have you indexed this repository? Run: vec-index /path/to/project")
+            sys.exit(1)
+    
+        by_reference = store.manifest.get("source") == "reference"
+        lexical = open_lexical(lease.path)
+        exact = exact_matches(store, lexical, query, n_results)
+        if exact is not None:
+            # An exact symbol hit needs no embedding, vector query or reranking
+            documents = load_sources(exact['metadatas'], lease.path) if by_reference else exact['documents']
+            results = [{
+                'document': document,
+                'metadata': metadata,
+                'distance': None,
+                'rerank_score': None
+            } for document, metadata in zip(documents, exact['metadatas'])]
+            if stream == "jsonl":
+                write_event("candidates", query, results)
+                write_event("reranked", query, results)
+            else:
+                print_results(results)
+            return
 
-    try:
-        collection = client.get_collection("code_index")
-    except Exception as e:
-        print(f"Error: Could not load index at {db_path}")
-        print("Have you indexed this repository? Run: vec-index /path/to/project")
-        sys.exit(1)
+        with span("query embedding"):
+            query_embedding = generate_query_embedding(query, store.manifest.get("model"))
+    
+        # Fetch extra results for reranking (reranker will filter to top n)
+        fetch_count = n_results * 2
+        files = candidate_files(lease.path, query_embedding, store.count(), modules)
+        raw_results = store.query(
+            query_embeddings=[query_embedding],
+            n_results=fetch_count,
+            files=files
+        )
+        documents, metadatas, distances = fuse_candidates(store, lexical, query, query_embedding, raw_results, fetch_count)
+    
+        if not metadatas:
+            if stream == "jsonl":
+                write_event("candidates", query, [])
+                write_event("reranked", query, [])
+            else:
+                print("No results found")
+            return
+
+        if by_reference:
+            # Read candidate source from the working tree
+            with span("load candidate sources"):
+                documents = load_sources(metadatas, lease.path)
+
+        shown = 0
+        if stream is not None:
+            candidates = [{
+                'document': document,
+                'metadata': metadata,
+                'distance': distance,
+                'rerank_score': None
+            } for document, metadata, distance in zip(documents, metadatas, distances)]
+            if stream == "jsonl":
+                write_event("candidates", query, candidates[:n_results])
+            elif sys.stdout.isatty():
+                shown = print_candidates(candidates[:n_results])
+
+        # Rerank results for better relevance
+        results = rerank(
+            query,
+            documents,
+            metadatas,
+            distances,
+            n_results
+        )
+
+        with span("render results"):
+            if stream == "jsonl":
+                write_event("reranked", query, results)
+                return
+            if shown:
+                # Move up to the first candidate line and clear to the end of the screen
+                sys.stdout.write(f"\x1b[{shown}F\x1b[J")
+            print_results(results)
+
+
+def query_repo(root_path, query, embed, fetch_count):
+    """Fetch search candidates from one repository's index.
     
-    query_embedding = generate_query_embedding(query)
+    Candidates are found as search_code() finds them: vector matches,
+    restricted to the nearest modules on large indexes, fused with
+    identifier matches from the repository's lexical index.
     
-    # Fetch extra results for reranking (reranker will filter to top n)
+    Args:
+        root_path: Path to the indexed repository
+        query: Search query string
+        embed: Function taking the index's model name (None for unknown)
+            and returning the query vector for that model
+        fetch_count: Number of candidates to return
+        
+    Returns:
+        List of (document, metadata, distance) tuples, best fused rank first
+        
+    Raises:
+        FileNotFoundError: If the repository has no index
+        ValueError: If the index was built with a model that can't be
+            used here (without a model server, only the local one)
+    """
+    from pathlib import Path
+    db_path = get_db_path(root_path)
+    if not Path(db_path).is_dir():
+        raise FileNotFoundError(f"No index found at {db_path}")
+    with acquire_reader(db_path) as lease:
+        try:
+            store = open_backend(lease.path)
+        except Exception as e:
+            raise FileNotFoundError(f"Could not load index at {db_path}") from e
+        model = store.manifest.get("model")
+        if model is not None and not isinstance(embedder, RemoteEmbedder) \
+                and base_model(model) != base_model(embedder.model_name):
+            raise ValueError(f"Index at {db_path} was built with {model}, not {embedder.model_name}")
+
+        query_embedding = embed(model)
+        lexical = open_lexical(lease.path)
+        files = candidate_files(lease.path, query_embedding, store.count())
+        raw_results = store.query(query_embeddings=[query_embedding], n_results=fetch_count, files=files)
+        documents, metadatas, distances = fuse_candidates(store, lexical, query, query_embedding, raw_results,
+                                                          fetch_count)
+        if store.manifest.get("source") == "reference":
+            documents = load_sources(metadatas, lease.path)
+    return list(zip(documents, metadatas, distances))
+
+
+def search_repos(query, root_paths, n_results=5):
+    """Search several indexed repositories as one.
+    
+    Every index is queried concurrently. The query is embedded once per
+    embedding model the indexes were built with, so through the model
+    server each repository is searched with its own model. The
+    candidates of all repositories are merged by their rank within their
+    repository (distances from different models aren't comparable) and
+    reranked together, so latency tracks the slowest index rather than
+    the sum.
+    
+    Args:
+        query: Search query string
+        root_paths: Paths to indexed repositories
+        n_results: Number of results to return
+        
+    Returns:
+        Tuple of (results as returned by rerank, dict of root path -> error
+        message for repositories that could not be searched)
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    embeddings = {}
+    embed_lock = threading.Lock()
+
+    def embed(model):
+        # Runtimes of one model share a query vector (see codevec.models.base_model)
+        key = None if model is None else base_model(model)
+        with embed_lock:
+            if key not in embeddings:
+                with span("query embedding"):
+                    embeddings[key] = generate_query_embedding(query, model)
+            return embeddings[key]
+
     fetch_count = n_results * 2
-    raw_results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=fetch_count
-    )
-    
-    if not raw_results['documents'][0]:
-        print("No results found")
-        return
-
-    # Rerank results for better relevance
-    results = rerank(
-        query,
-        raw_results['documents'][0],
-        raw_results['metadatas'][0],
-        raw_results['distances'][0],
-        n_results
-    )
-
-    # Display results
+    candidates = []
+    errors = {}
+    with span(f"query {len(root_paths)} indexes"):
+        with ThreadPoolExecutor(max_workers=min(32, len(root_paths))) as pool:
+            futures = {root: pool.submit(query_repo, root, query, embed, fetch_count) for root in root_paths}
+            for root, future in futures.items():
+                try:
+                    results = future.result()
+                except (FileNotFoundError, ValueError) as e:
+                    errors[root] = str(e)
+                    continue
+                candidates.extend((rank, *candidate) for rank, candidate in enumerate(results))
+
+    if not candidates:
+        return [], errors
+
+    # Keep the best-ranked candidates of every repository and rerank them once
+    candidates.sort(key=lambda c: (c[0], c[3]))
+    documents, metadatas, distances = (list(column) for column in zip(*(c[1:] for c in candidates[:fetch_count])))
+    return rerank(query, documents, metadatas, distances, n_results), errors
+
+
+def search_many(queries, root_path, n_results=5, batch_size=256):
+    """Search the index for many queries at once.
+    
+    Each query gets the results search_code() would give it. Queries are
+    processed in batches: exact name matches are answered from the
+    lexical index, the rest of each batch is embedded in one call, looked
+    up with one multi-vector query (see codevec.lexical.batch_candidates)
+    and reranked with all (query, candidate) pairs scored together.
+    
+    Args:
+        queries: Search query strings
+        root_path: Path to the indexed repository
+        n_results: Number of results per query
+        batch_size: Queries per batch
+        
+    Returns:
+        List with the results of each query (as returned by rerank)
+        
+    Raises:
+        FileNotFoundError: If the repository has no index
+    """
+    db_path = get_db_path(root_path)
+    with acquire_reader(db_path) as lease:
+        try:
+            with span("open index"):
+                store = open_backend(lease.path)
+        except Exception as e:
+            raise FileNotFoundError(f"Could not load index at {db_path}") from e
+
+        by_reference = store.manifest.get("source") == "reference"
+        lexical = open_lexical(lease.path)
+        query_embedder = embedder_for(store.manifest.get("model"))
+        all_results = []
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            results = [None] * len(batch)
+            for i, query in enumerate(batch):
+                exact = exact_matches(store, lexical, query, n_results)
+                if exact is not None:
+                    documents = load_sources(exact['metadatas'], lease.path) if by_reference else exact['documents']
+                    results[i] = [{
+                        'document': document,
+                        'metadata': metadata,
+                        'distance': None,
+                        'rerank_score': None
+                    } for document, metadata in zip(documents, exact['metadatas'])]
+
+            pending = [i for i, result in enumerate(results) if result is None]
+            if pending:
+                pending_queries = [batch[i] for i in pending]
+                with span(f"query embedding x{len(pending)}"):
+                    query_embeddings = query_embedder.embed(pending_queries, task_type="query")
+                candidates = batch_candidates(store, lexical, lease.path, pending_queries, query_embeddings,
+                                              n_results * 2)
+                documents = [docs for docs, _, _ in candidates]
+                if by_reference:
+                    # One pass over all candidates so each file is mapped once
+                    with span("load candidate sources"):
+                        flat = load_sources([m for _, metas, _ in candidates for m in metas], lease.path)
+                    documents = []
+                    for _, metas, _ in candidates:
+                        documents.append(flat[:len(metas)])
+                        flat = flat[len(metas):]
+
+                found = [j for j, (_, metas, _) in enumerate(candidates) if metas]
+                rankings = reranker.rank_many([pending_queries[j] for j in found],
+                                              [documents[j] for j in found]) if found else []
+                for j in range(len(pending)):
+                    results[pending[j]] = []
+                for j, ranks in zip(found, rankings):
+                    _, metadatas, distances = candidates[j]
+                    results[pending[j]] = [{
+                        'document': documents[j][r['corpus_id']],
+                        'metadata': metadatas[r['corpus_id']],
+                        'distance': distances[r['corpus_id']],
+                        'rerank_score': r['score']
+                    } for r in ranks[:n_results]]
+            all_results.extend(results)
+    return all_results
+
+
+def write_jsonl(queries, results, out):
+    """Write batch search results as JSON Lines, one line per query.
+    
+    Args:
+        queries: Search query strings
+        results: Results for each query from search_many()
+        out: Writable text stream
+    """
+    import json
+    for query, query_results in zip(queries, results):
+        out.write(json.dumps({
+            "query": query,
+            "results": [result_record(r) for r in query_results]
+        }) + "\n")
+
+
+def result_record(result):
+    """JSON-serializable view of one result dict."""
+    return {
+        "file_path": result['metadata']['file_path'],
+        "name": result['metadata']['name'],
+        "line": result['metadata']['line'],
+        "similarity": None if result['distance'] is None else 1 - result['distance'],
+        "rerank_score": result['rerank_score'],
+        "code": result['document'],
+    }
+
+
+def write_event(event, query, results):
+    """Write one streaming search event as a JSON line to stdout.
+    
+    A streamed search writes a "candidates" event with the vector matches
+    (rerank_score null), then a "reranked" event with the final results.
+    Exact name matches are written as both events, with null similarity.
+    
+    Args:
+        event: "candidates" or "reranked"
+        query: Search query string
+        results: Result dicts for the event
+    """
+    import json
+    print(json.dumps({
+        "event": event,
+        "query": query,
+        "results": [result_record(r) for r in results]
+    }), flush=True)
+
+
+def print_candidates(results):
+    """Print candidates one line each while the reranker runs.
+    
+    Lines are cut to the terminal width, so each takes exactly one row
+    and the caller can move back over them to redraw.
+    
+    Args:
+        results: Result dicts without rerank scores
+        
+    Returns:
+        Number of lines printed
+    """
+    # One column short: some terminals wrap a line that fills the last column
+    width = shutil.get_terminal_size().columns - 1
+    print("Candidates (reranking...)"[:width])
+    for i, result in enumerate(results, start=1):
+        metadata = result['metadata']
+        line = (f"  {i:2d}. {1 - result['distance']:6.1%}  {metadata['name']}  "
+                f"{metadata['file_path']}:{metadata['line']}")
+        print(line if len(line) <= width else line[:width - 3] + "...")
+    sys.stdout.flush()
+    return len(results) + 1
+
+
+def print_results(results):
+    """Print ranked results as framed code previews.
+    
+    Args:
+        results: List of result dicts from rerank()
+    """
     print(f"Found {len(results)} results")
     print("\n" + "=" * 80)
 
     for i, result in enumerate(results, start=1):
         doc = result['document']
         metadata = result['metadata']
-        similarity = 1 - result['distance']
+        similarity = None if result['distance'] is None else 1 - result['distance']
         rerank_score = result['rerank_score']
 
         # Header
         print(f"\n┌─ Result #{i} " + "─" * (68 - len(f"Result #{i}")))
 
         # Scores
-        if rerank_score is not None:
+        if similarity is None:
+            print("│ Exact name match")
+        elif rerank_score is not None:
             print(f"│ Similarity: {similarity:.1%}  │  Rerank: {rerank_score:.3f}")
         else:
             print(f"│ Similarity: {similarity:.1%}")
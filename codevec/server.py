@@ -1,37 +1,230 @@
 """FastAPI server for keeping embedding and reranking models in memory.
 
 Provides REST endpoints for generating embeddings and reranking documents,
-improving performance by avoiding model reload on each operation.
+improving performance by avoiding model reload on each operation. Models
+are loaded on first use and unloaded when idle (see codevec.registry);
+requests may name the model to use. Repositories can also be indexed in
+the background with the server's models (see codevec.jobs).
+
+Model calls, including those of indexing jobs, run on a dedicated
+inference executor rather than on the event loop or FastAPI's shared
+threadpool, so /health always answers promptly. Configured with environment variables:
+
+- CODEVEC_INFERENCE_WORKERS: model calls run at the same time (default 2);
+  more only make concurrent forward passes compete for the CPU cores
+- CODEVEC_MAX_PENDING: requests running or waiting for a worker before
+  new ones are rejected with 503 (default 64)
+- CODEVEC_REQUEST_TIMEOUT: seconds before a request fails with 504
+  (default 120); a request still waiting for a worker is dropped, one
+  already running finishes in the background
 """
 
-from typing import List
-from fastapi import FastAPI
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer, CrossEncoder
+
+from codevec.metrics import (
+    BATCH_BUCKETS, LATENCY_BUCKETS, Counter, Gauge, Histogram, Registry, resident_memory_bytes
+)
+from codevec.models import (
+    DEFAULT_EMBEDDER, DEFAULT_RERANKER, create_local_embedder, create_local_reranker, local_runtime
+)
+from codevec.index import index_codebase, set_embedder
+from codevec.jobs import JobQueue
+from codevec.registry import ModelRegistry
 
 app = FastAPI()
 
-print("Initializing embedding model and reranker...")
+registry = Registry()
+requests_total = registry.register(Counter(
+    "codevec_requests_total", "Requests handled, by endpoint and outcome.", ("endpoint", "status")))
+request_seconds = registry.register(Histogram(
+    "codevec_request_duration_seconds", "Request handling time in seconds.", LATENCY_BUCKETS, ("endpoint",)))
+batch_size = registry.register(Histogram(
+    "codevec_batch_size", "Texts per /embed request or documents (pairs for /rerank_batch) per /rerank request.", BATCH_BUCKETS, ("endpoint",)))
+inflight = registry.register(Gauge(
+    "codevec_inflight_requests", "Requests currently being handled or queued.", ("endpoint",)))
+queued = registry.register(Gauge(
+    "codevec_queued_requests", "Model calls waiting for an inference worker, by model kind.", ("kind",)))
+forward_seconds = registry.register(Histogram(
+    "codevec_model_forward_seconds", "Model forward pass time in seconds, by model kind.", LATENCY_BUCKETS, ("kind",)))
+model_events = registry.register(Counter(
+    "codevec_model_events_total", "Model loads and evictions, by model and event.", ("name", "event")))
+models_loaded = registry.register(Gauge(
+    "codevec_models_loaded", "Models currently loaded, by kind.", ("kind",)))
+
+models = ModelRegistry.from_environment(
+    {"embedder": create_local_embedder, "reranker": create_local_reranker},
+    {"embedder": DEFAULT_EMBEDDER, "reranker": DEFAULT_RERANKER},
+    on_event=model_events.inc,
+)
+models.start()
+print(f"Models load on first use ({local_runtime()} runtime)")
+
+
+class RegistryEmbedder:
+    """Embedder for indexing jobs that borrows the registry's default model per call.
+
+    Calls are run on the inference executor, so indexing jobs share its
+    workers with requests instead of running extra forward passes
+    alongside them.
+    """
+
+    @property
+    def model_name(self):
+        """Name recorded for the default model's vectors (see codevec.models.local_model_name)."""
+        return submit_model_call("embedder", None, lambda embedder: embedder.model_name).result()
+
+    def embed(self, texts, task_type="document"):
+        future = submit_model_call("embedder", None, lambda embedder: embedder.embed(texts, task_type=task_type))
+        return future.result()
+
+
+set_embedder(RegistryEmbedder())
+jobs = JobQueue(index_codebase, workers=int(os.environ.get("CODEVEC_INDEX_WORKERS", 1)))
+
+INFERENCE_WORKERS = int(os.environ.get("CODEVEC_INFERENCE_WORKERS", 2))
+MAX_PENDING = int(os.environ.get("CODEVEC_MAX_PENDING", 64))
+REQUEST_TIMEOUT = float(os.environ.get("CODEVEC_REQUEST_TIMEOUT", 120))
+inference = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="codevec-inference")
+pending = asyncio.Semaphore(MAX_PENDING)
+
+
+@contextmanager
+def use_model(kind, name):
+    """Hold a model from the registry, turning unknown models into HTTP 400.
+    
+    Args:
+        kind: "embedder" or "reranker"
+        name: Model requested, or None for the default
+    """
+    try:
+        model = models.acquire(kind, name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not load {kind} '{name}': {e}") from e
+    try:
+        yield model
+    finally:
+        models.release(kind, name)
+
+
+def submit_model_call(kind, name, call):
+    """Queue call(model) on the inference executor, counting it as queued until a worker starts it.
+
+    Returns:
+        concurrent.futures.Future of the call's result
+    """
+    queued.inc(kind)
+    return inference.submit(_call_model, kind, name, call)
+
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
-reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+def _call_model(kind, name, call):
+    """Run call(model) with a model from the registry; runs on the inference executor."""
+    queued.dec(kind)
+    with use_model(kind, name) as model:
+        start = time.perf_counter()
+        result = call(model)
+        forward_seconds.observe(time.perf_counter() - start, kind)
+    return result
+
+
+async def run_model(kind, name, call):
+    """Run a model call on the inference executor without blocking the event loop.
+    
+    Args:
+        kind: "embedder" or "reranker"
+        name: Model requested, or None for the default
+        call: Function taking the model and returning the response data
+        
+    Returns:
+        The result of call
+        
+    Raises:
+        HTTPException: 503 if MAX_PENDING requests are already running or
+            waiting, 504 if the request takes longer than REQUEST_TIMEOUT
+    """
+    # No await between the check and the acquire, so this can't race on the event loop
+    if pending.locked():
+        raise HTTPException(status_code=503, detail=f"Server busy ({MAX_PENDING} requests pending)",
+                            headers={"Retry-After": "1"})
+    async with pending:
+        future = submit_model_call(kind, name, call)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Only succeeds if it hasn't started; a running forward pass can't be interrupted
+            if future.cancel():
+                queued.dec(kind)
+            raise HTTPException(status_code=504, detail=f"Request timed out after {REQUEST_TIMEOUT:g}s")
+
+
+@contextmanager
+def track(endpoint, size):
+    """Record count, latency, batch size and concurrency for a request.
+    
+    Args:
+        endpoint: Endpoint label (e.g. "embed")
+        size: Number of items in the request batch
+    """
+    inflight.inc(endpoint)
+    batch_size.observe(size, endpoint)
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        request_seconds.observe(time.perf_counter() - start, endpoint)
+        requests_total.inc(endpoint, status)
+        inflight.dec(endpoint)
 
 
 class TextsRequest(BaseModel):
     """Request model for embedding generation."""
     texts: List[str]
+    model: Optional[str] = None
 
 
 class RerankRequest(BaseModel):
     """Request model for document reranking."""
     query: str
     documents: List[str]
+    model: Optional[str] = None
+
+
+class RerankBatchRequest(BaseModel):
+    """Request model for reranking candidates of several queries."""
+    queries: List[str]
+    documents: List[List[str]]
+    model: Optional[str] = None
+
+
+class IndexRequest(BaseModel):
+    """Request model for a background indexing job (options as for vec-index)."""
+    path: str
+    backend: Optional[str] = None
+    dtype: Optional[str] = None
+    quantize: Optional[str] = None
+    by_reference: Optional[bool] = None
+    full: bool = False
 
 
 @app.get("/health")
-def health():
+async def health():
     """Health check endpoint.
     
+    Runs on the event loop, so it answers even while every inference
+    worker is busy.
+    
     Returns:
         Status dictionary indicating server health
     """
@@ -39,24 +232,29 @@ def health():
 
 
 @app.post("/embed")
-def embed_texts(request: TextsRequest):
+async def embed_texts(request: TextsRequest):
     """Generate embeddings for a list of texts.
     
     Args:
-        request: TextsRequest containing list of strings to embed
+        request: TextsRequest containing list of strings to embed and
+            optionally the embedding model (default: all-MiniLM-L6-v2)
         
     Returns:
         Dictionary with 'embeddings' key containing list of embedding vectors
+        and 'model' naming the model used, tagged with the server's runtime
+        (see codevec.models.local_model_name); an empty list of texts only
+        reports the model
     """
-    if not request.texts:
-        return {"embeddings": []}
-    
-    embeddings = model.encode(request.texts, normalize_embeddings=True)
-    return {"embeddings": embeddings.tolist()}
+    with track("embed", len(request.texts)):
+        model = request.model or DEFAULT_EMBEDDER
+        embeddings, model_name = await run_model(
+            "embedder", model,
+            lambda embedder: (embedder.embed(request.texts) if request.texts else [], embedder.model_name))
+        return {"embeddings": embeddings, "model": model_name}
 
 
 @app.post("/rerank")
-def rerank_documents(request: RerankRequest):
+async def rerank_documents(request: RerankRequest):
     """Rerank documents by relevance to query.
     
     Args:
@@ -65,10 +263,150 @@ def rerank_documents(request: RerankRequest):
     Returns:
         Dictionary with 'rankings' key containing ranked results with scores
     """
-    if not request.documents:
-        return {"rankings": []}
+    with track("rerank", len(request.documents)):
+        if not request.documents:
+            return {"rankings": []}
+        
+        results = await run_model(
+            "reranker", request.model,
+            lambda reranker: reranker.rank(request.query, request.documents, return_documents=False))
+        # Convert numpy floats to Python floats for JSON serialization
+        rankings = [{"corpus_id": r["corpus_id"], "score": float(r["score"])} for r in results]
+        return {"rankings": rankings}
+
+
+@app.post("/rerank_batch")
+async def rerank_batch(request: RerankBatchRequest):
+    """Rerank candidate documents for several queries in shared batches.
+    
+    Args:
+        request: RerankBatchRequest with queries and one document list per query
+        
+    Returns:
+        Dictionary with one ranking list per query
+    """
+    if len(request.queries) != len(request.documents):
+        raise HTTPException(status_code=422, detail="queries and documents must have the same length")
+    pairs = [(query, doc) for query, docs in zip(request.queries, request.documents) for doc in docs]
+    with track("rerank_batch", len(pairs)):
+        if not pairs:
+            return {"rankings": [[] for _ in request.queries]}
+        
+        rankings = await run_model(
+            "reranker", request.model, lambda reranker: reranker.rank_many(request.queries, request.documents))
+        return {"rankings": rankings}
+
+
+@app.post("/index", status_code=202)
+def submit_index(request: IndexRequest):
+    """Queue indexing of a repository on the server.
+    
+    Args:
+        request: IndexRequest with the absolute repository path and options
+        
+    Returns:
+        The job (see GET /jobs/{id}), with 'deduplicated' true if a job for
+        the repository was already queued or running
+    """
+    if not Path(request.path).is_dir():
+        raise HTTPException(status_code=400, detail=f"{request.path} is not a directory on the server")
+    if request.backend not in (None, "chroma", "flat"):
+        raise HTTPException(status_code=400, detail=f"Unknown backend '{request.backend}'")
+    if request.dtype not in (None, "float32", "float16"):
+        raise HTTPException(status_code=400, detail=f"Unknown dtype '{request.dtype}'")
+    if request.quantize not in (None, "int8", "binary", "none"):
+        raise HTTPException(status_code=400, detail=f"Unknown quantization '{request.quantize}'")
+    options = {name: getattr(request, name) for name in ("backend", "dtype", "quantize", "by_reference", "full")}
+    job, created = jobs.submit(request.path, options)
+    return {**job.to_dict(), "deduplicated": not created}
+
+
+@app.get("/jobs")
+def list_jobs():
+    """List queued, running and recently finished indexing jobs."""
+    return {"jobs": [job.to_dict() for job in jobs.list()]}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Progress of an indexing job.
     
-    results = reranker.rank(request.query, request.documents, return_documents=False)
-    # Convert numpy floats to Python floats for JSON serialization
-    rankings = [{"corpus_id": r["corpus_id"], "score": float(r["score"])} for r in results]
-    return {"rankings": rankings}
\ No newline at end of file
+    Returns:
+        Job status ("queued", "running", "done", "failed" or "cancelled"),
+        stage, files scanned, chunks embedded of total, ETA in seconds
+        while embedding, and the function count or error once finished
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return job.to_dict()
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Cancel an indexing job; a running build stops at its next progress report."""
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return job.to_dict()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Metrics endpoint in the Prometheus text exposition format.
+    
+    Returns:
+        Plain-text metrics for scraping
+    """
+    loaded = [model["kind"] for model in models.status()]
+    for kind in ("embedder", "reranker"):
+        models_loaded.set(loaded.count(kind), kind)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+def stats():
+    """Summary of request statistics as JSON.
+    
+    Returns:
+        Dictionary with per-endpoint counts, latency percentiles (ms) and
+        batch sizes, model forward pass times, in-flight requests, model
+        calls queued for an inference worker and RSS
+    """
+    def ms(summary):
+        return {k: (v * 1000 if k != "count" else v) for k, v in summary.items()}
+
+    endpoints = {}
+    for endpoint in ("embed", "rerank", "rerank_batch"):
+        endpoints[endpoint] = {
+            "requests": requests_total.values.get((endpoint, "ok"), 0),
+            "errors": requests_total.values.get((endpoint, "error"), 0),
+            "inflight": inflight.values.get((endpoint,), 0),
+            "latency_ms": ms(request_seconds.summary(endpoint)),
+            "batch_size": batch_size.summary(endpoint),
+        }
+    return {
+        "uptime_s": time.time() - registry.start_time,
+        "rss_mb": resident_memory_bytes() / (1024 * 1024),
+        "endpoints": endpoints,
+        "forward_ms": {name: ms(forward_seconds.summary(name)) for name in ("embedder", "reranker")},
+        "queued": {kind: queued.values.get((kind,), 0) for kind in ("embedder", "reranker")},
+        "models": models.status(),
+    }
+
+
+@app.get("/models")
+def loaded_models():
+    """List the loaded models and the registry settings.
+    
+    Returns:
+        Dictionary with 'loaded' models (kind, name, requests in progress,
+        idle seconds, load time, memory added), default models, idle
+        timeout and memory budget
+    """
+    return {
+        "loaded": models.status(),
+        "defaults": models.defaults,
+        "idle_timeout_s": models.idle_timeout,
+        "memory_budget_mb": models.memory_budget / (1024 * 1024) if models.memory_budget else None,
+    }
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""Sharded index builds.
+
+A large repository can be indexed in pieces on separate machines:
+
+    vec-index ./repo --shard 0/4 --output shard-0    # on runner 0
+    ...
+    vec-index merge ./repo shard-0 shard-1 shard-2 shard-3
+
+Files are assigned to shards by a hash of their repository-relative path,
+so every runner computes the same split without coordination. Each shard
+is a self-contained flat-format directory (float32 vectors, metadata,
+function source and a manifest) with repository-relative paths, so it can
+be built in one checkout and merged into another. Merging copies the
+stored vectors into a new index generation and never loads a model.
+"""
+
+import hashlib
+import shutil
+from pathlib import Path
+
+from codevec.backends import MANIFEST_NAME, create_backend, open_backend, read_manifest, update_manifest
+from codevec.cache import EmbeddingCache
+from codevec.changes import git_state
+from codevec.index import (
+    build_from_embeddings, embed_chunks, extract_chunks, get_db_path, get_embedder, store_chunks, walk_codebase
+)
+from codevec.profiling import span
+
+ADD_BATCH = 5000
+
+
+def parse_shard(spec):
+    """Parse a shard spec such as "2/8" into (index, count).
+
+    Raises:
+        ValueError: If the spec is malformed or out of range
+    """
+    index, _, count = spec.partition("/")
+    index, count = int(index), int(count)
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{spec}' (expected i/N with 0 <= i < N)")
+    return index, count
+
+
+def shard_of(relative_path, count):
+    """Return the shard a repository-relative path belongs to."""
+    digest = hashlib.sha1(Path(relative_path).as_posix().encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def build_shard(root_path, index, count, output, jobs=1):
+    """Index the files of one shard into a standalone directory.
+
+    Args:
+        root_path: Root directory of the codebase
+        index: Shard number, from 0 to count - 1
+        count: Total number of shards
+        output: Directory to write the shard to (replaced if it holds a shard)
+        jobs: Worker processes to embed with when no model server is running
+
+    Returns:
+        Number of functions in the shard
+    """
+    root = Path(root_path).resolve()
+    output = Path(output).resolve()
+    if output.exists():
+        if "shard" not in read_manifest(output) and any(output.iterdir()):
+            raise FileExistsError(f"{output} exists and is not a shard directory")
+        shutil.rmtree(output)
+
+    print(f"Indexing shard {index}/{count} of {root}")
+    with span("read git state"):
+        state = git_state(root)
+
+    chunks = []
+    metadatas = []
+    files = 0
+    with span("scan and parse files"):
+        for file_path, content in walk_codebase(root):
+            relative = Path(file_path).relative_to(root).as_posix()
+            if shard_of(relative, count) != index:
+                continue
+            files += 1
+            # Keep reference fields so the merge can build either source mode
+            file_chunks, file_metadatas = extract_chunks(relative, content, by_reference=True)
+            chunks.extend(file_chunks)
+            metadatas.extend(file_metadatas)
+
+    print(f"Generating embeddings for {len(chunks)} code chunks from {files} files...")
+    with span("embed chunks"):
+        # Reuse a local embedding cache if there is one; shards never write to it
+        cache = EmbeddingCache(get_db_path(root), get_embedder(jobs).model_name)
+        embeddings, reused = embed_chunks(chunks, cache)
+    if reused:
+        print(f"Reused {reused} cached embeddings")
+
+    with span("store shard"):
+        store = create_backend(output, "flat")
+        store_chunks(store, output, chunks, embeddings, metadatas)
+        update_manifest(output, model=get_embedder().model_name, shard={"index": index, "count": count}, **state)
+
+    print(f"Shard written to {output}: {len(chunks)} functions")
+    return len(chunks)
+
+
+def open_shards(shard_paths):
+    """Open shard directories and check they form one complete build.
+
+    Args:
+        shard_paths: Shard directories
+
+    Returns:
+        List of opened shard backends, ordered by shard number
+
+    Raises:
+        ValueError: If a directory isn't a shard, or the shards are
+            incomplete, duplicated or built with different models
+    """
+    shards = {}
+    for path in shard_paths:
+        if not (Path(path) / MANIFEST_NAME).exists() or "shard" not in read_manifest(path):
+            raise ValueError(f"{path} is not a shard directory")
+        store = open_backend(path)
+        number = store.manifest["shard"]["index"]
+        if number in shards:
+            raise ValueError(f"Shard {number} given twice ({shards[number].path} and {path})")
+        shards[number] = store
+
+    stores = [shards[number] for number in sorted(shards)]
+    counts = {store.manifest["shard"]["count"] for store in stores}
+    models = {store.manifest.get("model") for store in stores}
+    if len(counts) > 1:
+        raise ValueError(f"Shards come from builds with different shard counts: {sorted(counts)}")
+    if len(models) > 1:
+        raise ValueError(f"Shards were embedded with different models: {sorted(models)}")
+    missing = sorted(set(range(counts.pop())) - set(shards))
+    if missing:
+        raise ValueError(f"Missing shards: {', '.join(map(str, missing))}")
+    return stores
+
+
+def merge_shards(root_path, shard_paths, backend=None, dtype=None, quantize=None, by_reference=None):
+    """Combine shards into the repository's index without re-embedding.
+
+    The merged index is published as a new generation, like a full
+    vec-index. Settings left as None keep the existing index's values.
+
+    Args:
+        root_path: Root directory of the codebase the shards were built from
+        shard_paths: Shard directories covering every shard of one build
+        backend, dtype, quantize, by_reference: As for index_codebase
+
+    Returns:
+        Number of functions in the merged index
+    """
+    stores = open_shards(shard_paths)
+
+    def batches():
+        for shard in stores:
+            print(f"Merging shard {shard.manifest['shard']['index']} ({shard.count()} functions)...")
+            for start in range(0, shard.count(), ADD_BATCH):
+                rows = range(start, min(start + ADD_BATCH, shard.count()))
+                yield ([shard.documents[row] for row in rows],
+                       shard.vectors[rows.start:rows.stop],
+                       [shard.metadata(row) for row in rows])
+
+    # Incremental updates can continue from the shards' commit if they agree on it
+    commits = {shard.manifest.get("commit") for shard in stores}
+    state = {}
+    if len(commits) == 1 and None not in commits:
+        state = {"commit": commits.pop(), "dirty": sorted({p for s in stores for p in s.manifest.get("dirty", [])})}
+
+    with span("merge shards"):
+        total = build_from_embeddings(root_path, batches(), stores[0].manifest.get("model"), state,
+                                      backend=backend, dtype=dtype, quantize=quantize, by_reference=by_reference)
+    print(f"Merge complete. {total} functions indexed from {len(stores)} shards.")
+    return total
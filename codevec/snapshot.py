@@ -0,0 +1,189 @@
+"""Portable index snapshots.
+
+A snapshot packs an index into a single zip file that can be shared
+between machines, e.g. published by CI for each main-branch commit and
+imported by developers instead of indexing locally:
+
+- snapshot.json: format version, model name and embedding dimension,
+  commit, function count and vector precision
+- vectors.npy (float16), or codes.npy and scales.npy (int8)
+- metadata.json and documents.json, deflate-compressed, with file paths
+  relative to the repository root
+
+Importing builds a regular index generation from the stored vectors and
+never loads the embedding model. The snapshot's commit is recorded, so a
+following vec-index only re-indexes files changed since that commit.
+"""
+
+import io
+import json
+import os
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from codevec import __version__
+from codevec.backends import open_backend, quantize_int8
+from codevec.changes import git_state
+from codevec.generations import acquire_reader
+from codevec.index import build_from_embeddings, get_db_path
+from codevec.sources import load_sources
+
+SNAPSHOT_FORMAT = "codevec-snapshot"
+SNAPSHOT_VERSION = 1
+PRECISIONS = ("float16", "int8")
+IMPORT_BATCH = 5000
+
+
+def _npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+def export_index(root_path, output, precision="float16"):
+    """Write the current index of a repository to a snapshot file.
+
+    Args:
+        root_path: Root directory of the indexed codebase
+        output: Snapshot file to write
+        precision: Stored vector precision, "float16" or "int8"
+
+    Returns:
+        Header dict written to snapshot.json
+
+    Raises:
+        FileNotFoundError: If the repository has no index
+        ValueError: If precision is unknown
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}' (choose {' or '.join(PRECISIONS)})")
+    root = Path(root_path).resolve()
+    db_path = get_db_path(root)
+    if not Path(db_path).is_dir():
+        raise FileNotFoundError(f"No index found at {db_path} (run vec-index first)")
+
+    with acquire_reader(db_path) as lease:
+        store = open_backend(lease.path)
+        manifest = store.manifest
+        documents, vectors, metadatas = store.entries()
+        # An empty index has no vectors to take the dimension from
+        vectors = np.asarray(vectors, dtype=np.float32) if metadatas else np.zeros((0, 0), dtype=np.float32)
+        if manifest.get("source") == "reference":
+            documents = load_sources(metadatas, lease.path)
+
+    columns = {}
+    for row, metadata in enumerate(metadatas):
+        path = Path(metadata["file_path"])
+        metadata = dict(metadata, file_path=path.relative_to(root).as_posix() if path.is_relative_to(root) else str(path))
+        metadata.pop("pack_offset", None)
+        metadata.pop("pack_length", None)
+        for key, value in metadata.items():
+            columns.setdefault(key, [None] * len(metadatas))[row] = value
+
+    state = {"commit": manifest["commit"], "dirty": manifest.get("dirty", [])} if "commit" in manifest else git_state(root)
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "codevec_version": __version__,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "model": {"name": manifest.get("model"), "dim": int(vectors.shape[1]) if len(vectors) else None},
+        "count": len(metadatas),
+        "precision": precision,
+        "commit": state.get("commit"),
+        "dirty": state.get("dirty", []),
+    }
+
+    files = {"snapshot.json": json.dumps(header, indent=2).encode("utf-8")}
+    if precision == "float16":
+        files["vectors.npy"] = _npy_bytes(vectors.astype(np.float16))
+    else:
+        codes, scales = quantize_int8(vectors)
+        files["codes.npy"] = _npy_bytes(codes)
+        files["scales.npy"] = _npy_bytes(scales)
+    files["metadata.json"] = json.dumps(columns).encode("utf-8")
+    files["documents.json"] = json.dumps(documents).encode("utf-8")
+
+    tmp = Path(f"{output}.tmp")
+    with zipfile.ZipFile(tmp, "w") as archive:
+        for name, data in files.items():
+            # Vectors barely compress, so only the text parts are deflated
+            compression = zipfile.ZIP_STORED if name.endswith(".npy") else zipfile.ZIP_DEFLATED
+            archive.writestr(name, data, compress_type=compression)
+    os.replace(tmp, output)
+    return header
+
+
+def read_snapshot(path):
+    """Read and validate a snapshot file.
+
+    Args:
+        path: Snapshot file
+
+    Returns:
+        Tuple of (header, documents, float32 vectors, metadatas)
+
+    Raises:
+        ValueError: If the file isn't a snapshot this version can read
+    """
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"{path} is not a codevec snapshot") from e
+    with archive:
+        try:
+            header = json.loads(archive.read("snapshot.json"))
+        except KeyError as e:
+            raise ValueError(f"{path} is not a codevec snapshot") from e
+        if header.get("format") != SNAPSHOT_FORMAT or header.get("version", 0) > SNAPSHOT_VERSION:
+            raise ValueError(f"{path} has unsupported snapshot version {header.get('version')} "
+                             f"(this codevec reads up to {SNAPSHOT_VERSION})")
+
+        if header["precision"] == "float16":
+            vectors = np.load(io.BytesIO(archive.read("vectors.npy"))).astype(np.float32)
+        else:
+            codes = np.load(io.BytesIO(archive.read("codes.npy")))
+            vectors = codes.astype(np.float32) * np.load(io.BytesIO(archive.read("scales.npy")))
+        # Restore unit length, which search distances assume
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1.0)
+
+        columns = json.loads(archive.read("metadata.json"))
+        documents = json.loads(archive.read("documents.json"))
+
+    metadatas = [
+        {key: column[row] for key, column in columns.items() if column[row] is not None}
+        for row in range(header["count"])
+    ]
+    return header, documents, vectors, metadatas
+
+
+def import_index(root_path, path, backend=None, dtype=None, quantize=None, by_reference=None):
+    """Build a repository's index from a snapshot without embedding.
+
+    Args:
+        root_path: Root directory of the codebase the snapshot was taken from
+        path: Snapshot file
+        backend, dtype, quantize, by_reference: As for index_codebase
+
+    Returns:
+        Snapshot header
+    """
+    header, documents, vectors, metadatas = read_snapshot(path)
+    print(f"Snapshot of commit {(header['commit'] or 'unknown')[:12]}: {header['count']} functions, "
+          f"{header['model']['name']}, {header['precision']} vectors")
+
+    head = git_state(Path(root_path).resolve()).get("commit")
+    if header["commit"] and head and head != header["commit"]:
+        print(f"Working tree is at {head[:12]}; run vec-index afterwards to re-index the differences")
+
+    batches = (
+        (documents[i:i + IMPORT_BATCH], vectors[i:i + IMPORT_BATCH], metadatas[i:i + IMPORT_BATCH])
+        for i in range(0, header["count"], IMPORT_BATCH)
+    )
+    state = {"commit": header["commit"], "dirty": header["dirty"]} if header["commit"] else {}
+    build_from_embeddings(root_path, batches, header["model"]["name"], state,
+                          backend=backend, dtype=dtype, quantize=quantize, by_reference=by_reference)
+    return header
@@ -0,0 +1,151 @@
+"""Source-by-reference storage for indexed functions.
+
+Instead of storing each function's source in the index, a reference mode
+index records where the function lives (file path, byte offsets, line
+span) and a hash of its text. Source is read back lazily from the working
+tree with memory-mapped reads, and only for the candidates a search
+actually needs. When the file has changed since indexing, the hash check
+fails and the text is read from a compressed copy in sources.pack.
+"""
+
+import hashlib
+import mmap
+import zlib
+from pathlib import Path
+
+PACK_NAME = "sources.pack"
+
+
+def content_hash(text):
+    """Return a short hash identifying a function's source text.
+
+    Args:
+        text: Function source code
+
+    Returns:
+        Hex digest string
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_source(text):
+    """Join lines with newlines the same way extract_functions_ast does."""
+    return "\n".join(text.splitlines())
+
+
+def line_offsets(raw):
+    """Return the byte offset at which each line of a file starts.
+
+    Args:
+        raw: File contents as bytes
+
+    Returns:
+        List of offsets, with a final entry for the end of the file
+    """
+    offsets = [0]
+    for line in raw.splitlines(keepends=True):
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def source_reference(offsets, func):
+    """Build the reference metadata for an extracted function.
+
+    Args:
+        offsets: Line start offsets from line_offsets() for the function's file
+        func: Function dict from extract_functions_ast
+
+    Returns:
+        Dict with start_byte, end_byte, end_line and hash
+    """
+    last = len(offsets) - 1
+    return {
+        "start_byte": offsets[min(func["lineno"] - 1, last)],
+        "end_byte": offsets[min(func["end_lineno"], last)],
+        "end_line": func["end_lineno"],
+        "hash": content_hash(func["data"]),
+    }
+
+
+class SourcePack:
+    """Append-only file of zlib-compressed function sources.
+
+    Serves as the fallback copy when the working tree no longer matches
+    the indexed source. Entries are addressed by (offset, length).
+    """
+
+    def __init__(self, db_path):
+        """Initialize the pack in an index directory.
+
+        Args:
+            db_path: Path to the .codevec directory
+        """
+        self.path = Path(db_path) / PACK_NAME
+
+    def reset(self):
+        """Truncate the pack, discarding all entries."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_bytes(b"")
+
+    def append(self, texts):
+        """Append sources to the pack.
+
+        Args:
+            texts: List of function source strings
+
+        Returns:
+            List of (offset, length) tuples, one per text
+        """
+        entries = []
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            for text in texts:
+                data = zlib.compress(text.encode("utf-8"))
+                f.write(data)
+                entries.append((offset, len(data)))
+                offset += len(data)
+        return entries
+
+    def read(self, offset, length):
+        """Read one source back from the pack."""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return zlib.decompress(f.read(length)).decode("utf-8")
+
+
+def load_sources(metadatas, db_path):
+    """Fetch the source of referenced functions.
+
+    Each file is memory-mapped once and only the referenced byte ranges are
+    read. A slice whose hash no longer matches (or whose file is gone) is
+    taken from the source pack instead.
+
+    Args:
+        metadatas: Metadata dicts containing reference fields
+        db_path: Path to the .codevec directory holding the source pack
+
+    Returns:
+        List of source strings, one per metadata entry
+    """
+    pack = SourcePack(db_path)
+    by_file = {}
+    for i, meta in enumerate(metadatas):
+        by_file.setdefault(meta["file_path"], []).append(i)
+
+    documents = [None] * len(metadatas)
+    for file_path, indices in by_file.items():
+        try:
+            with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for i in indices:
+                    meta = metadatas[i]
+                    raw = mapped[meta["start_byte"]:meta["end_byte"]]
+                    text = normalize_source(raw.decode("utf-8", errors="replace"))
+                    if content_hash(text) == meta["hash"]:
+                        documents[i] = text
+        except (OSError, ValueError):
+            pass  # Missing or empty file, fall back to the pack
+
+        for i in indices:
+            if documents[i] is None:
+                documents[i] = pack.read(metadatas[i]["pack_offset"], metadatas[i]["pack_length"])
+    return documents
@@ -0,0 +1,214 @@
+"""Filesystem watch mode for keeping an index fresh.
+
+Subscribes to inotify events for every directory in the repository and
+re-indexes only the files that changed. Bursts of events (saves, branch
+checkouts, formatters) are coalesced: changed paths are collected until
+the tree has been quiet for the debounce interval, then applied in one
+update. While idle the watcher blocks in select() and uses no CPU.
+
+On platforms without inotify, a polling fallback compares file
+modification times every few seconds.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+from codevec.index import is_indexed_path, update_index
+
+# inotify event flags (from <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_watched_dir(path, root):
+    """Check whether a directory can contain indexed files."""
+    try:
+        parts = Path(path).relative_to(root).parts
+    except ValueError:
+        return False
+    return not any(segment.startswith('.') or segment == '__pycache__' for segment in parts)
+
+
+class InotifyWatcher:
+    """Recursive directory watcher using Linux inotify through ctypes."""
+
+    def __init__(self, root):
+        """Start watching every indexable directory under root.
+
+        Args:
+            root: Absolute repository root
+
+        Raises:
+            OSError: If inotify is unavailable
+        """
+        self.root = Path(root)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}  # watch descriptor -> directory path
+        self.files = set()  # indexed files known to exist
+        self._add_tree(self.root)
+
+    def _add_tree(self, directory):
+        """Watch directory and its subdirectories; return the .py files found."""
+        found = set()
+        for current, subdirs, filenames in os.walk(directory):
+            subdirs[:] = [d for d in subdirs if is_watched_dir(Path(current) / d, self.root)]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(current), WATCH_MASK)
+            if wd >= 0:
+                self.dirs[wd] = Path(current)
+            for filename in filenames:
+                path = Path(current) / filename
+                if is_indexed_path(path, self.root):
+                    found.add(str(path))
+        self.files |= found
+        return found
+
+    def _remove_tree(self, directory):
+        """Forget files under a removed directory; return them."""
+        prefix = str(directory) + os.sep
+        gone = {f for f in self.files if f.startswith(prefix)}
+        self.files -= gone
+        return gone
+
+    def wait(self, timeout=None):
+        """Block until events arrive or timeout expires.
+
+        Args:
+            timeout: Seconds to wait, or None to wait indefinitely
+
+        Returns:
+            Set of changed file paths (possibly empty on timeout)
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; rescan everything we know about
+                changed |= self.files | self._add_tree(self.root)
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None or not name:
+                continue
+
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and is_watched_dir(path, self.root):
+                    changed |= self._add_tree(path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    changed |= self._remove_tree(path)
+            elif is_indexed_path(path, self.root):
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.files.discard(str(path))
+                else:
+                    self.files.add(str(path))
+                # IN_CREATE alone is followed by IN_CLOSE_WRITE once written
+                if mask != IN_CREATE:
+                    changed.add(str(path))
+        return changed
+
+
+class PollingWatcher:
+    """Fallback watcher that compares modification times periodically."""
+
+    def __init__(self, root, interval=2.0):
+        """Take an initial snapshot of the repository.
+
+        Args:
+            root: Absolute repository root
+            interval: Seconds between scans
+        """
+        self.root = Path(root)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        """Map each indexable file to its modification time."""
+        snapshot = {}
+        for current, subdirs, filenames in os.walk(self.root):
+            subdirs[:] = [d for d in subdirs if is_watched_dir(Path(current) / d, self.root)]
+            for filename in filenames:
+                path = Path(current) / filename
+                if is_indexed_path(path, self.root):
+                    try:
+                        snapshot[str(path)] = path.stat().st_mtime_ns
+                    except OSError:
+                        pass
+        return snapshot
+
+    def wait(self, timeout=None):
+        """Sleep for one interval (bounded by timeout) and return changed files."""
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {p for p in snapshot.keys() | self.snapshot.keys() if snapshot.get(p) != self.snapshot.get(p)}
+        self.snapshot = snapshot
+        return changed
+
+
+def create_watcher(root):
+    """Create an inotify watcher, falling back to polling where unsupported."""
+    try:
+        return InotifyWatcher(root)
+    except (OSError, AttributeError):
+        print("inotify unavailable, falling back to polling for changes")
+        return PollingWatcher(root)
+
+
+def watch_codebase(root_path, debounce=1.0):
+    """Watch a repository and re-index changed files until interrupted.
+
+    Args:
+        root_path: Root directory of an indexed codebase
+        debounce: Seconds of quiet required before applying a batch of changes
+    """
+    root = Path(root_path).resolve()
+    watcher = create_watcher(root)
+    print(f"Watching {root} for changes (press CTRL+C to stop)")
+
+    pending = set()
+    try:
+        while True:
+            # Block indefinitely while idle; once changes are pending, wait
+            # only until the tree has been quiet for the debounce interval
+            changed = watcher.wait(debounce if pending else None)
+            if changed:
+                pending |= changed
+                continue
+            if not pending:
+                continue
+
+            batch = sorted(pending)
+            pending.clear()
+            functions = update_index(root, batch)
+            print(f"Re-indexed {len(batch)} changed file(s), {functions} functions")
+    except KeyboardInterrupt:
+        print("\nStopped watching")
@@ -0,0 +1,60 @@
+"""Shared fixtures: a hashed bag-of-words embedder and reranker, so no model is loaded."""
+
+import re
+import shutil
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from codevec import api, index
+
+TEST_REPO = Path(__file__).parent / "test-repo"
+
+
+def _vector(text, dimensions=64):
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in re.findall(r"[a-z]+", text.lower()):
+        vector[zlib.crc32(word.encode()) % dimensions] += 1
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector + 1 / np.sqrt(dimensions)
+
+
+class WordEmbedder:
+    model_name = "test-words"
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed(self, texts, task_type="document"):
+        if task_type == "document":
+            self.embedded.extend(texts)
+        return [_vector(text).tolist() for text in texts]
+
+
+class WordReranker:
+    def rank(self, query, documents, return_documents=False):
+        scores = [float(_vector(query) @ _vector(document)) for document in documents]
+        return sorted(({"corpus_id": i, "score": s} for i, s in enumerate(scores)), key=lambda r: -r["score"])
+
+    def rank_many(self, queries, documents):
+        return [self.rank(query, docs) for query, docs in zip(queries, documents)]
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    """Index and search with WordEmbedder and WordReranker."""
+    embedder = WordEmbedder()
+    monkeypatch.setattr(index, "_embedder", embedder)
+    monkeypatch.setattr(api, "_reranker", WordReranker())
+    return embedder
+
+
+@pytest.fixture
+def repo(tmp_path, embedder):
+    """A copy of the test repository with a flat index."""
+    root = tmp_path / "repo"
+    shutil.copytree(TEST_REPO, root)
+    index.index_codebase(str(root), backend="flat", full=True)
+    return root
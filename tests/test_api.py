@@ -0,0 +1,83 @@
+"""Tests for CodeVecIndex snapshots under concurrent updates."""
+
+import threading
+from pathlib import Path
+
+import pytest
+
+from codevec import api, hierarchy
+
+
+def test_old_snapshot_survives_update(repo):
+    target = repo / "utils" / "snapshot_probe.py"
+    target.write_text("def snapshot_probe():\n    return 'before'\n")
+    with api.CodeVecIndex(repo) as code_index:
+        code_index.update([target])
+        old = code_index._current()
+        before = old.store.count()
+
+        target.write_text("def snapshot_probe():\n    return 'after'\n\n\ndef second_probe():\n    return 2\n")
+        code_index.update([target])
+
+        # The old snapshot reads its own generation, which updates never touch
+        assert old.lease.path.exists()
+        assert old.store.count() == before
+        documents = old.store.entries()[0]
+        assert any("'before'" in document for document in documents if document)
+        assert not any("'after'" in document for document in documents if document)
+        [result] = code_index.search("snapshot_probe", rerank=False)
+        assert "'after'" in result.code
+
+
+def test_concurrent_search_and_update(repo):
+    errors = []
+    stop = threading.Event()
+
+    with api.CodeVecIndex(repo) as code_index:
+        def search():
+            while not stop.is_set():
+                try:
+                    for result in code_index.search("validate email address", n_results=5):
+                        # Source, name and location must come from the same row
+                        assert f"def {result.name}(" in result.code
+                        assert Path(result.file_path).exists()
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+        threads = [threading.Thread(target=search) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        try:
+            target = repo / "utils" / "generated.py"
+            for version in range(10):
+                target.write_text("".join(f"def email_check_{version}_{i}(address):\n"
+                                          f"    return '@' in address and {i}\n\n\n" for i in range(5)))
+                code_index.update([target])
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        assert not errors, errors[0]
+        [result] = code_index.search("email_check_9_3")
+        assert result.similarity is None
+        assert all(r.name != "email_check_0_3" for r in code_index.search("email_check_0_3", rerank=False))
+
+
+@pytest.mark.parametrize("two_stage", [False, True])
+def test_search_many_matches_search(repo, monkeypatch, two_stage):
+    if two_stage:
+        monkeypatch.setattr(hierarchy, "TWO_STAGE_MIN_FUNCTIONS", 0)
+        monkeypatch.setattr(hierarchy, "TOP_MODULES", 3)
+    queries = ["validate email address", "hash_password", "sort a list of numbers", "http request with retries",
+               "calculate_average", "zzz qqq"]
+    with api.CodeVecIndex(repo) as code_index:
+        batch = code_index.search_many(queries, n_results=3, batch_size=4)
+        for query, results in zip(queries, batch):
+            single = code_index.search(query, n_results=3)
+            assert [(r.file_path, r.name, r.line, r.code) for r in results] == \
+                [(r.file_path, r.name, r.line, r.code) for r in single]
+            # Batched matrix products may differ from single ones in the last bits
+            assert [r.similarity for r in results] == pytest.approx([r.similarity for r in single], abs=1e-6)
+            assert [r.rerank_score for r in results] == pytest.approx([r.rerank_score for r in single])
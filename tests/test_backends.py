@@ -0,0 +1,131 @@
+"""Tests for the flat vector store."""
+
+import string
+
+import numpy as np
+import pytest
+
+from codevec.backends import FlatBackend, create_backend
+from conftest import WordEmbedder
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    """Random bag-of-words functions and queries, embedded with WordEmbedder."""
+    rng = np.random.default_rng(0)
+    vocabulary = ["".join(rng.choice(list(string.ascii_lowercase), 6)) for _ in range(400)]
+    texts = [" ".join(rng.choice(vocabulary, 12)) for _ in range(3000)]
+    queries = [" ".join(rng.choice(vocabulary, 4)) for _ in range(100)]
+    embedder = WordEmbedder()
+    return {
+        "ids": [f"id{i}" for i in range(len(texts))],
+        "documents": texts,
+        "metadatas": [{"file_path": f"module_{i % 50}.py", "name": f"function_{i}", "line": 1}
+                      for i in range(len(texts))],
+        "vectors": np.asarray(embedder.embed(texts), dtype=np.float32),
+        "queries": np.asarray(embedder.embed(queries, task_type="query"), dtype=np.float32),
+    }
+
+
+def _build(path, corpus, **options):
+    store = create_backend(path, "flat", **options)
+    store.add(corpus["ids"], corpus["documents"], corpus["vectors"].tolist(), corpus["metadatas"])
+    return store
+
+
+def _recall(corpus, results, k):
+    """Share of results among the exact top k, counting ties with the k-th score as hits."""
+    scores = corpus["queries"] @ corpus["vectors"].T
+    kth = -np.sort(-scores, axis=1)[:, k - 1]
+    rows = {id_: row for row, id_ in enumerate(corpus["ids"])}
+    hits = [scores[q, rows[id_]] >= kth[q] - 1e-5 for q, ids in enumerate(results["ids"]) for id_ in ids]
+    return sum(hits) / len(hits)
+
+
+@pytest.mark.parametrize("quantize, min_recall", [
+    (None, 1.0),
+    ("int8", 0.975),
+    # 1-bit codes of 64-dimensional vectors; real embeddings have far more dimensions
+    ("binary", 0.95),
+])
+def test_quantized_recall(tmp_path, corpus, quantize, min_recall):
+    store = _build(tmp_path, corpus, quantize=quantize)
+    assert _recall(corpus, store.query(corpus["queries"], 5), 5) >= min_recall
+
+
+@pytest.mark.parametrize("quantize", ["int8", "binary"])
+def test_quantized_results_are_rescored(tmp_path, corpus, quantize, monkeypatch):
+    store = _build(tmp_path, corpus, quantize=quantize)
+    results = store.query(corpus["queries"], 5)
+
+    # Distances come from the full vectors, not the codes
+    rows = {id_: row for row, id_ in enumerate(corpus["ids"])}
+    for query, ids, distances in zip(corpus["queries"], results["ids"], results["distances"]):
+        exact = [2 - 2 * float(corpus["vectors"][rows[id_]] @ query) for id_ in ids]
+        assert distances == pytest.approx(exact, abs=1e-5)
+        assert distances == sorted(distances)
+
+    # Rescoring a shortlist larger than n_results is what recovers the recall
+    monkeypatch.setitem(FlatBackend.RESCORE_FACTOR, quantize, 1)
+    assert _recall(corpus, store.query(corpus["queries"], 5), 5) <= _recall(corpus, results, 5)
+
+
+def _entries(rng, file_path, count):
+    vectors = rng.normal(size=(count, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return {f"{file_path}:{i}": (vector, {"file_path": file_path, "name": f"f{i}", "line": i + 1})
+            for i, vector in enumerate(vectors)}
+
+
+def _add(store, entries):
+    ids = list(entries)
+    store.add(ids, [f"code of {id_}" for id_ in ids], [entries[id_][0].tolist() for id_ in ids],
+              [entries[id_][1] for id_ in ids])
+
+
+def _check(store, expected, queries, files=None):
+    """Compare the store's query results with a brute-force search of expected."""
+    ids = [id_ for id_, (_, metadata) in expected.items() if files is None or metadata["file_path"] in files]
+    assert store.count() == len(expected)
+    results = store.query(queries.tolist(), 10, files=files)
+    for query, found, metadatas, distances in zip(queries, results["ids"], results["metadatas"], results["distances"]):
+        scores = {id_: float(expected[id_][0] @ query) for id_ in ids}
+        nearest = sorted(scores, key=lambda id_: -scores[id_])[:10]
+        assert found == nearest
+        assert distances == pytest.approx([2 - 2 * scores[id_] for id_ in nearest], abs=1e-5)
+        assert metadatas == [expected[id_][1] for id_ in nearest]
+
+
+def test_flat_add_delete_rename(tmp_path):
+    rng = np.random.default_rng(1)
+    queries = rng.normal(size=(8, 32)).astype(np.float32)
+    store = create_backend(tmp_path, "flat")
+    expected = {}
+    for file_path in ("a.py", "b.py", "c.py"):
+        expected.update(_entries(rng, file_path, 20))
+    _add(store, expected)
+    _check(store, expected, queries)
+
+    # Later adds, deletes and renames go to the delta store and deleted rows
+    added = _entries(rng, "d.py", 5)
+    _add(store, added)
+    expected.update(added)
+    store.delete_files(["b.py"])
+    expected = {id_: entry for id_, entry in expected.items() if entry[1]["file_path"] != "b.py"}
+    store.rename_file("a.py", "renamed.py")
+    expected = {id_: (vector, {**metadata, "file_path": "renamed.py"} if metadata["file_path"] == "a.py" else metadata)
+                for id_, (vector, metadata) in expected.items()}
+    assert store.delta is not None and len(store.deleted) == 40
+    _check(store, expected, queries)
+    _check(store, expected, queries, files=["renamed.py", "d.py"])
+    assert store.query(queries.tolist(), 10, files=["a.py", "b.py"])["ids"] == [[] for _ in queries]
+    assert [m["file_path"] for m in store.get(["a.py:3"])["metadatas"]] == ["renamed.py"]
+
+    reopened = FlatBackend(tmp_path)
+    reopened.open()
+    _check(reopened, expected, queries)
+
+    reopened.compact()
+    assert reopened.delta is None and len(reopened.deleted) == 0
+    _check(reopened, expected, queries)
+    _check(reopened, expected, queries, files=["c.py"])
@@ -0,0 +1,24 @@
+"""Tests for reusing cached embeddings across builds."""
+
+from codevec import index
+from codevec.cache import EmbeddingCache
+
+
+def test_reindex_hits_cache(repo, embedder):
+    embedder.embedded.clear()
+    assert index.index_codebase(str(repo), full=True) == 80
+    assert embedder.embedded == []
+
+    # Only the changed function is embedded, along with its module's summary
+    target = repo / "utils" / "string_helpers.py"
+    source = target.read_text()
+    target.write_text(source.replace("def slugify(text):", "def slugify(text, separator='-'):"))
+    index.index_codebase(str(repo), full=True)
+    assert sorted(text.split("\n")[0] for text in embedder.embedded) == \
+        ["def slugify(text, separator='-'):", "module utils.string_helpers"]
+
+
+def test_cache_resets_for_another_model(repo, embedder):
+    cache = EmbeddingCache(index.get_db_path(str(repo)), embedder.model_name)
+    assert len(cache) > 0
+    assert len(EmbeddingCache(index.get_db_path(str(repo)), "another-model")) == 0
@@ -0,0 +1,150 @@
+"""Tests for git-based incremental indexing."""
+
+import shutil
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from codevec import index
+from codevec.backends import open_backend
+from codevec.changes import detect_changes, git_state
+from codevec.generations import current_generation
+
+TEST_REPO = Path(__file__).parent / "test-repo"
+
+
+def _git(root, *args):
+    subprocess.run(["git", "-C", str(root), "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                   check=True, capture_output=True)
+
+
+def _functions(root):
+    """Map each indexed file (relative to root) to its (id, name) pairs."""
+    store = open_backend(current_generation(index.get_db_path(str(root))))
+    results = store.query(np.ones((1, 64), dtype=np.float32) / 8, store.count())
+    functions = {}
+    for id_, metadata in zip(results["ids"][0], results["metadatas"][0]):
+        path = str(metadata["file_path"]).removeprefix(f"{root}/")
+        functions.setdefault(path, set()).add((id_, metadata["name"]))
+    return functions
+
+
+@pytest.fixture
+def git_repo(tmp_path, embedder):
+    if shutil.which("git") is None:
+        pytest.skip("git not installed")
+    root = tmp_path / "repo"
+    shutil.copytree(TEST_REPO, root)
+    _git(root, "init", "-q", "-b", "main")
+    _git(root, "add", "-A")
+    _git(root, "commit", "-q", "-m", "initial")
+    index.index_codebase(str(root), backend="flat", full=True)
+    return root
+
+
+def test_branch_switch_updates_changed_files(git_repo, embedder):
+    root = git_repo
+    before = _functions(root)
+    _git(root, "checkout", "-q", "-b", "feature")
+    with open(root / "utils" / "validation.py", "a") as f:
+        f.write("\n\ndef validate_postcode(code):\n    return code.isalnum()\n")
+    _git(root, "mv", "auth/user_auth.py", "auth/session_auth.py")
+    _git(root, "rm", "-q", "data/database.py")
+    _git(root, "commit", "-q", "-am", "feature")
+    _git(root, "checkout", "-q", "main")
+    _git(root, "checkout", "-q", "feature")
+    embedder.embedded.clear()
+
+    index.index_codebase(str(root))
+
+    after = _functions(root)
+    assert set(after) == set(before) - {"auth/user_auth.py", "data/database.py"} | {"auth/session_auth.py"}
+    # The renamed file's rows moved without being re-embedded
+    assert after["auth/session_auth.py"] == before["auth/user_auth.py"]
+    assert [text for text in embedder.embedded if text.startswith("def ")] == [
+        "def validate_postcode(code):\n    return code.isalnum()"]
+    names = {name for _, name in after["utils/validation.py"]}
+    assert names == {name for _, name in before["utils/validation.py"]} | {"validate_postcode"}
+    for path in set(after) - {"utils/validation.py", "auth/session_auth.py"}:
+        assert after[path] == before[path]
+
+    # Switching back restores the original functions from the cache
+    _git(root, "checkout", "-q", "main")
+    embedder.embedded.clear()
+    index.index_codebase(str(root))
+    restored = _functions(root)
+    assert {path: {name for _, name in f} for path, f in restored.items()} == \
+        {path: {name for _, name in f} for path, f in before.items()}
+    assert restored["auth/user_auth.py"] == before["auth/user_auth.py"]
+    assert not embedder.embedded
+
+
+@pytest.fixture
+def plain_repo(tmp_path):
+    if shutil.which("git") is None:
+        pytest.skip("git not installed")
+    root = tmp_path / "plain"
+    root.mkdir()
+    for name in ("kept.py", "edited.py", "moved.py", "moved_edited.py", "removed.py"):
+        (root / name).write_text(f"def {name[:-3]}():\n    return {name!r}\n")
+    (root / "notes.txt").write_text("not python\n")
+    _git(root, "init", "-q", "-b", "main")
+    _git(root, "add", "-A")
+    _git(root, "commit", "-q", "-m", "initial")
+    return root
+
+
+def test_detect_changes(plain_repo):
+    root = plain_repo
+    manifest = git_state(root)
+    assert manifest["dirty"] == []
+
+    (root / "edited.py").write_text("def edited():\n    return 2\n")
+    _git(root, "mv", "moved.py", "renamed.py")
+    _git(root, "mv", "moved_edited.py", "renamed_edited.py")
+    (root / "renamed_edited.py").write_text("def renamed_edited():\n    return 'a different body'\n")
+    (root / "removed.py").unlink()
+    (root / "new.py").write_text("def new():\n    pass\n")
+    (root / "notes.txt").write_text("still not python\n")
+    _git(root, "add", "-A")
+    _git(root, "commit", "-q", "-m", "changes")
+
+    changes = detect_changes(root, manifest)
+    assert changes["renamed"] == [(str(root / "moved.py"), str(root / "renamed.py"))]
+    # A rename with edits is re-indexed under both paths: old rows go, new ones are embedded
+    assert changes["changed"] == sorted(str(root / name) for name in (
+        "edited.py", "moved_edited.py", "renamed_edited.py", "removed.py", "new.py"))
+
+
+def test_detect_changes_of_dirty_files(plain_repo):
+    root = plain_repo
+    (root / "edited.py").write_text("def edited():\n    return 'uncommitted'\n")
+    (root / "untracked.py").write_text("def untracked():\n    pass\n")
+    manifest = git_state(root)
+    assert manifest["dirty"] == ["edited.py", "untracked.py"]
+
+    # Files dirty at build time are re-indexed even once reverted
+    _git(root, "checkout", "-q", "--", "edited.py")
+    changes = detect_changes(root, manifest)
+    assert changes == {"changed": [str(root / "edited.py"), str(root / "untracked.py")], "renamed": []}
+
+    # A renamed file that was dirty may not match its indexed content
+    _git(root, "add", "untracked.py")
+    _git(root, "commit", "-q", "-m", "add untracked")
+    (root / "edited.py").write_text("def edited():\n    return 'dirty again'\n")
+    manifest = git_state(root)
+    _git(root, "checkout", "-q", "--", "edited.py")
+    _git(root, "mv", "edited.py", "edited_moved.py")
+    _git(root, "commit", "-q", "-m", "move")
+    assert detect_changes(root, manifest) == {
+        "changed": [str(root / "edited.py"), str(root / "edited_moved.py")], "renamed": []}
+
+
+def test_detect_changes_without_history(plain_repo, tmp_path):
+    assert detect_changes(plain_repo, {}) is None
+    assert detect_changes(plain_repo, {"commit": "0" * 40, "dirty": []}) is None
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    assert git_state(outside) == {}
@@ -0,0 +1,106 @@
+"""Tests for the lexical identifier index and its use in search."""
+
+import pytest
+
+from codevec import api
+from codevec.backends import open_backend
+from codevec.generations import current_generation
+from codevec.lexical import (
+    LexicalIndex, exact_matches, open_lexical, split_identifier, update_lexical, write_lexical,
+)
+
+FUNCTIONS = {
+    "a.py": [
+        ("parse_json", "def parse_json(text):\n    return json.loads(text)\n"),
+        ("load_config", "def load_config(path):\n    return parse_json(open(path).read())\n"),
+    ],
+    "b.py": [
+        ("send_request", "def send_request(url):\n    return http_client.get(url, retries=3)\n"),
+        ("retry_request", "def retry_request(url):\n    for retry in range(3):\n        send_request(url)\n"),
+    ],
+    "c.py": [
+        ("hash_password", "def hash_password(password):\n    return sha256(password.encode())\n"),
+    ],
+}
+
+
+def _corpus(functions):
+    ids, metadatas, chunks = [], [], []
+    for file_path, entries in functions.items():
+        for name, chunk in entries:
+            ids.append(f"{file_path}:{name}")
+            metadatas.append({"file_path": file_path, "name": name})
+            chunks.append(chunk)
+    return ids, metadatas, chunks
+
+
+def _index(functions):
+    index = LexicalIndex()
+    index.add(*_corpus(functions))
+    return index
+
+
+@pytest.mark.parametrize("word, parts", [
+    ("parse_json", ["parse", "json"]),
+    ("parseHTTPResponse", ["parse", "http", "response"]),
+    ("HTMLParser2", ["html", "parser", "2"]),
+    ("__init__", ["init"]),
+])
+def test_split_identifier(word, parts):
+    assert split_identifier(word) == parts
+
+
+def test_bm25_ranking():
+    index = _index(FUNCTIONS)
+
+    ranked = [doc_id for doc_id, _ in index.search("retry request", 5)]
+    # Both words, boosted in the name, beat one word in the name
+    assert ranked[:2] == ["b.py:retry_request", "b.py:send_request"]
+    assert "c.py:hash_password" not in ranked
+
+    [(doc_id, score)] = index.search("sha256", 5)
+    assert doc_id == "c.py:hash_password" and score > 0
+    assert index.search("nothing matches this", 5) == []
+
+
+def test_exact_match_skips_embedding(repo, embedder, monkeypatch):
+    store = open_backend(current_generation(repo / ".codevec"))
+    lexical = open_lexical(current_generation(repo / ".codevec"))
+    exact = exact_matches(store, lexical, "hash_password", 5)
+    assert [m["name"] for m in exact["metadatas"]] == ["hash_password"]
+    assert exact_matches(store, lexical, "hash password", 5) is None
+    assert exact_matches(store, lexical, "hash_password", 0) is None  # Too many to skip ranking
+
+    queries = []
+    monkeypatch.setattr(embedder, "embed", lambda texts, task_type="document": queries.extend(texts))
+    with api.CodeVecIndex(repo) as code_index:
+        [result] = code_index.search("hash_password")
+    assert result.name == "hash_password" and result.similarity is None
+    assert queries == []
+
+
+def test_update_after_delete_and_add(tmp_path):
+    gen_path = tmp_path / "gen"
+    gen_path.mkdir()
+    write_lexical(gen_path, *_corpus(FUNCTIONS))
+
+    changed = {
+        "a.py": [("parse_yaml", "def parse_yaml(text):\n    return yaml.safe_load(text)\n")],
+        "b.py": FUNCTIONS["b.py"],
+        "c.py": FUNCTIONS["c.py"],
+    }
+    update_lexical(gen_path, ["a.py"], [], *_corpus({"a.py": changed["a.py"]}))
+    updated = open_lexical(gen_path)
+    rebuilt = _index(changed)
+
+    assert updated.exact("parse_json") == []
+    assert updated.exact("parse_yaml") == ["a.py:parse_yaml"]
+    queries = ("parse json text", "parse yaml", "retry request", "password")
+    for query in queries:
+        assert [doc_id for doc_id, _ in updated.search(query, 5)] == \
+            [doc_id for doc_id, _ in rebuilt.search(query, 5)]
+
+    # The delta normalizes lengths on its own until it is merged
+    updated.compact()
+    for query in queries:
+        assert updated.search(query, 5) == pytest.approx(rebuilt.search(query, 5))
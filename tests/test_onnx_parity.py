@@ -0,0 +1,40 @@
+"""Parity of the ONNX runtime with torch.
+
+Runs the same comparison as vec-onnx check on functions from the test
+repository. Skipped unless both runtimes are installed and the models
+have been exported (vec-onnx export).
+"""
+
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+pytest.importorskip("sentence_transformers")
+
+from codevec import onnx_runtime
+from codevec.index import extract_chunks, walk_codebase
+from codevec.loadtest import derive_queries
+
+TEST_REPO = Path(__file__).parent / "test-repo"
+
+pytestmark = pytest.mark.skipif(
+    not all((onnx_runtime._model_dir(name) / onnx_runtime.CONFIG_NAME).exists()
+            for name in (onnx_runtime.EMBEDDER_MODEL, onnx_runtime.RERANKER_MODEL)),
+    reason="ONNX models not exported (run vec-onnx export)",
+)
+
+
+def test_onnx_matches_torch():
+    documents, metadatas = [], []
+    for file_path, content in walk_codebase(str(TEST_REPO)):
+        file_documents, file_metadatas = extract_chunks(file_path, content)
+        documents.extend(file_documents)
+        metadatas.extend(file_metadatas)
+    queries = derive_queries(documents, metadatas)[:20]
+
+    parity = onnx_runtime.compare_runtimes(documents, queries, documents[:10])["parity"]
+
+    assert parity["cosine_min"] >= onnx_runtime.MIN_COSINE
+    assert parity["rerank_spearman_mean"] >= onnx_runtime.MIN_SPEARMAN
@@ -0,0 +1,53 @@
+"""Tests for sharded index builds."""
+
+import numpy as np
+import pytest
+
+from codevec import api, index
+from codevec.backends import open_backend
+from codevec.generations import current_generation
+from codevec.shards import build_shard, merge_shards, open_shards
+
+
+def _entries(root):
+    """Map (file, name, line) of every indexed function to its (source, vector)."""
+    store = open_backend(current_generation(index.get_db_path(str(root))))
+    documents, vectors, metadatas = store.entries()
+    return {(m["file_path"], m["name"], m["line"]): (document, np.asarray(vector))
+            for document, vector, m in zip(documents, vectors, metadatas)}
+
+
+def test_merged_shards_match_single_build(repo, tmp_path):
+    single = _entries(repo)
+    queries = ["validate email address", "hash_password", "sort a list of numbers", "retry http request"]
+    with api.CodeVecIndex(repo) as code_index:
+        expected = [[(r.file_path, r.name, r.line) for r in code_index.search(query, n_results=5)]
+                    for query in queries]
+
+    shards = [tmp_path / f"shard-{i}" for i in range(3)]
+    sizes = [build_shard(repo, i, 3, shard) for i, shard in enumerate(shards)]
+    assert all(sizes) and sum(sizes) == len(single)
+    assert merge_shards(repo, shards, backend="flat") == len(single)
+
+    merged = _entries(repo)
+    assert merged.keys() == single.keys()
+    for key, (document, vector) in merged.items():
+        assert document == single[key][0]
+        np.testing.assert_allclose(vector, single[key][1], atol=1e-6)
+    with api.CodeVecIndex(repo) as code_index:
+        for query, results in zip(queries, expected):
+            assert [(r.file_path, r.name, r.line) for r in code_index.search(query, n_results=5)] == results
+
+
+def test_open_shards_rejects_incomplete_sets(repo, tmp_path):
+    shards = [tmp_path / f"shard-{i}" for i in range(3)]
+    for i, shard in enumerate(shards):
+        build_shard(repo, i, 3, shard)
+
+    with pytest.raises(ValueError, match="given twice"):
+        open_shards([shards[0], shards[1], shards[1], shards[2]])
+    with pytest.raises(ValueError, match="Missing shards: 2"):
+        open_shards(shards[:2])
+    with pytest.raises(ValueError, match="not a shard"):
+        open_shards([*shards, repo])
+    assert len(open_shards(reversed(shards))) == 3
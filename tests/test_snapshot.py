@@ -0,0 +1,48 @@
+"""Round trips through portable index snapshots."""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from codevec import api, index
+from codevec.snapshot import export_index, import_index
+
+TEST_REPO = Path(__file__).parent / "test-repo"
+QUERIES = ["validate email address", "sort a list of numbers", "http request with retries", "database connection"]
+
+
+def _search(root):
+    with api.CodeVecIndex(root) as code_index:
+        return [[(Path(r.file_path).relative_to(root), r.name, r.line, r.code)
+                 for r in code_index.search(query, n_results=5, rerank=False)] for query in QUERIES]
+
+
+@pytest.mark.parametrize("precision", ["float16", "int8"])
+def test_export_import_round_trip(repo, tmp_path, precision):
+    snapshot = tmp_path / "index.zip"
+    header = export_index(repo, snapshot, precision)
+    checkout = tmp_path / "checkout"
+    shutil.copytree(TEST_REPO, checkout)
+
+    imported = import_index(checkout, snapshot, backend="flat")
+
+    assert imported["count"] == header["count"] == 80
+    assert _search(checkout) == _search(repo)
+
+
+def test_export_import_empty_index(tmp_path, embedder):
+    root = tmp_path / "empty"
+    root.mkdir()
+    index.index_codebase(str(root), backend="flat", full=True)
+    snapshot = tmp_path / "empty.zip"
+
+    header = export_index(root, snapshot)
+    checkout = tmp_path / "checkout"
+    checkout.mkdir()
+    import_index(checkout, snapshot, backend="flat")
+
+    assert header["count"] == 0 and header["model"]["dim"] is None
+    with api.CodeVecIndex(checkout) as code_index:
+        assert code_index.count() == 0
+        assert code_index.search("anything") == []